@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# --- 本地模拟抖音直播服务器 (压测用) ---
+# 每个房间可以是开播/未开播；开播房间提供:
+#   GET /live/<房间号>.m3u8          HLS 直播列表 (滑动窗口，按墙钟推进)，未开播返回 404
+#   GET /live/<房间号>/<序号>.ts      HLS 分片
+#   GET /live/<房间号>.flv           HTTP-FLV 直播流 (按时间戳限速，循环播放时改写时间戳保持连续)
+# 管理接口:
+#   GET  /admin/state                所有房间状态、连接数、已发送字节数
+#   POST /admin/rooms/<房间号>/live|offline
+# 测试片源由 FFmpeg 的 testsrc/sine 生成一次后缓存 (也可以用 --clip 指定自己的 FLV 文件)
+SEGMENT_SECONDS = 2
+
+def generate_clip(folder, seconds=20, bitrate="2M", size="1280x720", fps=30):
+    folder.mkdir(parents=True, exist_ok=True); clip = folder / f"clip_{size}_{bitrate}_{seconds}s.flv"
+    if not clip.exists():
+        command = ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'testsrc=size={size}:rate={fps}', '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+                   '-t', str(seconds), '-c:v', 'libx264', '-preset', 'veryfast', '-b:v', bitrate, '-g', str(fps * SEGMENT_SECONDS), '-keyint_min', str(fps * SEGMENT_SECONDS), '-sc_threshold', '0',
+                   '-c:a', 'aac', '-b:a', '128k', '-f', 'flv', str(clip)]
+        subprocess.run(command, check=True)
+    return clip
+
+def split_segments(clip, folder):
+    # 按 2 秒关键帧切成 TS 分片供 HLS 使用
+    segments = sorted(folder.glob("seg_*.ts"))
+    if not segments:
+        subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', str(clip), '-c', 'copy', '-f', 'segment', '-segment_time', str(SEGMENT_SECONDS), '-segment_format', 'mpegts', str(folder / "seg_%03d.ts")], check=True)
+        segments = sorted(folder.glob("seg_*.ts"))
+    return [p.read_bytes() for p in segments]
+
+# --- FLV ---
+def parse_flv(data):
+    # 返回 (文件头, [(类型, 时间戳毫秒, 数据)])；文件头含 9 字节头与第一个 PreviousTagSize
+    if data[:3] != b"FLV": raise ValueError("不是 FLV 文件")
+    offset = struct.unpack(">I", data[5:9])[0]; header, pos, tags = data[:offset + 4], offset + 4, []
+    while pos + 11 <= len(data):
+        tag_type = data[pos]; size = int.from_bytes(data[pos + 1:pos + 4], "big")
+        timestamp = int.from_bytes(data[pos + 4:pos + 7], "big") | (data[pos + 7] << 24)
+        tags.append((tag_type, timestamp, data[pos + 11:pos + 11 + size])); pos += 11 + size + 4
+    return header, tags
+
+def is_sequence_header(tag_type, payload):
+    # AVC/AAC 解码配置与 onMetaData 只在流开头发送一次
+    if tag_type == 18: return True
+    if tag_type == 9: return len(payload) > 1 and payload[0] & 0x0F == 7 and payload[1] == 0
+    if tag_type == 8: return len(payload) > 1 and payload[0] >> 4 == 10 and payload[1] == 0
+    return False
+
+def flv_tag(tag_type, timestamp, payload):
+    timestamp &= 0xFFFFFFFF
+    header = bytes([tag_type]) + len(payload).to_bytes(3, "big") + (timestamp & 0xFFFFFF).to_bytes(3, "big") + bytes([timestamp >> 24]) + b"\x00\x00\x00"
+    return header + payload + struct.pack(">I", len(payload) + 11)
+
+class FakeDouyinServer:
+    def __init__(self, host="127.0.0.1", port=0, clip=None, cache_dir=None):
+        self.cache_dir = Path(cache_dir or Path(tempfile.gettempdir()) / "fake_douyin_cache")
+        clip = Path(clip) if clip else generate_clip(self.cache_dir)
+        self.flv_header, self.flv_tags = parse_flv(clip.read_bytes())
+        frame_ms = max(1, self.flv_tags[-1][1] - self.flv_tags[-2][1]) if len(self.flv_tags) > 1 else 33
+        self.clip_ms = self.flv_tags[-1][1] + frame_ms
+        self.segments = split_segments(clip, self.cache_dir / clip.stem)
+        self.rooms, self.connections, self.bytes_sent, self._lock = {}, 0, 0, threading.Lock()
+        handler = type("Handler", (FakeDouyinHandler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler); self.httpd.daemon_threads = True
+        self.host, self.port = host, self.httpd.server_address[1]
+
+    # --- 房间状态 ---
+    def add_rooms(self, room_ids, live_ratio=0.0):
+        with self._lock:
+            for room_id in room_ids: self.rooms[room_id] = {"live": random.random() < live_ratio, "since": time.time()}
+
+    def set_live(self, room_id, live=True):
+        with self._lock: self.rooms[room_id] = {"live": live, "since": time.time()}
+
+    def room(self, room_id):
+        with self._lock: return dict(self.rooms.get(room_id) or {"live": False, "since": 0})
+
+    def state(self):
+        with self._lock: return {"rooms": dict(self.rooms), "connections": self.connections, "bytes_sent": self.bytes_sent}
+
+    def url(self, path=""):
+        return f"http://{self.host}:{self.port}{path}"
+
+    def hls_template(self):
+        # 供 live_url_template 使用：Streamlink 的 hls 插件会真正请求列表，未开播的 404 即判定为未开播
+        return f"hls://{self.host}:{self.port}/live/{{room_id}}.m3u8"
+
+    def flv_url(self, room_id):
+        return self.url(f"/live/{room_id}.flv")
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start(); return self
+
+    def stop(self):
+        self.httpd.shutdown(); self.httpd.server_close()
+
+class FakeDouyinHandler(BaseHTTPRequestHandler):
+    server_state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args): pass
+
+    def _send(self, code, body, content_type="application/json"):
+        self.send_response(code); self.send_header("Content-Type", content_type); self.send_header("Content-Length", str(len(body))); self.end_headers()
+        self.wfile.write(body); self._count(len(body))
+
+    def _count(self, size):
+        state = self.server_state
+        with state._lock: state.bytes_sent += size
+
+    def do_GET(self):
+        state, parts = self.server_state, [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["admin", "state"]: return self._send(200, json.dumps(state.state()).encode())
+        if len(parts) == 2 and parts[0] == "live":
+            room_id, ext = os.path.splitext(parts[1])
+            room = state.room(room_id)
+            if not room["live"]: return self._send(404, b'{"error": "offline"}')
+            if ext == ".m3u8": return self._send(200, self.playlist(room_id, room).encode(), "application/vnd.apple.mpegurl")
+            if ext == ".flv": return self.stream_flv(room_id)
+        if len(parts) == 3 and parts[0] == "live" and parts[2].endswith(".ts"):
+            try: sequence = int(parts[2][:-3])
+            except ValueError: return self._send(404, b"{}")
+            return self._send(200, state.segments[sequence % len(state.segments)], "video/mp2t")
+        self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        parts = [p for p in self.path.split("/") if p]
+        if len(parts) == 4 and parts[:2] == ["admin", "rooms"] and parts[3] in ("live", "offline"):
+            self.server_state.set_live(parts[2], parts[3] == "live"); return self._send(200, b'{"ok": true}')
+        self._send(404, b'{"error": "not found"}')
+
+    def playlist(self, room_id, room):
+        # 以开播时间为起点按墙钟推进，保留最近 3 个分片；分片循环复用时标记不连续
+        state = self.server_state
+        newest = int((time.time() - room["since"]) // SEGMENT_SECONDS); first = max(0, newest - 2)
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+        for sequence in range(first, newest + 1):
+            if sequence and sequence % len(state.segments) == 0: lines.append("#EXT-X-DISCONTINUITY")
+            lines += [f"#EXTINF:{SEGMENT_SECONDS:.3f},", f"/live/{room_id}/{sequence}.ts"]
+        return "\n".join(lines) + "\n"
+
+    def stream_flv(self, room_id):
+        # 按标签时间戳限速发送 (实时速率)；循环时时间戳累加片长，房间下播后结束连接
+        state = self.server_state
+        self.send_response(200); self.send_header("Content-Type", "video/x-flv"); self.send_header("Connection", "close"); self.end_headers()
+        with state._lock: state.connections += 1
+        started, offset, first_loop = time.monotonic(), 0, True
+        try:
+            self.wfile.write(state.flv_header); self._count(len(state.flv_header))
+            while state.room(room_id)["live"]:
+                for tag_type, timestamp, payload in state.flv_tags:
+                    if not first_loop and is_sequence_header(tag_type, payload): continue
+                    due = started + (offset + timestamp) / 1000 - time.monotonic()
+                    if due > 0: time.sleep(due)
+                    data = flv_tag(tag_type, offset + timestamp, payload); self.wfile.write(data); self._count(len(data))
+                offset += state.clip_ms; first_loop = False
+        except (BrokenPipeError, ConnectionResetError): pass
+        finally:
+            with state._lock: state.connections -= 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟抖音直播服务器 (HLS/FLV 测试流)")
+    parser.add_argument("--host", default="127.0.0.1"); parser.add_argument("--port", type=int, default=8850)
+    parser.add_argument("--rooms", type=int, default=100, help="房间数量 (房间号 100000 起)")
+    parser.add_argument("--live-ratio", type=float, default=0.1, help="启动时开播房间比例")
+    parser.add_argument("--clip", help="自定义 FLV 片源 (默认用 FFmpeg testsrc 生成)")
+    args = parser.parse_args(argv)
+    if not args.clip and not shutil.which("ffmpeg"): parser.error("生成测试片源需要 FFmpeg，或用 --clip 指定 FLV 文件")
+    server = FakeDouyinServer(args.host, args.port, args.clip); server.add_rooms([str(100000 + i) for i in range(args.rooms)], args.live_ratio); server.start()
+    print(f"模拟服务器已启动: {server.url()}  live_url_template = {server.hls_template()}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt: server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fake_douyin import FakeDouyinServer
+
+# --- 压测 ---
+# 在本地模拟服务器上驱动真实的巡逻 (ProbeEngine/patrol_loop) 与 RecordingThread 代码路径:
+#   probe   一轮并发探测的吞吐 (次/秒) 与判定准确性
+#   detect  开启巡逻后随机让房间开播，统计从开播到启动录制的延迟
+#   record  逐级增加同时录制数，统计每路 FFmpeg 的 CPU/内存，找出仍能保持实时速度的最大并发数
+#   startup 冷启动耗时：在新进程里导入核心包/无界面模式/图形界面，以及无界面模式从启动到加载完主播，
+#           并检查启动时没有加载 streamlink 等重模块；超出 --startup-budget-ms 时以退出码 1 结束
+# probe/detect/record 需要 FFmpeg 与 Streamlink；record 场景另需 psutil。所有录像与设定写在临时工作目录里
+ROOM_BASE = 100000
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+# 启动时不应加载的模块 (按需加载)；图形界面本身需要 tkinter/customtkinter
+LAZY_MODULES = ("streamlink", "asyncio", "tkinter", "customtkinter", "douyin_recorder.cluster", "douyin_recorder.supervisor")
+STARTUP_TARGETS = {"core": "douyin_recorder.service", "headless": "douyin_recorder.headless", "gui": "douyin_recorder.gui"}
+
+def room_ids(count):
+    return [str(ROOM_BASE + i) for i in range(count)]
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values); return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def make_service(settings, rooms):
+    # 工作目录已切换到临时目录；主播只放进内存，不写设定库 (几千次单独提交会拖慢准备阶段)
+    from douyin_recorder.config import SETTINGS_FILE, ensure_app_dirs, save_json
+    from douyin_recorder.service import RecorderService
+    ensure_app_dirs(); save_json(SETTINGS_FILE, settings)
+    service = RecorderService()
+    for room_id in rooms: service.streamers[room_id] = {"remark": f"bench-{room_id}"}
+    return service
+
+def bench_probe(server, args):
+    rooms = room_ids(args.rooms); server.add_rooms(rooms, args.live_ratio)
+    expected = {r for r in rooms if server.room(r)["live"]}
+    service = make_service({"live_url_template": server.hls_template(), "probe_concurrency": args.concurrency, "probe_jitter": [0, 0], "adaptive_patrol": False, "request_rate": args.request_rate}, rooms)
+    detected, errors, latencies = set(), 0, []
+    def on_result(result):
+        nonlocal errors
+        latencies.append(result.elapsed)
+        if result.is_live: detected.add(result.room_id)
+        # 未开播房间的 404 也会以异常形式返回，只统计开播房间上的异常
+        elif result.error and result.room_id in expected: errors += 1
+    try: stats = service.probe_engine.sweep(rooms, threading.Event(), on_result)
+    finally: service.shutdown()
+    return {"rooms": len(rooms), "concurrency": args.concurrency, "elapsed": round(stats["elapsed"], 2), "probes_per_second": round(stats["rate"], 2),
+            "probe_p50_ms": round(percentile(latencies, 50) * 1000, 1), "probe_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "live_expected": len(expected), "live_detected": len(detected & expected), "false_live": len(detected - expected), "errors_on_live_rooms": errors}
+
+def bench_detect(server, args):
+    rooms = room_ids(args.rooms); server.add_rooms(rooms, 0.0)
+    service = make_service({"live_url_template": server.hls_template(), "probe_concurrency": args.concurrency, "probe_jitter": [0, 0.5],
+                            "patrol_start": "00:00", "patrol_end": "23:59", "patrol_interval": args.patrol_interval, "adaptive_patrol": args.adaptive, "request_rate": args.request_rate}, rooms)
+    events, went_live, detected = service.events.subscribe(), {}, {}
+    service.start_patrol()
+    try:
+        for room_id in random.sample(rooms, min(args.go_live, len(rooms))):
+            server.set_live(room_id); went_live[room_id] = time.time(); time.sleep(args.spacing)
+        deadline = time.time() + args.timeout
+        while len(detected) < len(went_live) and time.time() < deadline:
+            try: event = events.get(timeout=0.5)
+            except Exception: continue
+            if event.room_id in went_live and event.room_id not in detected:
+                # 录制线程创建时发布的第一个事件即“检测到开播”的时刻；随后立即停止录制，避免影响后续探测
+                detected[event.room_id] = event.time - went_live[event.room_id]
+                threading.Thread(target=service.stop_recording, args=(event.room_id,), daemon=True).start()
+    finally: service.shutdown()
+    delays = list(detected.values())
+    return {"rooms": len(rooms), "went_live": len(went_live), "detected": len(delays), "missed": len(went_live) - len(delays),
+            "adaptive": args.adaptive, "patrol_interval": args.patrol_interval,
+            "detect_mean_s": round(statistics.mean(delays), 2) if delays else None, "detect_p50_s": round(percentile(delays, 50), 2) if delays else None,
+            "detect_p95_s": round(percentile(delays, 95), 2) if delays else None, "detect_max_s": round(max(delays), 2) if delays else None}
+
+def sample_processes(psutil, seconds):
+    # 统计本进程 (录制服务) 与所有 FFmpeg 子进程在 seconds 秒内的 CPU 占用与常驻内存
+    me = psutil.Process(os.getpid())
+    children = [p for p in me.children(recursive=True) if "ffmpeg" in (p.name() or "").lower()]
+    for proc in [me, *children]:
+        try: proc.cpu_percent(None)
+        except psutil.Error: pass
+    time.sleep(seconds); cpu, rss = [], []
+    for proc in children:
+        try: cpu.append(proc.cpu_percent(None)); rss.append(proc.memory_info().rss)
+        except psutil.Error: pass
+    return {"ffmpeg": len(cpu), "ffmpeg_cpu_total": sum(cpu), "ffmpeg_cpu_each": sum(cpu) / len(cpu) if cpu else 0.0, "ffmpeg_rss_each_mb": sum(rss) / len(rss) / 1024 ** 2 if rss else 0.0,
+            "service_cpu": me.cpu_percent(None), "service_rss_mb": me.memory_info().rss / 1024 ** 2, "service_threads": me.num_threads()}
+
+def bench_record(server, args):
+    try: import psutil
+    except ImportError: print("record 场景需要 psutil (pip install psutil)"); return None
+    rooms = room_ids(args.max_recordings); server.add_rooms(rooms, 1.0)
+    service = make_service({"live_url_template": server.hls_template(), "stall_timeout": 30, "stall_restart": False, "min_free_gb": 0, "recording_supervisor": args.supervisor}, rooms)
+    stream_url = server.flv_url if args.format == "flv" else (lambda r: server.url(f"/live/{r}.m3u8"))
+    levels, running = [], 0
+    try:
+        while running < len(rooms):
+            target = min(len(rooms), running + (args.step if running else args.start))
+            for room_id in rooms[running:target]: service.start_recording(room_id, stream_url(room_id))
+            running = target; time.sleep(args.settle)
+            usage = sample_processes(psutil, args.sample)
+            metrics = service.recording_metrics(); speeds = [m.get("speed", 0) for m in metrics]
+            level = {"recordings": running, "alive": len(metrics), "stalled": sum(1 for m in metrics if m["stalled"]), "min_speed": round(min(speeds), 3) if speeds else 0,
+                     **{k: round(v, 2) for k, v in usage.items()}, "server_connections": server.state()["connections"]}
+            # 所有录制都在、没有停滞、最慢的一路也能保持实时 (速度 ≥ 0.95x) 才算可持续
+            level["sustainable"] = level["alive"] == running and not level["stalled"] and level["min_speed"] >= 0.95 and psutil.cpu_percent(None) < args.cpu_limit
+            levels.append(level); print(json.dumps(level, ensure_ascii=False))
+            if not level["sustainable"]: break
+    finally: service.shutdown()
+    sustainable = [l["recordings"] for l in levels if l["sustainable"]]
+    return {"format": args.format, "supervisor": args.supervisor, "levels": levels, "max_sustainable_recordings": max(sustainable) if sustainable else 0}
+
+def python_env():
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(PACKAGE_ROOT), os.environ.get("PYTHONPATH")])), "PYTHONDONTWRITEBYTECODE": "0"}
+
+def time_import(module, runs):
+    # 每次都是新进程 (第一次运行编译 .pyc 不计入)；返回 (耗时中位数毫秒, 加载了的按需模块) 或 None (依赖未安装)
+    code = f"import json, sys, time; t = time.perf_counter(); import {module}; print(json.dumps([(time.perf_counter() - t) * 1000, [m for m in {LAZY_MODULES!r} if m in sys.modules]]))"
+    samples, loaded = [], []
+    for i in range(runs + 1):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=python_env())
+        if result.returncode != 0: return None
+        elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        if i: samples.append(elapsed)
+    allowed = ("tkinter", "customtkinter") if module.endswith(".gui") else ()
+    return round(statistics.median(samples), 1), [m for m in loaded if m not in allowed]
+
+def time_headless_ready(rooms, runs):
+    # 无界面模式从启动进程到打印“已加载 N 个主播”的时间 (含读取设定库与录像索引)，不开巡逻与接口
+    from douyin_recorder.config import ensure_app_dirs
+    from douyin_recorder.store import StreamerStore
+    ensure_app_dirs(); store = StreamerStore()
+    for room_id in room_ids(rooms): store.save(room_id, {"remark": f"bench-{room_id}"})
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-m", "douyin_recorder", "--no-patrol", "--port", "0"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=python_env())
+        try:
+            for line in proc.stdout:
+                if "[Headless] 已加载" in line: samples.append((time.perf_counter() - started) * 1000); break
+        finally: proc.terminate(); proc.wait(10)
+    return round(statistics.median(samples), 1) if samples else None
+
+def bench_startup(server, args):
+    results = {}
+    for name, module in STARTUP_TARGETS.items():
+        timed = time_import(module, args.startup_runs)
+        results[name] = {"import_ms": timed[0], "lazy_modules_loaded": timed[1]} if timed else {"skipped": "依赖未安装"}
+    results["headless"]["ready_ms"] = time_headless_ready(args.rooms, args.startup_runs); results["headless"]["rooms"] = args.rooms
+    slow = [f"{n}.{k}" for n, r in results.items() for k in ("import_ms", "ready_ms") if (r.get(k) or 0) > args.startup_budget_ms]
+    eager = [f"{n}:{m}" for n, r in results.items() for m in r.get("lazy_modules_loaded", [])]
+    results["budget_ms"], results["over_budget"], results["eager_imports"] = args.startup_budget_ms, slow, eager
+    results["ok"] = not slow and not eager
+    return results
+
+SCENARIOS = {"probe": bench_probe, "detect": bench_detect, "record": bench_record, "startup": bench_startup}
+NEEDS_SERVER = ("probe", "detect", "record")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="抖音录制器压测 (本地模拟服务器)")
+    parser.add_argument("scenario", choices=[*SCENARIOS, "all"])
+    parser.add_argument("--rooms", type=int, default=500, help="probe/detect 场景的房间数")
+    parser.add_argument("--live-ratio", type=float, default=0.1, help="probe 场景开播房间比例")
+    parser.add_argument("--concurrency", type=int, default=16, help="probe_concurrency")
+    parser.add_argument("--request-rate", type=float, default=0, help="request_rate (默认 0 不限速，测量探测本身的吞吐)")
+    parser.add_argument("--go-live", type=int, default=20, help="detect 场景依次开播的房间数")
+    parser.add_argument("--spacing", type=float, default=3.0, help="detect 场景两次开播的间隔 (秒)")
+    parser.add_argument("--patrol-interval", type=float, default=30); parser.add_argument("--adaptive", action="store_true", help="detect 场景使用自适应巡逻")
+    parser.add_argument("--timeout", type=float, default=300, help="detect 场景最长等待 (秒)")
+    parser.add_argument("--format", choices=["flv", "hls"], default="flv", help="record 场景的测试流格式")
+    parser.add_argument("--supervisor", choices=["threads", "asyncio"], default="threads", help="record 场景的 recording_supervisor")
+    parser.add_argument("--start", type=int, default=5); parser.add_argument("--step", type=int, default=5); parser.add_argument("--max-recordings", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=15, help="每级增加录制后等待稳定的秒数"); parser.add_argument("--sample", type=float, default=10, help="每级采样秒数")
+    parser.add_argument("--cpu-limit", type=float, default=90, help="整机 CPU 占用超过此百分比即视为不可持续")
+    parser.add_argument("--startup-runs", type=int, default=5, help="startup 场景每项重复次数 (取中位数)")
+    parser.add_argument("--startup-budget-ms", type=float, default=1000, help="startup 场景的耗时上限 (毫秒)")
+    parser.add_argument("--clip", help="自定义 FLV 片源"); parser.add_argument("--json", help="结果另存为 JSON 文件")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录 (录像/设定)")
+    args = parser.parse_args(argv)
+    json_path = Path(args.json).resolve() if args.json else None
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    if any(n in NEEDS_SERVER for n in names) and not shutil.which("ffmpeg"): parser.error("压测需要 FFmpeg")
+
+    workdir = Path(tempfile.mkdtemp(prefix="douyin_bench_")); os.chdir(workdir); results = {}
+    try:
+        for name in names:
+            server = FakeDouyinServer(clip=args.clip).start() if name in NEEDS_SERVER else None
+            print(f"[Bench] {name} 场景开始 (" + (f"模拟服务器 {server.url()}，" if server else "") + f"工作目录 {workdir})")
+            try: results[name] = SCENARIOS[name](server, args)
+            finally:
+                if server: server.stop()
+            print(f"[Bench] {name}: {json.dumps(results[name], ensure_ascii=False)}")
+    finally:
+        os.chdir(Path(__file__).resolve().parent)
+        if not args.keep: shutil.rmtree(workdir, ignore_errors=True)
+    if json_path: json_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if "startup" in results and not results["startup"]["ok"]: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# 抖音直播录制器核心包：巡逻、录制、存储与设定。图形界面在 gui.py (只有它导入 tkinter/customtkinter)，无界面模式在 headless.py；
+# streamlink、asyncio、多进程模块等较重的依赖都在首次用到时才导入，启动耗时见 bench/run_bench.py startup
@@ -0,0 +1,96 @@
+import threading
+import time
+
+# --- 录制准入控制 ---
+# 同时录制数 (max_recordings) 与总入站码率 (max_ingress_mbps) 的上限，0 为不限。正在录制的主播按实测码率计算，
+# 刚开始的按该主播上次的实测值或 estimated_bitrate_kbps 估算。超出上限时，优先级 (主播设定档 "priority") 更高的主播
+# 可以让低优先级的录制降到最低画质 (只超带宽时) 或直接停止；没有可让出的名额则本次不录，等下一次巡逻再试。
+# 画质偏好 (设定档/主播设定档的 "quality"，如 "uhd > hd > sd") 是从高到低的档位，缺少的画质依次退到下一个；
+# 开启 auto_quality 的录制在总入站码率接近 max_ingress_mbps 时逐档降低，余量恢复后再逐档升回
+QUALITY_BEST, QUALITY_LOW = "best", "worst"
+DOWNGRADE_SAVING = 0.5  # 降档后的码率先按原来的一半估算，几秒后由实测值更新
+PREEMPT_POLICIES = ("downgrade", "stop", "none")
+
+def quality_ladder(value):
+    # "uhd > hd > sd" 或 ["uhd", "hd", "sd"] → 档位列表；只写 best (默认) 时与旧版一样可以降到 worst
+    names = [q.strip() for q in (value.split(">") if isinstance(value, str) else value or []) if q and q.strip()] or [QUALITY_BEST]
+    return names + [QUALITY_LOW] if names == [QUALITY_BEST] else names
+
+class AdmissionController:
+    def __init__(self, settings, streamers):
+        self.settings, self.streamers = settings, streamers
+        self.lock, self.last_bitrate = threading.Lock(), {}  # lock: 判断与启动录制线程要在同一把锁里完成
+
+    def option(self, room_id, key, default=None):
+        return self.streamers.get(room_id, {}).get(key, self.settings.get(key, default))
+
+    def priority(self, room_id):
+        return int(self.option(room_id, "priority", 0) or 0)
+
+    def ladder(self, room_id):
+        return quality_ladder(self.option(room_id, "quality", QUALITY_BEST))
+
+    def max_recordings(self):
+        return int(self.settings.get("max_recordings", 0) or 0)
+
+    def max_ingress_kbps(self):
+        return float(self.settings.get("max_ingress_mbps", 0) or 0) * 1000
+
+    def estimate(self, room_id, quality=None):
+        # 按该主播在该画质下最近的实测码率估算；没测过的低档按最高档的一半估算
+        top = self.ladder(room_id)[0]; quality = quality or top
+        if (measured := self.last_bitrate.get((room_id, quality))): return measured
+        full = self.last_bitrate.get((room_id, top)) or float(self.settings.get("estimated_bitrate_kbps", 4000))
+        return full if quality == top else full * DOWNGRADE_SAVING
+
+    def current_kbps(self, thread):
+        measured = thread.metrics.to_dict().get("bitrate_kbps")
+        if measured: self.last_bitrate[(thread.room_id, thread.quality)] = measured
+        return measured or self.estimate(thread.room_id, thread.quality)
+
+    def usage(self, running):
+        return {"recordings": len(running), "max_recordings": self.max_recordings(),
+                "ingress_kbps": round(sum(self.current_kbps(t) for t in running), 1), "max_ingress_kbps": self.max_ingress_kbps()}
+
+    def plan(self, room_id, running):
+        # 返回 (是否录制, [(动作, 录制线程)], 原因)；动作为 "downgrade" 或 "stop"，由调用方执行
+        max_count, max_kbps, need = self.max_recordings(), self.max_ingress_kbps(), self.estimate(room_id)
+        kbps = {t.room_id: self.current_kbps(t) for t in running}
+        count, ingress = len(running), sum(kbps.values())
+        fits = lambda: (not max_count or count < max_count) and (not max_kbps or ingress + need <= max_kbps)
+        if fits(): return True, [], ""
+        reason = f"超出同时录制上限 ({count}/{max_count})" if max_count and count >= max_count else f"超出入站带宽上限 ({(ingress + need) / 1000:.1f}/{max_kbps / 1000:.1f} Mbps)"
+        policy = self.settings.get("preempt_policy", "downgrade")
+        priority = self.priority(room_id)
+        victims = sorted((t for t in running if self.priority(t.room_id) < priority), key=lambda t: (self.priority(t.room_id), -kbps[t.room_id]))
+        if policy == "none" or not victims: return False, [], reason
+        actions = {}
+        if policy == "downgrade" and (not max_count or count < max_count):
+            # 只超带宽：先把低优先级的录制降到最低画质
+            for t in victims:
+                if t.level >= len(t.ladder) - 1: continue
+                saving = max(0.0, kbps[t.room_id] - self.estimate(t.room_id, t.ladder[-1]))
+                actions[t.room_id] = ("downgrade", t); ingress -= saving; kbps[t.room_id] -= saving
+                if fits(): return True, list(actions.values()), ""
+        for t in victims:
+            # 降档仍不够 (或超出的是录制数) 时，从优先级最低的开始停止
+            actions[t.room_id] = ("stop", t); count -= 1; ingress -= kbps[t.room_id]
+            if fits(): return True, list(actions.values()), ""
+        return False, [], reason
+
+    def rebalance(self, running):
+        # 自动画质：返回 ("down"/"up", 录制) 或 None，每次只调整一路 (切换后要等几秒才有新的实测码率)。
+        # 总入站码率超过上限的 auto_quality_high 时把优先级最低的一路降一档；低于 auto_quality_low 且升档后不超过 high 时，
+        # 把优先级最高的一路升一档。两个阈值之间不动作，刚切换过的录制在 auto_quality_cooldown 秒内不再调整，避免来回切换
+        if not (max_kbps := self.max_ingress_kbps()): return None
+        now, cooldown = time.monotonic(), float(self.settings.get("auto_quality_cooldown", 60))
+        kbps = {t.room_id: self.current_kbps(t) for t in running}; ingress = sum(kbps.values())
+        high, low = float(self.settings.get("auto_quality_high", 0.9)) * max_kbps, float(self.settings.get("auto_quality_low", 0.7)) * max_kbps
+        movable = [t for t in running if self.option(t.room_id, "auto_quality", False) and now - t.quality_changed >= cooldown]
+        if ingress > high:
+            for t in sorted(movable, key=lambda t: (self.priority(t.room_id), -kbps[t.room_id])):
+                if t.level < len(t.ladder) - 1: return "down", t
+        elif ingress < low:
+            for t in sorted(movable, key=lambda t: (-self.priority(t.room_id), t.level)):
+                if t.level and ingress - kbps[t.room_id] + self.estimate(t.room_id, t.ladder[t.level - 1]) <= high: return "up", t
+        return None
@@ -0,0 +1,400 @@
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .events import EventBus, StatusEvent
+from .metrics import prometheus_text
+from .service import RecorderService
+
+# --- 多进程录制 (协调进程 + 工作进程) ---
+# 协调进程不录制，只负责：把主播分片到各工作进程 (本机由它启动并监管，其他机器可以用 --worker 主动连入)、
+# 转发巡逻/录制命令、汇总状态，以及启动恢复/配额清理等只需做一次的维护。工作进程各自持有 Streamlink 会话与 FFmpeg，
+# 一个进程崩溃或卡住只影响它负责的主播，并会被重启。双方通过 TCP 上逐行的 JSON 消息通信:
+#   工作进程 → 协调进程: hello / report (每 2 秒的状态快照与录制指标) / event (状态事件) / patrol_status / recording_finished
+#   协调进程 → 工作进程: assign (负责的主播与设定) / patrol / start / stop / clear_transcodes / shutdown
+# 图形界面设置 gui_workers 时也以协调进程运行 (界面进程里没有录制)，Coordinator 因此还提供界面用到的主播管理与查询接口
+REPORT_INTERVAL = 2.0
+# 各机器自己的设定 (存储路径、接口地址) 不随 assign 下发；预算类设定按工作进程数均分
+LOCAL_SETTINGS = ("storage_volumes", "staging_dir", "min_free_gb", "api_host", "api_port", "cluster_host", "cluster_port", "cluster_token")
+SHARED_BUDGETS = ("max_recordings", "max_ingress_mbps", "request_rate", "request_burst")
+
+class JsonLink:
+    def __init__(self, sock):
+        self.sock, self.reader, self._lock = sock, sock.makefile("rb"), threading.Lock()
+
+    def send(self, message):
+        data = (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock: self.sock.sendall(data)
+
+    def messages(self):
+        # 连接断开 (包括另一端或 close() 关闭) 时结束
+        try:
+            for line in self.reader:
+                if line.strip(): yield json.loads(line)
+        except (OSError, ValueError): return
+
+    def close(self):
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        self.sock.close()
+
+def rendezvous(room_id, worker_ids):
+    # 最高随机权重哈希：工作进程增减时只有它自己的那一份主播需要换人
+    return max(worker_ids, key=lambda w: hashlib.md5(f"{w}:{room_id}".encode("utf-8")).digest())
+
+def parse_address(address, default_port):
+    host, _, port = address.rpartition(":")
+    return (host, int(port)) if host else (address, default_port)
+
+def valid_hello(hello, token):
+    # 连入的一方可能是任何程序：第一条消息必须是带字符串 worker 的 hello，令牌按 UTF-8 字节比较 (compare_digest 不接受非 ASCII 的 str)
+    if not isinstance(hello, dict) or hello.get("type") != "hello" or not isinstance(hello.get("worker"), str) or not hello["worker"]: return False
+    return hmac.compare_digest(str(hello.get("token", "")).encode("utf-8"), str(token).encode("utf-8"))
+
+# --- 协调进程 ---
+class WorkerLink:
+    def __init__(self, worker_id, link, hello):
+        self.id, self.link, self.host, self.pid = worker_id, link, hello.get("host", ""), hello.get("pid")
+        self.connected, self.seen, self.disconnected_at = True, time.monotonic(), None
+        self.snapshot, self.metrics, self.patrol_status, self.sent = {}, [], "", None
+
+    def send(self, message):
+        # 发送超时 (对方不读取) 或出错后消息可能只写了一半，直接断开，由 _serve 标记为断线
+        try: self.link.send(message); return True
+        except OSError: self.link.close(); return False
+
+    def recording_rooms(self):
+        return {s["room_id"] for s in self.snapshot.get("streamers", []) if s.get("recording")}
+
+    def to_dict(self):
+        return {"id": self.id, "host": self.host, "pid": self.pid, "connected": self.connected, "rooms": len(self.sent[0]) if self.sent else 0,
+                "recording": len(self.recording_rooms()), "patrol_status": self.patrol_status, "last_report": round(time.monotonic() - self.seen, 1)}
+
+class LocalWorker:
+    # 本机工作进程：退出 (崩溃或被判定卡住后杀掉) 时按 1, 2, 4... 秒 (最长 60 秒) 退避后重启
+    def __init__(self, coordinator, worker_id):
+        self.coordinator, self.id, self.process, self.restarts = coordinator, worker_id, None, 0
+        self.thread = threading.Thread(target=self.supervise, name=f"supervise-{worker_id}", daemon=True)
+
+    def command(self):
+        host, port = self.coordinator.address
+        return [sys.executable, "-m", "douyin_recorder", "--workdir", os.getcwd(), "--worker", f"{host}:{port}", "--worker-id", self.id, "--exit-on-disconnect"]
+
+    def supervise(self):
+        # 工作目录可能不是程序所在目录，把包的上级目录加进 PYTHONPATH
+        package_parent = str(Path(__file__).resolve().parent.parent)
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in (package_parent, os.environ.get("PYTHONPATH")) if p)}
+        delay, stop = 1, self.coordinator._stop
+        while not stop.is_set():
+            started = time.monotonic(); self.process = subprocess.Popen(self.command(), env=env)
+            code = self.process.wait()
+            if stop.is_set(): return
+            delay = 1 if time.monotonic() - started > 60 else min(delay * 2, 60); self.restarts += 1
+            print(f"[Cluster] 工作进程 {self.id} 已退出 (代码 {code})，{delay} 秒后重启 (第 {self.restarts} 次)。")
+            if stop.wait(delay): return
+
+    def kill(self, pid=None):
+        # pid: 只结束指定的那个进程 (避免误杀已经重启的新进程)
+        if self.process and self.process.poll() is None and pid in (None, self.process.pid): self.process.kill()
+
+class Coordinator:
+    # 对外提供与 RecorderService 相同的接口 (巡逻/录制/状态，以及界面用到的主播管理与查询)，无界面模式的 HTTP 接口与图形界面直接复用
+    def __init__(self, workers=2, host=None, port=None, on_patrol_status=None, on_recording_finished=None, on_history_changed=None, allow_proxy=None):
+        # maintenance 只做启动恢复、配额清理与暂存盘搬运，不巡逻也不录制；录制历史索引与工作进程共用同一个数据库
+        self.maintenance = RecorderService(on_history_changed=on_history_changed, allow_proxy=allow_proxy)
+        self.settings, self.store, self.streamers = self.maintenance.settings, self.maintenance.store, self.maintenance.streamers
+        self.history, self.storage, self.background = self.maintenance.history, self.maintenance.storage, self.maintenance.background
+        self.on_patrol_status, self.on_recording_finished, self.allow_proxy, self.events, self.room_states = on_patrol_status, on_recording_finished, allow_proxy, EventBus(), {}
+        self.workers, self.assignment, self.patrolling, self.version = {}, {}, False, 0
+        self._lock, self._stop = threading.RLock(), threading.Event()
+        if not (token := self.settings.get("cluster_token", "")):
+            # 首次以集群模式启动时生成随机令牌并保存，本机工作进程读取同一份 settings.json；其他机器需配置相同的值
+            token = self.settings["cluster_token"] = secrets.token_hex(16); self.maintenance.save_settings()
+            print("[Cluster] 已生成 cluster_token 并写入 settings.json，其他机器的工作进程需设置相同的 cluster_token。")
+        self.token = token
+        self.server = socket.create_server((host or self.settings.get("cluster_host", "127.0.0.1"), port if port is not None else int(self.settings.get("cluster_port", 8849))))
+        self.address = self.server.getsockname()[:2]
+        if self.address[0] in ("0.0.0.0", "::"): self.address = ("127.0.0.1", self.address[1])  # 本机工作进程连回环地址
+        self.local_workers = {f"local-{i}": LocalWorker(self, f"local-{i}") for i in range(workers)}
+        for target, name in ((self._accept_loop, "cluster-accept"), (self._balance_loop, "cluster-balance")): threading.Thread(target=target, name=name, daemon=True).start()
+        for local in self.local_workers.values(): local.thread.start()
+        print(f"[Cluster] 协调进程监听 {self.server.getsockname()[0]}:{self.address[1]}，本机工作进程 {workers} 个。")
+
+    # --- 连接 ---
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try: sock, _ = self.server.accept()
+            except OSError: return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        # 收发超时与心跳超时相同：工作进程每 2 秒汇报一次，超时没有数据或对方不读取都说明它卡住了
+        sock.settimeout(float(self.settings.get("cluster_heartbeat_timeout", 30)))
+        link = JsonLink(sock); messages = link.messages()
+        hello = next(messages, None)
+        if not valid_hello(hello, self.token): print("[Cluster] 拒绝了一个未通过验证的连接。"); link.close(); return
+        worker = WorkerLink(hello["worker"], link, hello)
+        with self._lock:
+            if (old := self.workers.get(worker.id)) and old.connected: old.link.close()  # 同名工作进程重连：以新连接为准
+            self.workers[worker.id] = worker
+        print(f"[Cluster] 工作进程 {worker.id} 已连接 ({worker.host}, pid {worker.pid})。")
+        worker.send({"type": "patrol", "on": self.patrolling}); self.rebalance()
+        for message in messages:
+            worker.seen = time.monotonic()
+            try: self._handle(worker, message)
+            except (AttributeError, KeyError, TypeError) as e: print(f"[Cluster] 工作进程 {worker.id} 发来无法识别的消息 ({e!r})，断开连接。"); link.close(); break
+        with self._lock:
+            if self.workers.get(worker.id) is worker: worker.connected, worker.disconnected_at = False, time.monotonic()
+        if not self._stop.is_set(): print(f"[Cluster] 工作进程 {worker.id} 已断开。")
+
+    def _handle(self, worker, message):
+        kind = message.get("type")
+        if kind == "report": worker.snapshot, worker.metrics = message.get("snapshot") or {}, message.get("metrics") or []
+        elif kind == "event":
+            event = StatusEvent(message["room_id"], message["state"], message["text"], message["color"], message["time"])
+            self.room_states[event.room_id] = event; self.events.publish(*event[:4])
+        elif kind == "patrol_status":
+            worker.patrol_status = message.get("text", "")
+            if self.on_patrol_status: self.on_patrol_status(f"[{worker.id}] {worker.patrol_status}")
+        elif kind == "recording_finished" and self.on_recording_finished: self.on_recording_finished(message["room_id"], Path(message["path"]))
+
+    # --- 分片 ---
+    def _balance_loop(self):
+        reload_at = time.monotonic() + float(self.settings.get("cluster_reload_interval", 60))
+        while not self._stop.wait(REPORT_INTERVAL):
+            if time.monotonic() >= reload_at: self.reload_streamers(); reload_at = time.monotonic() + float(self.settings.get("cluster_reload_interval", 60))
+            self.check_workers(); self.rebalance()
+
+    def check_workers(self):
+        # 超过 cluster_heartbeat_timeout 没有汇报的工作进程视为卡住：断开 (本机的直接杀掉，由监管线程重启)；
+        # 断开超过 cluster_worker_grace 秒仍未重连的，它的主播分给其他工作进程
+        # 本机工作进程断线后会自行收尾退出；连接因收发超时断开后超过 cluster_heartbeat_timeout 秒仍在运行的同样视为卡住
+        now, timeout, grace = time.monotonic(), float(self.settings.get("cluster_heartbeat_timeout", 30)), float(self.settings.get("cluster_worker_grace", 30))
+        with self._lock:
+            for worker in list(self.workers.values()):
+                if worker.connected and now - worker.seen > timeout:
+                    print(f"[Cluster] 工作进程 {worker.id} 已 {now - worker.seen:.0f} 秒没有响应，断开连接。"); worker.link.close()
+                    if worker.id in self.local_workers: self.local_workers[worker.id].kill(worker.pid)
+                elif not worker.connected:
+                    if worker.id in self.local_workers and now - worker.disconnected_at > timeout: self.local_workers[worker.id].kill(worker.pid)
+                    if now - worker.disconnected_at > grace: print(f"[Cluster] 工作进程 {worker.id} 未能重连，它负责的主播将分给其他工作进程。"); del self.workers[worker.id]
+
+    def reload_streamers(self):
+        # 设定库被其他方式修改 (导入、手动编辑设定档) 后重新分发
+        fresh = self.store.load_all()
+        if fresh == self.streamers: return
+        with self._lock: self.streamers.clear(); self.streamers.update(fresh); self.version += 1
+        print(f"[Cluster] 主播设定已更新，共 {len(fresh)} 个。")
+
+    def worker_settings(self, count):
+        settings = {k: v for k, v in self.settings.items() if k not in LOCAL_SETTINGS}
+        if self.allow_proxy is not None: settings["allow_proxy"] = self.allow_proxy  # 启动脚本的本次运行覆盖值 (抖音录制_不能开代理.py)
+        for key in SHARED_BUDGETS:
+            if settings.get(key): settings[key] = math.ceil(settings[key] / count) if key == "max_recordings" else settings[key] / count
+        return settings
+
+    def rebalance(self):
+        # 分配在锁内计算，发送在锁外进行 (与 _send/_broadcast 相同)：对方不读取时 sendall 最长阻塞到收发超时，不能卡住心跳检查与状态接口
+        pending = []
+        with self._lock:
+            candidates = sorted(self.workers)
+            if not candidates: return
+            connected = [w for w in self.workers.values() if w.connected]
+            recording = {room_id: w.id for w in connected for room_id in w.recording_rooms()}
+            for room_id in list(self.assignment):
+                if room_id not in self.streamers: del self.assignment[room_id]
+            for room_id in self.streamers:
+                # 正在录制的主播留在原工作进程，直到这场录制结束
+                self.assignment[room_id] = recording.get(room_id) or rendezvous(room_id, candidates)
+            settings = self.worker_settings(len(connected) or 1)
+            for worker in connected:
+                rooms = sorted(r for r, owner in self.assignment.items() if owner == worker.id)
+                if worker.sent == (rooms, self.version, settings): continue
+                payload = {r: {**self.streamers[r], "ffmpeg_params": self.store.ffmpeg_params(r)} for r in rooms}
+                pending.append((worker, {"type": "assign", "rooms": payload, "settings": settings}, (rooms, self.version, settings)))
+        for worker, message, sent in pending:
+            if worker.send(message): worker.sent = sent
+
+    def _send(self, room_id, message):
+        with self._lock: worker = self.workers.get(self.assignment.get(room_id))
+        return bool(worker and worker.connected and worker.send(message))
+
+    def _broadcast(self, message):
+        with self._lock: workers = [w for w in self.workers.values() if w.connected]
+        for worker in workers: worker.send(message)
+
+    # --- 与 RecorderService 相同的接口 ---
+    def is_patrolling(self):
+        return self.patrolling
+
+    def start_patrol(self):
+        self.patrolling = True; self._broadcast({"type": "patrol", "on": True})
+
+    def stop_patrol(self, timeout=None):
+        self.patrolling = False; self._broadcast({"type": "patrol", "on": False})
+
+    def is_recording(self, room_id):
+        return bool((event := self.room_states.get(room_id)) and event.active)
+
+    def start_recording(self, room_id, stream_url=None, route=None, manual=False):
+        return self._send(room_id, {"type": "start", "room_id": room_id, "manual": manual})
+
+    def stop_recording(self, room_id, timeout=None):
+        # 录制在工作进程里：timeout 不为 None 时等它发来结束状态 (最多 timeout 秒)
+        self._send(room_id, {"type": "stop", "room_id": room_id})
+        deadline = time.monotonic() + (timeout or 0)
+        while self.is_recording(room_id) and time.monotonic() < deadline: time.sleep(0.2)
+
+    def recording_metrics(self, with_samples=False):
+        # 工作进程每 2 秒汇报一次，不含历史采样
+        with self._lock: return [m for w in self.workers.values() if w.connected for m in w.metrics]
+
+    # --- 主播管理：写入设定库后提高版本号，由分片线程在 2 秒内把新的设定下发给负责的工作进程 ---
+    def add_streamer(self, room_id, remark):
+        with self._lock:
+            if room_id in self.streamers: return False
+            self.store.save(room_id, {"remark": remark}); self.streamers[room_id] = {"remark": remark}; self.version += 1
+        return True
+
+    def remove_streamer(self, room_id):
+        # 与 RecorderService 相同：不等待，正在录制的主播先用 stop_recording(room_id, timeout) 等它收尾
+        with self._lock: self.store.delete(room_id); self.streamers.pop(room_id, None); self.version += 1
+
+    def save_streamer(self, room_id):
+        with self._lock: self.store.save(room_id, self.streamers[room_id]); self.version += 1
+
+    def get_streamer_ffmpeg_params(self, room_id):
+        return self.store.ffmpeg_params(room_id)
+
+    def set_streamer_ffmpeg_params(self, room_id, params):
+        with self._lock: self.store.save_ffmpeg_params(room_id, params); self.version += 1
+
+    def save_settings(self):
+        # 下发的设定按值比较，保存后分片线程会把变化发给所有工作进程
+        self.maintenance.save_settings()
+
+    def forget_recording(self, filepath):
+        self.maintenance.forget_recording(filepath)
+
+    # --- 界面查询 (汇总各工作进程的最近一次汇报) ---
+    def proxy_allowed(self):
+        return self.maintenance.proxy_allowed()
+
+    def _reports(self, section):
+        with self._lock: return [w.snapshot.get(section) or {} for w in self.workers.values() if w.connected]
+
+    def request_status(self):
+        reports = self._reports("requests"); total = lambda key: sum(r.get(key) or 0 for r in reports)
+        requests, blocked, proxies = total("requests_recent"), total("blocked_recent"), sorted({p for r in reports for p in r.get("proxies_backing_off", [])})
+        return {"rate": total("rate"), "tokens": total("tokens") if total("rate") else None, "burst": total("burst"), "requests_recent": requests, "blocked_recent": blocked,
+                "block_rate": blocked / requests if requests else 0.0, "rooms_backing_off": total("rooms_backing_off"), "proxies_backing_off": proxies,
+                "proxy_resume_in": min((r.get("proxy_resume_in") or 0 for r in reports if r.get("proxies_backing_off")), default=0)}
+
+    def admission_usage(self):
+        reports = self._reports("admission")
+        return {key: sum(r.get(key) or 0 for r in reports) for key in ("recordings", "max_recordings", "ingress_kbps", "max_ingress_kbps")}
+
+    def transcode_jobs(self):
+        # 各工作进程的任务编号各自从 1 开始，加上工作进程名区分
+        with self._lock: workers = [w for w in self.workers.values() if w.connected]
+        return [{**job, "id": f"{w.id}:{job['id']}", "worker": w.id} for w in workers for job in w.snapshot.get("transcode", [])]
+
+    def clear_finished_transcodes(self):
+        self._broadcast({"type": "clear_transcodes"})
+
+    def snapshot(self):
+        with self._lock: workers = list(self.workers.values()); assignment = dict(self.assignment)
+        entries = {s["room_id"]: {**s, "worker": w.id} for w in workers for s in w.snapshot.get("streamers", [])}
+        streamers = [entries.get(room_id) or {"room_id": room_id, "remark": data.get("remark", ""), "recording": False, "state": "idle", "status": "未分配", "metrics": None, "worker": assignment.get(room_id)}
+                     for room_id, data in sorted(self.streamers.items())]
+        return {"patrol": {"running": self.patrolling, "status": " | ".join(f"{w.id}: {w.patrol_status}" for w in workers if w.connected)}, "streamers": streamers,
+                "transcode": self.transcode_jobs(), "storage": self.maintenance.storage.snapshot(), "admission": self.admission_usage(), "requests": self.request_status(),
+                "workers": [w.to_dict() for w in workers]}
+
+    def prometheus_metrics(self):
+        metrics = self.recording_metrics()
+        with self._lock: connected = sum(1 for w in self.workers.values() if w.connected)
+        return prometheus_text(metrics, {
+            "recordings_active": ("正在录制的主播数", len(metrics)), "recordings_stalled": ("输出停滞的录制数", sum(1 for m in metrics if m["stalled"])),
+            "streamers_total": ("主播总数", len(self.streamers)), "patrol_running": ("巡逻是否开启", self.patrolling),
+            "workers_connected": ("已连接的工作进程数", connected), "worker_restarts": ("本机工作进程累计重启次数", sum(w.restarts for w in self.local_workers.values())),
+        })
+
+    def shutdown(self, on_progress=None):
+        # 通知所有工作进程正常收尾 (结束 FFmpeg、改名录像)，本机工作进程最多等 30 秒；on_progress(已退出, 总数) 按本机工作进程计
+        self._stop.set(); self._broadcast({"type": "shutdown"})
+        deadline, started = time.monotonic() + 30, [local for local in self.local_workers.values() if local.process]
+        for done, local in enumerate(started, 1):
+            try: local.process.wait(max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired: print(f"[Cluster] 工作进程 {local.id} 未能按时退出，强制结束。"); local.kill()
+            if on_progress: on_progress(done, len(started))
+        self.server.close(); self.maintenance.shutdown()
+
+# --- 工作进程 ---
+def run_worker(address, worker_id=None, exit_on_disconnect=False):
+    # 其他机器上的工作进程断线后保留正在进行的录制并不断重连；本机的 (--exit-on-disconnect) 直接收尾退出，由协调进程重新启动
+    link, stopping = None, threading.Event()
+    def send(message):
+        if (current := link):
+            try: current.send(message)
+            except OSError: pass
+    service = RecorderService(on_patrol_status=lambda text: send({"type": "patrol_status", "text": text}), on_recording_finished=lambda room_id, path: send({"type": "recording_finished", "room_id": room_id, "path": str(path)}),
+                              load_streamers=False, maintenance=False)
+    host, port = parse_address(address, int(service.settings.get("cluster_port", 8849)))
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda *_: stopping.set())
+
+    def forward_events():
+        subscriber = service.events.subscribe()
+        while not stopping.is_set():
+            try: event = subscriber.get(timeout=1)
+            except Exception: continue
+            send({"type": "event", **event._asdict()})
+    def report():
+        while not stopping.wait(REPORT_INTERVAL): send({"type": "report", "snapshot": service.snapshot(), "metrics": service.recording_metrics()})
+    for target in (forward_events, report): threading.Thread(target=target, daemon=True).start()
+
+    def handle(message):
+        kind = message.get("type")
+        if kind == "assign":
+            service.settings.update(message.get("settings") or {}); service.assign_rooms(message.get("rooms") or {})
+            print(f"[Worker {worker_id}] 负责 {len(service.streamers)} 个主播。")
+        elif kind == "patrol": service.start_patrol() if message.get("on") else threading.Thread(target=service.stop_patrol, daemon=True).start()
+        elif kind == "start" and message.get("room_id") in service.streamers: service.start_recording(message["room_id"], manual=message.get("manual", False))
+        elif kind == "stop": threading.Thread(target=service.stop_recording, args=(message.get("room_id"),), daemon=True).start()
+        elif kind == "clear_transcodes": service.clear_finished_transcodes()
+        elif kind == "shutdown": stopping.set()
+
+    def connect_loop():
+        nonlocal link
+        delay = 1
+        while not stopping.is_set():
+            try: sock = socket.create_connection((host, port), timeout=10); sock.settimeout(None)
+            except OSError as e:
+                if exit_on_disconnect: print(f"[Worker {worker_id}] 无法连接协调进程: {e}"); break
+                print(f"[Worker {worker_id}] 无法连接协调进程 {host}:{port} ({e})，{delay} 秒后重试。"); stopping.wait(delay); delay = min(delay * 2, 60); continue
+            current = JsonLink(sock); delay = 1
+            current.send({"type": "hello", "worker": worker_id, "host": socket.gethostname(), "pid": os.getpid(), "token": service.settings.get("cluster_token", "")})
+            link = current; print(f"[Worker {worker_id}] 已连接协调进程 {host}:{port}。")
+            for message in current.messages():
+                handle(message)
+                if stopping.is_set(): break
+            link = None; current.close()
+            if stopping.is_set() or exit_on_disconnect: break
+            # 断线期间不再巡逻 (主播可能已被分给其他工作进程)，已经开始的录制继续
+            print(f"[Worker {worker_id}] 与协调进程的连接已断开，正在重连..."); threading.Thread(target=service.stop_patrol, daemon=True).start()
+        stopping.set()
+    threading.Thread(target=connect_loop, daemon=True).start()
+    while not stopping.wait(1): pass
+    print(f"[Worker {worker_id}] 正在停止巡逻与所有录制...")
+    service.shutdown()
@@ -0,0 +1,65 @@
+import json
+import os
+from pathlib import Path
+
+# --- 全局配置 ---
+CONFIG_DIR = Path("recorder_config")
+STREAMERS_DIR = CONFIG_DIR / "streamers"
+LEGACY_STREAMERS_FILE = CONFIG_DIR / "streamers.json"  # 旧版 (抖音录制_不能开代理.py) 把所有主播存在一个文件里
+SETTINGS_FILE = CONFIG_DIR / "settings.json"
+RECORDING_PATH_BASE = Path("recordings")
+LIVE_URL_TEMPLATE = "https://live.douyin.com/{room_id}"  # 压测时可指向本地模拟服务器 (settings.json 的 live_url_template)
+CHROME_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+DEFAULT_FFMPEG_PARAMS = {"c:v": "copy", "c:a": "copy", "f": "mkv"}
+FFMPEG_OPTIONS = {
+    "video_codecs": ["copy", "libx264", "libx265", "h264_nvenc", "hevc_nvenc", "h264_amf", "hevc_amf", "h264_qsv", "hevc_qsv"],
+    "audio_codecs": ["copy", "aac", "mp3", "opus"],
+    "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"],
+    "formats": ["flv","mkv", "mp4", "ts"],
+}
+# 输出格式 (文件扩展名) 与 FFmpeg 封装器名称不一致的情况
+FORMAT_MUXERS = {"mkv": "matroska", "ts": "mpegts"}
+DEFAULT_SETTINGS = {
+    "patrol_start": "20:00", "patrol_end": "02:00", "live_url_template": LIVE_URL_TEMPLATE,
+    "allow_proxy": True, "proxy_mode": "direct", "proxy_url": "", "proxy_pool": [],
+    "probe_concurrency": 8, "probe_jitter": [0.5, 3.0], "patrol_interval": 30,
+    "request_rate": 5, "request_burst": 20, "block_backoff": 60, "block_backoff_max": 1800,
+    "adaptive_patrol": True, "probe_interval_min": 15, "probe_interval_max": 600, "scheduler_tick": 5,
+    "reconnect_timeout": 60, "reconnect_max_delay": 15, "stream_url_ttl": 300, "concat_parts": False, "stall_timeout": 60, "stall_restart": True,
+    "recovery_workers": 2, "recording_supervisor": "threads", "supervisor_workers": 16,
+    "max_recordings": 0, "max_ingress_mbps": 0, "estimated_bitrate_kbps": 4000, "preempt_policy": "downgrade",
+    "quality": "best", "auto_quality": False, "auto_quality_high": 0.9, "auto_quality_low": 0.7, "auto_quality_cooldown": 60, "auto_quality_interval": 15,
+    "storage_volumes": [], "staging_dir": "", "min_free_gb": 2, "quota_gb": 0, "streamer_quota_gb": 0, "retention_interval": 300,
+    "transcode_workers": 1, "hw_encoder_slots": {"nvenc": 1, "qsv": 1, "amf": 1}, "keep_original": False,
+    "api_host": "127.0.0.1", "api_port": 8848,
+    "cluster_host": "127.0.0.1", "cluster_port": 8849, "cluster_token": "", "cluster_heartbeat_timeout": 30, "cluster_worker_grace": 30, "cluster_reload_interval": 60,
+    "gui_workers": 0,
+}
+
+# --- 工具函数 ---
+def ensure_app_dirs():
+    CONFIG_DIR.mkdir(exist_ok=True)
+    STREAMERS_DIR.mkdir(exist_ok=True)
+    RECORDING_PATH_BASE.mkdir(exist_ok=True)
+def load_json(file_path, default_data={}):
+    if not file_path.exists():
+        save_json(file_path, default_data)
+        return default_data
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except FileNotFoundError: return default_data
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        # 损坏的设定档改名保留，避免下次保存时被默认值覆盖而无从恢复
+        broken = file_path.with_name(file_path.name + ".corrupt"); os.replace(file_path, broken)
+        print(f"设定档 {file_path} 已损坏 ({e})，已备份为 {broken.name} 并使用默认值。"); return default_data
+def save_json(file_path, data):
+    # 先写同目录临时文件并 fsync，再原子替换；中途崩溃只会留下临时文件，原设定档保持完整
+    temp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4, ensure_ascii=False); f.flush(); os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+def muxer_for(file_format):
+    return FORMAT_MUXERS.get(file_format, file_format)
+
+def load_settings():
+    return load_json(SETTINGS_FILE, dict(DEFAULT_SETTINGS))
@@ -0,0 +1,45 @@
+import collections
+import queue
+import threading
+import time
+
+# --- 状态事件 ---
+# 录制线程只在状态切换时发布事件 (检查中/开播/录制中/结束/出错)，订阅者 (GUI) 在自己的线程里批量取出，
+# 只刷新发生变化的主播；没有订阅者时事件直接丢弃，无界面模式不会积压
+STATE_CHECKING, STATE_LIVE, STATE_RECORDING, STATE_ENDED, STATE_ERROR = "checking", "live", "recording", "ended", "error"
+STATE_QUEUED = "queued"  # 已开播但超出录制上限，等下一次巡逻再试
+FINAL_STATES = (STATE_ENDED, STATE_ERROR, STATE_QUEUED)
+
+class StatusEvent(collections.namedtuple("StatusEvent", "room_id state text color time")):
+    __slots__ = ()
+
+    @property
+    def active(self):
+        return self.state not in FINAL_STATES
+
+class EventBus:
+    def __init__(self):
+        self._subscribers, self._lock = [], threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.SimpleQueue()
+        with self._lock: self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers: self._subscribers.remove(subscriber)
+
+    def publish(self, room_id, state, text, color):
+        event = StatusEvent(room_id, state, text, color, time.time())
+        with self._lock: subscribers = list(self._subscribers)
+        for subscriber in subscribers: subscriber.put(event)
+
+def drain(subscriber, limit=1000):
+    # 一次最多取 limit 条，同一主播只保留最后一条
+    latest = {}
+    for _ in range(limit):
+        try: event = subscriber.get_nowait()
+        except queue.Empty: break
+        latest[event.room_id] = event
+    return latest
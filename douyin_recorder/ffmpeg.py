@@ -0,0 +1,105 @@
+import collections
+import json
+import os
+import re
+import subprocess
+import threading
+
+# --- FFmpeg/FFprobe 公共工具 ---
+def startupinfo():
+    # Windows 下隐藏 FFmpeg 的控制台窗口
+    info = subprocess.STARTUPINFO() if os.name == 'nt' else None
+    if os.name == 'nt': info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return info
+
+def probe_media(path):
+    # 返回 {"duration": 秒, "codec": "h264/aac"}；FFprobe 不可用或文件无法解析时返回空字典
+    command = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration:stream=codec_name,codec_type', '-of', 'json', str(path)]
+    try: result = subprocess.run(command, capture_output=True, startupinfo=startupinfo(), timeout=30)
+    except (OSError, subprocess.TimeoutExpired): return {}
+    if result.returncode != 0: return {}
+    try: data = json.loads(result.stdout or b"{}")
+    except ValueError: return {}
+    streams = data.get("streams", [])
+    codecs = [s.get("codec_name", "") for t in ("video", "audio") for s in streams if s.get("codec_type") == t]
+    try: duration = float(data.get("format", {}).get("duration", 0) or 0)
+    except ValueError: duration = 0.0
+    return {"duration": duration, "codec": "/".join(c for c in codecs if c)}
+
+def progress_pair(raw):
+    line = raw.decode('utf-8', 'replace').strip() if isinstance(raw, bytes) else raw.strip()
+    return line.split('=', 1) if '=' in line else None
+
+def read_progress(stream):
+    # 解析 -progress 输出：每个区块以 progress=continue/end 结尾，逐块产出 {键: 值}
+    block = {}
+    for raw in stream:
+        if not (pair := progress_pair(raw)): continue
+        key, value = pair; block[key] = value
+        if key == "progress": yield block; block = {}
+
+async def read_progress_async(stream):
+    # 同上，stream 为 asyncio 子进程的 StreamReader
+    block = {}
+    async for raw in stream:
+        if not (pair := progress_pair(raw)): continue
+        key, value = pair; block[key] = value
+        if key == "progress": yield block; block = {}
+
+# --- stderr 环形缓冲与错误分类 ---
+# 每个 FFmpeg 进程的 stderr 由后台线程读出，只保留最后 STDERR_LINES 行 (每行最多 STDERR_LINE_MAX 字符)，
+# 内存占用与录制时长无关；出错时按常见错误归类，决定是否/如何重试，并把这几行写到录像旁边的日志里
+STDERR_LINES, STDERR_LINE_MAX = 100, 500
+# (错误码, 说明, 处理方式, 匹配)；处理方式: retry 重新连接 / refresh 作废缓存的流地址后重新抓流 / rotate 换存储卷接着录 / fatal 不再重试
+FFMPEG_ERRORS = tuple((code, label, action, re.compile(pattern, re.I)) for code, label, action, pattern in (
+    ("disk_full", "磁盘已满", "rotate", r"No space left on device|Disk quota exceeded"),
+    ("disk_error", "无法写入文件", "fatal", r"Permission denied|Read-only file system"),
+    ("codec_mismatch", "编码与封装格式不兼容", "fatal", r"Could not find tag for codec|codec not currently supported in container"),
+    ("bad_option", "FFmpeg 参数错误", "fatal", r"Unrecognized option|Option \S+ not found|Error splitting the argument list|Unknown encoder"),
+    ("http_404", "流地址已失效 (404)", "refresh", r"404 Not Found|HTTP error 404|HTTP error 410"),
+    ("http_403", "流地址被拒绝 (403)", "refresh", r"403 Forbidden|HTTP error 403"),
+    ("network", "网络中断", "retry", r"Connection refused|Connection reset|timed out|Network is unreachable|End of file|Input/output error|Broken pipe"),
+    ("invalid_data", "直播流数据异常", "retry", r"Invalid data found when processing input"),
+))
+
+def classify_ffmpeg_error(lines):
+    # 从最后一行往前找，返回第一个匹配的 (错误码, 说明, 处理方式)
+    for line in reversed(lines):
+        for code, label, action, pattern in FFMPEG_ERRORS:
+            if pattern.search(line): return code, label, action
+    return None
+
+class StderrTail:
+    def __init__(self, max_lines=STDERR_LINES):
+        self.lines = collections.deque(maxlen=max_lines)
+
+    def start(self, stream):
+        thread = threading.Thread(target=self.drain, args=(stream,), daemon=True); thread.start(); return thread
+
+    def drain(self, stream):
+        # 读到 EOF 为止 (stderr 管道不读会写满，FFmpeg 随之卡住)；超长的行按块截断，不会一次读入整行
+        while (raw := stream.readline(4096)): self.add(raw)
+
+    async def drain_async(self, stream):
+        # asyncio 版本：超过 StreamReader 缓冲上限 (64 KiB) 的行整行丢弃
+        while True:
+            try: raw = await stream.readline()
+            except ValueError: continue
+            if not raw: return
+            self.add(raw)
+
+    def add(self, raw):
+        if (line := raw.decode("utf-8", "replace").rstrip()): self.lines.append(line[:STDERR_LINE_MAX])
+
+    def classify(self):
+        return classify_ffmpeg_error(list(self.lines))
+
+    def save(self, path, header):
+        try: path.write_text("\n".join([*(f"# {line}" for line in header), *self.lines]) + "\n", encoding="utf-8"); return True
+        except OSError as e: print(f"保存 FFmpeg 日志 {path.name} 失败: {e}"); return False
+
+def progress_seconds(block):
+    # out_time_us 在旧版 FFmpeg 中名为 out_time_ms (实际单位同样是微秒)
+    value = block.get("out_time_us") or block.get("out_time_ms") or "0"
+    try: return max(0.0, int(value) / 1_000_000)
+    except ValueError: return 0.0
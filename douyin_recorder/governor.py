@@ -0,0 +1,115 @@
+import collections
+import random
+import re
+import threading
+import time
+
+from .config import LIVE_URL_TEMPLATE
+from .session import resolve_stream_url
+
+# --- 请求节流与封禁退避 ---
+# 巡逻探测与录制线程抓流共用一个令牌桶 (request_rate 次/秒，最多积攒 request_burst 个)。
+# 403/429/验证码视为“被拦截”，与“未开播”分开统计；被拦截的房间与代理各自按指数退避暂停 (block_backoff 起，最长 block_backoff_max 秒)。
+# 只有自订代理地址会整体退避：直连/系统代理是所有房间共用的出口，一个房间被拦截就暂停它会让所有直连房间停止探测
+BLOCK_PATTERN = re.compile(r"\b(403|429)\b|forbidden|too many requests|captcha|验证码", re.I)
+OUTCOME_LIVE, OUTCOME_OFFLINE, OUTCOME_BLOCKED, OUTCOME_ERROR = "live", "offline", "blocked", "error"
+STATS_WINDOW = 600  # 拦截率按最近 10 分钟统计
+
+def is_blocked_error(error):
+    # Streamlink 把 HTTP 错误包装成 PluginError：沿异常链找响应状态码，找不到再按错误文本判断
+    while error is not None:
+        if getattr(getattr(error, "response", None), "status_code", None) in (403, 429) or BLOCK_PATTERN.search(str(error)): return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.burst, self.tokens, self.updated, self._lock = rate, burst, burst, time.monotonic(), threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic(); self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate); self.updated = now
+
+    def acquire(self, stop_event):
+        # 阻塞直到拿到一个令牌；等待期间 stop_event 被设置则返回 False
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1: self.tokens -= 1; return True
+                wait = (1 - self.tokens) / self.rate
+            if stop_event.wait(wait): return False
+
+    def available(self):
+        with self._lock: self._refill(); return self.tokens
+
+class RequestGovernor:
+    def __init__(self, settings):
+        self.settings, self._lock = settings, threading.Lock()
+        self.bucket = TokenBucket(self.rate() or 1.0, self.burst())
+        self.room_backoff, self.proxy_backoff = {}, {}  # 键 → (连续被拦截次数, 退避到期时间)
+        self.outcomes = collections.deque()  # (时间, 是否被拦截)
+
+    def rate(self):
+        return float(self.settings.get("request_rate", 5) or 0)
+
+    def burst(self):
+        return max(1.0, float(self.settings.get("request_burst", 20)))
+
+    def acquire(self, stop_event):
+        if not (rate := self.rate()): return not stop_event.is_set()  # 0 为不限速
+        self.bucket.rate, self.bucket.burst = rate, self.burst()  # 设定可以在运行中修改
+        return self.bucket.acquire(stop_event)
+
+    # --- 退避 ---
+    @staticmethod
+    def proxy_key(route):
+        # 不参与代理退避的路由返回 None
+        return route.url if route.mode == "custom" and route.url else None
+
+    def _blocked(self, table, key):
+        if key is None: return False
+        with self._lock: return table.get(key, (0, 0))[1] > time.time()
+
+    def room_blocked(self, room_id):
+        return self._blocked(self.room_backoff, room_id)
+
+    def proxy_blocked(self, route):
+        return self._blocked(self.proxy_backoff, self.proxy_key(route))
+
+    def _penalize(self, table, key):
+        strikes = table.get(key, (0, 0))[0] + 1
+        delay = min(float(self.settings.get("block_backoff_max", 1800)), float(self.settings.get("block_backoff", 60)) * 2 ** (strikes - 1)) * random.uniform(0.8, 1.2)
+        table[key] = (strikes, time.time() + delay); return delay
+
+    def record(self, room_id, route, outcome):
+        # 被拦截：房间与代理都进入退避；正常拿到结果 (开播或未开播)：清除退避，但代理的退避要等到期
+        # (并发中先发出的请求晚返回时不能立刻解除刚设下的退避)；其他异常不影响退避
+        now = time.time()
+        with self._lock:
+            proxy = self.proxy_key(route)
+            if outcome == OUTCOME_BLOCKED:
+                room_delay = self._penalize(self.room_backoff, room_id)
+                if proxy is None: print(f"[Governor] 房间 {room_id} 的请求被拦截，房间暂停 {room_delay:.0f} 秒。")
+                else: print(f"[Governor] 房间 {room_id} 的请求被拦截，房间暂停 {room_delay:.0f} 秒，代理 {proxy} 暂停 {self._penalize(self.proxy_backoff, proxy):.0f} 秒。")
+            elif outcome in (OUTCOME_LIVE, OUTCOME_OFFLINE):
+                self.room_backoff.pop(room_id, None)
+                if proxy is not None and self.proxy_backoff.get(proxy, (0, 0))[1] <= now: self.proxy_backoff.pop(proxy, None)
+            self.outcomes.append((now, outcome == OUTCOME_BLOCKED))
+            while self.outcomes and self.outcomes[0][0] < now - STATS_WINDOW: self.outcomes.popleft()
+
+    def resolve(self, room_id, route, template=LIVE_URL_TEMPLATE, quality="best", stop_event=None):
+        # 取令牌 → 抓流 → 记录结果；返回 (流地址, 异常, 是否被拦截)，等待令牌时被停止则返回 (None, None, False)
+        if not self.acquire(stop_event or threading.Event()): return None, None, False
+        try: stream_url = resolve_stream_url(room_id, route, template, quality)
+        except Exception as e:
+            blocked = is_blocked_error(e); self.record(room_id, route, OUTCOME_BLOCKED if blocked else OUTCOME_ERROR); return None, e, blocked
+        self.record(room_id, route, OUTCOME_LIVE if stream_url else OUTCOME_OFFLINE); return stream_url, None, False
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            recent = [blocked for t, blocked in self.outcomes if t >= now - STATS_WINDOW]
+            rooms = sum(1 for _, until in self.room_backoff.values() if until > now); proxies = [k for k, (_, until) in self.proxy_backoff.items() if until > now]
+            proxy_resume = min((until - now for _, until in self.proxy_backoff.values() if until > now), default=0)
+        return {"rate": self.rate(), "tokens": round(self.bucket.available(), 1) if self.rate() else None, "burst": self.burst(),
+                "requests_recent": len(recent), "blocked_recent": sum(recent), "block_rate": sum(recent) / len(recent) if recent else 0.0,
+                "rooms_backing_off": rooms, "proxies_backing_off": proxies, "proxy_resume_in": round(proxy_resume)}
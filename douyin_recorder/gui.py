@@ -0,0 +1,476 @@
+import tkinter as tk
+from tkinter import messagebox, ttk
+import customtkinter as ctk
+import os
+from pathlib import Path
+
+from .config import FFMPEG_OPTIONS, ensure_app_dirs, load_settings
+from .events import drain
+from .history import format_duration, format_size
+from .metrics import format_rate
+from .service import RecorderService
+
+# --- 自定义添加主播对话框 ---
+class AddStreamerDialog(ctk.CTkToplevel):
+    def __init__(self, parent):
+        super().__init__(parent); self.title("添加新主播"); self.geometry("350x200"); self.transient(parent); self.grab_set(); self.result = None
+        ctk.CTkLabel(self, text="请输入主播房间号:").pack(padx=20, pady=(20, 5))
+        self.id_entry = ctk.CTkEntry(self, width=300); self.id_entry.pack(padx=20)
+        ctk.CTkLabel(self, text="请输入备注名:").pack(padx=20, pady=(10, 5))
+        self.remark_entry = ctk.CTkEntry(self, width=300); self.remark_entry.pack(padx=20)
+        button_frame = ctk.CTkFrame(self, fg_color="transparent"); button_frame.pack(pady=20)
+        ctk.CTkButton(button_frame, text="确定", command=self.on_ok).pack(side="left", padx=10)
+        ctk.CTkButton(button_frame, text="取消", command=self.destroy).pack(side="left", padx=10)
+    def on_ok(self):
+        room_id, remark = self.id_entry.get().strip(), self.remark_entry.get().strip()
+        if room_id and remark: self.result = {"id": room_id, "remark": remark}; self.destroy()
+        else: messagebox.showwarning("提示", "房间号和备注名不能为空。", parent=self)
+
+# --- 后台任务进度窗口 ---
+class ProgressDialog(ctk.CTkToplevel):
+    # 后台线程只通过 update_progress 记录数值，窗口每 200 毫秒在 Tk 主线程刷新一次
+    def __init__(self, parent, title, text):
+        super().__init__(parent); self.title(title); self.geometry("350x120"); self.transient(parent); self.protocol("WM_DELETE_WINDOW", lambda: None); self.text, self.progress = text, (0, 0)
+        self.label = ctk.CTkLabel(self, text=text); self.label.pack(padx=20, pady=(20, 10))
+        self.bar = ctk.CTkProgressBar(self, width=300); self.bar.set(0); self.bar.pack(padx=20)
+        self.refresh()
+    def update_progress(self, done, total): self.progress = (done, total)
+    def refresh(self):
+        done, total = self.progress
+        if total: self.label.configure(text=f"{self.text} ({done}/{total})"); self.bar.set(done / total)
+        self.after(200, self.refresh)
+
+HISTORY_PAGE_SIZE = 200
+STREAMER_PAGE_SIZE = 30  # 主播列表每页行数；行控件按页复用，不随主播总数增长
+STREAMER_FILTERS = ("全部", "录制中", "空闲")
+
+# --- 主应用程序类 ---
+class DouyinRecorderApp(ctk.CTk):
+    def __init__(self, allow_proxy=None):
+        super().__init__(); self.geometry("1400x800")
+        self.patrol_status_var = tk.StringVar(value="巡逻已停止"); self.selected_room_id = None; self.history_refresh_pending = False; self.closing = False
+        self.service = self.create_service(on_patrol_status=self.patrol_status_var.set, on_recording_finished=self.on_recording_finished, on_history_changed=self.on_history_changed, allow_proxy=allow_proxy)
+        self.settings, self.streamers = self.service.settings, self.service.streamers
+        self.proxy_allowed = self.service.proxy_allowed(); self.title("抖音直播录制器 (V9 - 代理增强版)" if self.proxy_allowed else "抖音直播录制器 (V9 - 直连版)")
+        self.status_events, self.room_states = self.service.events.subscribe(), {}  # room_states: 每个主播最近一次的状态事件
+        self.streamer_frames, self.streamer_rows, self.streamer_page, self.streamer_search_job = {}, [], 0, None; self.history_sort, self.history_descending, self.history_page = "start", True, 0
+        self.ffmpeg_setting_widgets = {}; self.crf_var = tk.StringVar(value="23")
+        self.create_widgets(); self.redraw_streamer_list(); self.protocol("WM_DELETE_WINDOW", self.on_closing); self.process_status_events()
+
+    @staticmethod
+    def create_service(**callbacks):
+        # gui_workers > 0 时界面进程只作协调进程 (cluster.py)：巡逻、抓流与 FFmpeg 都在工作进程里，某一路出问题不会拖垮界面
+        ensure_app_dirs()
+        if (workers := int(load_settings().get("gui_workers", 0) or 0)) > 0:
+            from .cluster import Coordinator
+            return Coordinator(workers, **callbacks)
+        return RecorderService(**callbacks)
+
+    def create_widgets(self):
+        self.grid_columnconfigure(0, weight=2); self.grid_columnconfigure(1, weight=3); self.grid_rowconfigure(0, weight=1)
+        self.left_panel = ctk.CTkFrame(self); self.left_panel.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.left_panel.grid_rowconfigure(3, weight=1)
+        top_control_frame = ctk.CTkFrame(self.left_panel); top_control_frame.grid(row=0, column=0, pady=(10,5), padx=10, sticky="ew")
+        ctk.CTkButton(top_control_frame, text="➕ 添加主播", command=self.add_streamer).pack(side="left", padx=(0,10))
+
+        proxy_map = {"direct": "直连 (绕过系统代理)", "system": "系统代理", "custom": "自订代理"}
+        self.proxy_mode_var = tk.StringVar(value=proxy_map.get(self.settings.get("proxy_mode", "direct")))
+        ctk.CTkLabel(top_control_frame, text="代理模式:").pack(side="left")
+        self.proxy_menu = ctk.CTkOptionMenu(top_control_frame, variable=self.proxy_mode_var, values=list(proxy_map.values()), command=self.on_proxy_mode_change)
+        self.proxy_menu.pack(side="left", padx=5)
+        self.proxy_url_entry = ctk.CTkEntry(top_control_frame, placeholder_text="http://127.0.0.1:7890"); 
+        self.proxy_url_entry.pack(side="left", padx=5, expand=True, fill="x")
+        self.proxy_url_entry.insert(0, self.settings.get("proxy_url", ""))
+        self.on_proxy_mode_change(self.proxy_mode_var.get())
+        if not self.proxy_allowed:
+            # 不使用代理：隐藏代理设定，抓流与 FFmpeg 都直连 (绕过系统代理)
+            for widget in top_control_frame.winfo_children()[1:]: widget.pack_forget()
+            ctk.CTkLabel(top_control_frame, text="直连模式 (已禁用代理)").pack(side="left")
+        
+        patrol_frame = ctk.CTkFrame(self.left_panel); patrol_frame.grid(row=1, column=0, pady=(0,10), padx=10, sticky="ew")
+        self.patrol_button = ctk.CTkButton(patrol_frame, text="▶️ 开启巡逻", command=self.toggle_patrol, fg_color="green"); self.patrol_button.pack(side="left", padx=5)
+        patrol_time_frame = ctk.CTkFrame(patrol_frame); patrol_time_frame.pack(side="left", padx=10)
+        ctk.CTkLabel(patrol_time_frame, text="巡逻时间:").pack(side="left", padx=5)
+        self.patrol_start_entry = ctk.CTkEntry(patrol_time_frame, width=60); self.patrol_start_entry.pack(side="left"); self.patrol_start_entry.insert(0, self.settings.get("patrol_start", "20:00"))
+        ctk.CTkLabel(patrol_time_frame, text="-").pack(side="left", padx=5)
+        self.patrol_end_entry = ctk.CTkEntry(patrol_time_frame, width=60); self.patrol_end_entry.pack(side="left"); self.patrol_end_entry.insert(0, self.settings.get("patrol_end", "02:00"))
+        ctk.CTkLabel(patrol_time_frame, textvariable=self.patrol_status_var).pack(side="left", padx=10)
+        
+        filter_frame = ctk.CTkFrame(self.left_panel, fg_color="transparent"); filter_frame.grid(row=2, column=0, padx=10, sticky="ew")
+        self.streamer_search_entry = ctk.CTkEntry(filter_frame, placeholder_text="搜索房间号/备注"); self.streamer_search_entry.pack(side="left", expand=True, fill="x")
+        self.streamer_search_entry.bind("<KeyRelease>", lambda e: self.schedule_streamer_filter())
+        self.streamer_filter_var = tk.StringVar(value=STREAMER_FILTERS[0])
+        ctk.CTkOptionMenu(filter_frame, variable=self.streamer_filter_var, values=list(STREAMER_FILTERS), width=90, command=lambda _: self.apply_streamer_filter()).pack(side="left", padx=5)
+        self.streamer_scroll_frame = ctk.CTkScrollableFrame(self.left_panel, label_text="主播列表"); self.streamer_scroll_frame.grid(row=3, column=0, sticky="nsew", padx=10, pady=10)
+        page_frame = ctk.CTkFrame(self.left_panel, fg_color="transparent"); page_frame.grid(row=4, column=0, padx=10, pady=(0,10))
+        ctk.CTkButton(page_frame, text="◀", width=40, command=lambda: self.change_streamer_page(-1)).pack(side="left", padx=5)
+        self.streamer_page_label = ctk.CTkLabel(page_frame, text=""); self.streamer_page_label.pack(side="left", padx=5)
+        ctk.CTkButton(page_frame, text="▶", width=40, command=lambda: self.change_streamer_page(1)).pack(side="left", padx=5)
+        self.request_status_label, self.request_status = ctk.CTkLabel(self.left_panel, text="", anchor="w"), None; self.request_status_label.grid(row=5, column=0, padx=10, pady=(0,10), sticky="ew")
+        self.right_panel = ctk.CTkFrame(self); self.right_panel.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+        self.right_panel.grid_rowconfigure(0, weight=1); self.right_panel.grid_columnconfigure(0, weight=1)
+        self.tab_view = ctk.CTkTabview(self.right_panel, command=self.refresh_visible_tab); self.tab_view.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.tab_view.add("录制历史"); self.tab_view.add("FFmpeg 参数设置"); self.tab_view.add("转码队列"); self.tab_view.add("录制监控")
+        self.create_history_tab(); self.create_ffmpeg_settings_tab(); self.create_transcode_tab(); self.create_metrics_tab(); self.refresh_periodically()
+
+    def refresh_periodically(self, tick=0):
+        # 界面只有这一个定时刷新：状态栏每 2 秒；分页只刷新正在显示的那一页 (转码队列每秒、录制监控每 2 秒)，切换分页时立即刷新；窗口最小化时都不刷新
+        if self.state() != "iconic":
+            if tick % 2 == 0: self.update_request_status()
+            if (tab := self.tab_view.get()) == "转码队列" or (tab == "录制监控" and tick % 2 == 0): self.refresh_visible_tab()
+        self.after(1000, self.refresh_periodically, tick + 1)
+
+    def refresh_visible_tab(self):
+        tab = self.tab_view.get()
+        if tab == "转码队列": self.update_transcode_tree()
+        elif tab == "录制监控": self.update_metrics_tree()
+
+    def update_request_status(self):
+        # 状态栏：请求预算 (令牌桶剩余) 与最近 10 分钟的拦截率；内容没变时不重绘
+        s = self.service.request_status()
+        budget = f"请求预算 {s['tokens']:.0f}/{s['burst']:.0f} ({s['rate']:g} 次/秒)" if s["rate"] else "请求不限速"
+        # 代理退避期间经由它的房间都不会被探测，单独说明并给出最早恢复的时间
+        backoff = f"  |  退避中: {s['rooms_backing_off']} 个房间" + (f"，{len(s['proxies_backing_off'])} 个代理已暂停 ({s['proxy_resume_in']} 秒后恢复)" if s["proxies_backing_off"] else "") if s["rooms_backing_off"] or s["proxies_backing_off"] else ""
+        status = (f"{budget}  |  最近10分钟 {s['requests_recent']} 次请求，被拦截 {s['blocked_recent']} 次 ({s['block_rate']:.1%}){backoff}", "red" if s["block_rate"] >= 0.1 else ("gray10", "gray90"))
+        if status != self.request_status: self.request_status = status; self.request_status_label.configure(text=status[0], text_color=status[1])
+
+    def on_proxy_mode_change(self, choice):
+        if choice == "自订代理": self.proxy_url_entry.configure(state="normal")
+        else: self.proxy_url_entry.configure(state="disabled")
+
+    def create_history_tab(self):
+        history_tab = self.tab_view.tab("录制历史"); history_tab.grid_columnconfigure(0, weight=1); history_tab.grid_rowconfigure(0, weight=1)
+        self.history_columns = {"filename": "文件名", "start": "开始时间", "end": "结束时间", "size": "文件大小", "duration": "时长", "codec": "编码"}
+        self.history_tree = ttk.Treeview(history_tab, columns=tuple(self.history_columns), show="headings")
+        for column, text in self.history_columns.items(): self.history_tree.heading(column, text=text, command=lambda c=column: self.sort_history(c))
+        for column, width in (("size", 90), ("duration", 80), ("codec", 90)): self.history_tree.column(column, width=width, anchor="center")
+        self.history_tree.grid(row=0, column=0, columnspan=3, sticky="nsew", padx=10, pady=10)
+        button_frame = ctk.CTkFrame(history_tab); button_frame.grid(row=1, column=0, columnspan=3, pady=10)
+        ctk.CTkButton(button_frame, text="◀ 上一页", width=80, command=lambda: self.change_history_page(-1)).pack(side="left", padx=5)
+        self.history_page_label = ctk.CTkLabel(button_frame, text="第 0/0 页"); self.history_page_label.pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="下一页 ▶", width=80, command=lambda: self.change_history_page(1)).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="▶️ 播放选中视频", command=self.play_history_video).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="📂 打开文件夹", command=self.open_history_folder).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="🗑️ 删除选中视频", command=self.delete_history_video).pack(side="left", padx=5)
+
+    def create_transcode_tab(self):
+        transcode_tab = self.tab_view.tab("转码队列"); transcode_tab.grid_columnconfigure(0, weight=1); transcode_tab.grid_rowconfigure(0, weight=1)
+        self.transcode_tree = ttk.Treeview(transcode_tab, columns=("file", "room", "encoder", "priority", "status", "progress"), show="headings")
+        for column, text, width in (("file", "文件名", 320), ("room", "主播", 100), ("encoder", "编码器", 90), ("priority", "优先级", 60), ("status", "状态", 70), ("progress", "进度", 70)): self.transcode_tree.heading(column, text=text); self.transcode_tree.column(column, width=width)
+        self.transcode_tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        ctk.CTkButton(transcode_tab, text="🧹 清除已完成", command=self.clear_finished_transcodes).grid(row=1, column=0, pady=10)
+
+    def update_transcode_tree(self):
+        # 只改动有变化的行
+        jobs = {str(job["id"]): job for job in self.service.transcode_jobs()}
+        for item in self.transcode_tree.get_children():
+            if item not in jobs: self.transcode_tree.delete(item)
+        for item, job in jobs.items():
+            remark = self.streamers.get(job["room_id"], {}).get("remark", job["room_id"])
+            values = (job["file"], remark, job["encoder"], job["priority"], job["status"], f"{job['progress'] * 100:.0f}%")
+            if not self.transcode_tree.exists(item): self.transcode_tree.insert("", tk.END, iid=item, values=values)
+            elif tuple(str(v) for v in self.transcode_tree.item(item, "values")) != tuple(str(v) for v in values): self.transcode_tree.item(item, values=values)
+
+    def clear_finished_transcodes(self): self.service.clear_finished_transcodes(); self.update_transcode_tree()
+
+    def create_metrics_tab(self):
+        metrics_tab = self.tab_view.tab("录制监控"); metrics_tab.grid_columnconfigure(0, weight=1); metrics_tab.grid_rowconfigure(0, weight=1)
+        self.metrics_tree = ttk.Treeview(metrics_tab, columns=("room", "bitrate", "fps", "speed", "size", "duration", "dropped", "state"), show="headings")
+        for column, text, width in (("room", "主播", 140), ("bitrate", "码率", 90), ("fps", "帧率", 60), ("speed", "速度", 60), ("size", "本次已写入", 100), ("duration", "本段时长", 80), ("dropped", "丢帧/重复帧", 90), ("state", "状态", 90)): self.metrics_tree.heading(column, text=text); self.metrics_tree.column(column, width=width)
+        self.metrics_tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10); self.metrics_tree.tag_configure("stalled", foreground="red")
+        self.admission_label = ctk.CTkLabel(metrics_tab, text="", anchor="w"); self.admission_label.grid(row=1, column=0, sticky="ew", padx=10, pady=(0, 10))
+
+    def update_metrics_tree(self):
+        # 与转码队列相同：只改动有变化的行；停滞的录制标红
+        metrics = {m["room_id"]: m for m in self.service.recording_metrics()}
+        for item in self.metrics_tree.get_children():
+            if item not in metrics: self.metrics_tree.delete(item)
+        for room_id, m in metrics.items():
+            remark = self.streamers.get(room_id, {}).get("remark", room_id)
+            values = (remark, format_rate(m.get("bitrate_kbps")), f"{m.get('fps', 0):.1f}", f"{m.get('speed', 0):.2f}x", format_size(m["bytes_total"]), format_duration(m.get("out_seconds", 0)),
+                      f"{m.get('drop_frames', 0):.0f}/{m.get('dup_frames', 0):.0f}", f"停滞 {m['idle_seconds']:.0f} 秒" if m["stalled"] else ("正常" if not m.get("downgraded") else f"降档 ({m['quality']})"))
+            tags = ("stalled",) if m["stalled"] else ()
+            if not self.metrics_tree.exists(room_id): self.metrics_tree.insert("", tk.END, iid=room_id, values=values, tags=tags)
+            elif tuple(str(v) for v in self.metrics_tree.item(room_id, "values")) != tuple(str(v) for v in values): self.metrics_tree.item(room_id, values=values, tags=tags)
+        usage = self.service.admission_usage()
+        self.admission_label.configure(text=f"同时录制 {usage['recordings']}/{usage['max_recordings'] or '不限'}  |  入站码率 {format_rate(usage['ingress_kbps'])} / {format_rate(usage['max_ingress_kbps']) if usage['max_ingress_kbps'] else '不限'}")
+
+    def create_ffmpeg_settings_tab(self):
+        settings_tab = self.tab_view.tab("FFmpeg 参数设置")
+        settings_tab.grid_rowconfigure(2, weight=1) 
+        settings_tab.grid_columnconfigure((0, 1), weight=1)
+
+        video_frame = ctk.CTkFrame(settings_tab, border_width=1); video_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        video_frame.grid_columnconfigure(1, weight=1); ctk.CTkLabel(video_frame, text="视频设置", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, columnspan=2, pady=5)
+        ctk.CTkLabel(video_frame, text="视频编码器:").grid(row=1, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["c:v"] = ctk.CTkOptionMenu(video_frame, values=FFMPEG_OPTIONS["video_codecs"]); self.ffmpeg_setting_widgets["c:v"].grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        ctk.CTkLabel(video_frame, text="编码预设:").grid(row=2, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["preset"] = ctk.CTkOptionMenu(video_frame, values=FFMPEG_OPTIONS["presets"]); self.ffmpeg_setting_widgets["preset"].grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        ctk.CTkLabel(video_frame, text="CRF (质量):").grid(row=3, column=0, padx=10, pady=5, sticky="w"); crf_frame = ctk.CTkFrame(video_frame, fg_color="transparent"); crf_frame.grid(row=3, column=1, padx=10, pady=5, sticky="ew"); crf_frame.grid_columnconfigure(0, weight=1)
+        self.ffmpeg_setting_widgets["crf"] = ctk.CTkSlider(crf_frame, from_=0, to=51, number_of_steps=51, command=lambda v: self.crf_var.set(str(int(v)))); self.ffmpeg_setting_widgets["crf"].grid(row=0, column=0, sticky="ew"); ctk.CTkLabel(crf_frame, textvariable=self.crf_var, width=30).grid(row=0, column=1, padx=5)
+        ctk.CTkLabel(video_frame, text="视频比特率 (b:v):").grid(row=4, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["b:v"] = ctk.CTkEntry(video_frame, placeholder_text="4000k"); self.ffmpeg_setting_widgets["b:v"].grid(row=4, column=1, padx=10, pady=5, sticky="ew")
+        
+        audio_frame = ctk.CTkFrame(settings_tab, border_width=1); audio_frame.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+        audio_frame.grid_columnconfigure(1, weight=1); ctk.CTkLabel(audio_frame, text="音频设置", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, columnspan=2, pady=5)
+        ctk.CTkLabel(audio_frame, text="音频编码器:").grid(row=1, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["c:a"] = ctk.CTkOptionMenu(audio_frame, values=FFMPEG_OPTIONS["audio_codecs"]); self.ffmpeg_setting_widgets["c:a"].grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        ctk.CTkLabel(audio_frame, text="音频比特率 (b:a):").grid(row=2, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["b:a"] = ctk.CTkEntry(audio_frame, placeholder_text="128k"); self.ffmpeg_setting_widgets["b:a"].grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        
+        output_frame = ctk.CTkFrame(settings_tab, border_width=1); output_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
+        output_frame.grid_columnconfigure(1, weight=1); ctk.CTkLabel(output_frame, text="输出设置", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, columnspan=2, pady=5)
+        ctk.CTkLabel(output_frame, text="输出格式:").grid(row=1, column=0, padx=10, pady=5, sticky="w"); self.ffmpeg_setting_widgets["f"] = ctk.CTkOptionMenu(output_frame, values=FFMPEG_OPTIONS["formats"]); self.ffmpeg_setting_widgets["f"].grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        
+        # --- 【功能新增】更新、补全 FFmpeg 参数说明 ---
+        info_textbox = ctk.CTkTextbox(settings_tab, wrap="word", state="disabled", fg_color="transparent", border_spacing=5)
+        info_textbox.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
+        
+        ffmpeg_help_text = """【FFmpeg 参数搭配指南】
+
+**— 影片设定 —**
+
+* **影片编码器 (c:v):** 核心选项，决定由谁来处理影像。录制时一律直接複製原始流，选了其他编码器的主播会在每个文件录完后排入「转码队列」分页，在后台转码 (CPU 软编码数量由 transcode_workers 限制，N卡/A卡/Intel 硬件编码各自由 hw_encoder_slots 限制)。
+    * `copy`: **[最高效率/推荐]** 直接複製原始视讯流，无任何画质损失，CPU/GPU 佔用率最低。**前提是原始流格式能被输出容器支援** (抖音通常是h264，mkv/mp4都支援，99%适用)。
+    * `libx264`: **[CPU软编码]** 使用 CPU 进行编码，相容性最好。如果没有独立显卡或想压缩档案，可选此项。
+    * `h264_nvenc`/`hevc_nvenc`: **[N卡硬解]** 使用 NVIDIA 显示卡编码，大幅降低 CPU 负担。
+    * `h264_amf`/`hevc_amf`: **[A卡硬解]** 使用 AMD 显示卡编码。
+    * `h264_qsv`/`hevc_qsv`: **[Intel核显硬解]** 使用 Intel CPU 的内建显示晶片编码。
+
+* **编码预设 (Preset):** 速度与压缩率的平衡，仅在**重新编码**时有效 (即编码器不是`copy`)。
+    * `ultrafast` (超快) → CPU/GPU 负担最低，但压缩率也最低 (档案较大)。
+    * `slow` (慢) → CPU/GPU 负担较高，但压缩率更高 (档案较小)。
+    * 直播录製时，为不影响电脑性能，推荐 `veryfast` 或更快的选项。
+
+* **CRF (固定品质):** 范围 0-51，数字越小，品质越高。仅在**使用 `libx264`/`libx265`** 时有效。
+    * `18-28` 是常用范围。`18` 约为视觉无损。设为此项时，**可忽略下方的影片比特率**。
+
+* **影片比特率 (b:v):** 在**使用硬解 (NVENC/AMF/QSV) 或没设定 CRF 的 CPU 编码**时，用来控制影片流量。
+    * 范例：`4000k` (适用于 1080p), `8000k` (画质更好)。必须包含单位 k 比如4000k，小写的k
+
+**— 音讯设定 —**
+
+* **音讯编码器 (c:a):**
+    * `copy`: **[推荐]** 直接複製原始音讯流，无损且高效。
+    * `aac`: 若原始音讯有问题或想统一格式时，可选用 `aac` 进行重新编码。
+
+* **音讯比特率 (b:a):** 仅在**重新编码音讯** (如使用 `aac`) 时有效。
+    * `128k` 或 `192k` 是常用的高品质设定。必须包含单位 k，比如128k 不能写128 小写的k
+
+**— 输出设定 —**
+
+* **输出格式 (f):** 档案的容器格式。
+    * `mkv`: **[强烈推荐]** 非常强大的格式，即使录製程式意外崩溃或中断，已录製的部分大概率也能正常播放。
+    * `mp4`: 相容性最好，但结构脆弱。若录製未正常结束 (如崩溃)，**整个档案很可能会完全损毁**。
+    * `flv`/`ts`: 直播常用流格式，也可作为录製格式，稳定性优于 mp4。
+
+**—注意解释—**
+    *这是因为 ffmpeg 这个程式需要您明确地告诉它单位是「千比特每秒」(kilobits per second)。
+    *k 代表 kilo (千)。
+    *b 代表 bits (比特)。
+    *s 代表 second (秒)，但在比特率的上下文中 ffmpeg 会自动理解，所以通常省略。
+    *如果您只填写数字 4000，ffmpeg 会将其理解为 4000 bps (每秒比特)，而不是 4000 kbps (每秒千比特)，这会导致影片画质极低，几乎无法观看。4000k 和 4000 对 ffmpeg 来说相差了整整 1000 倍。
+"""
+        info_textbox.configure(state="normal")
+        info_textbox.insert("1.0", ffmpeg_help_text)
+        info_textbox.configure(state="disabled")
+
+        save_button = ctk.CTkButton(settings_tab, text="💾 保存当前主播的参数设置", command=self.save_streamer_ffmpeg_params); 
+        save_button.grid(row=3, column=0, columnspan=2, pady=10, sticky="ew", padx=10)
+        self.disable_ffmpeg_settings()
+
+    # --- 主播列表 (分页 + 行控件池) ---
+    def create_streamer_row(self):
+        # 行控件只创建一次，之后通过 bind_streamer_row 换绑到不同主播；按钮回调读取 frame.room_id
+        frame = ctk.CTkFrame(self.streamer_scroll_frame); frame.room_id, frame.remark, frame.visible, frame.shown_event = None, None, False, None
+        frame.grid_columnconfigure(1, weight=1)
+        start_button = ctk.CTkButton(frame, text="▶️", command=lambda: self.start_recording(frame.room_id), width=40, fg_color="green"); start_button.grid(row=0, column=0, padx=(5,2), pady=5); frame.start_button = start_button
+        info_frame = ctk.CTkFrame(frame, fg_color="transparent"); info_frame.grid(row=0, column=1, padx=2, pady=5, sticky="ew"); info_frame.grid_columnconfigure(1, weight=1)
+        id_label = ctk.CTkLabel(info_frame, text=""); id_label.grid(row=0, column=0, sticky="w"); frame.id_label = id_label
+        remark_entry = ctk.CTkEntry(info_frame); remark_entry.grid(row=0, column=1, padx=10, sticky="ew"); frame.remark_entry = remark_entry
+        save_remark_button = ctk.CTkButton(info_frame, text="💾", width=30, command=lambda: self.save_remark(frame.room_id, remark_entry.get())); save_remark_button.grid(row=0, column=2)
+        status_label = ctk.CTkLabel(frame, text="空闲", width=60, text_color="gray"); status_label.grid(row=0, column=2, padx=2, pady=5); frame.status_label = status_label
+        stop_button = ctk.CTkButton(frame, text="⏹️", command=lambda: self.stop_recording(frame.room_id), width=40, fg_color="red"); stop_button.grid(row=0, column=3, padx=2, pady=5); frame.stop_button = stop_button
+        del_button = ctk.CTkButton(frame, text="🗑️", command=lambda: self.remove_streamer(frame.room_id), width=30, fg_color="gray"); del_button.grid(row=0, column=4, padx=(2,5), pady=5)
+        for widget in [frame, info_frame, id_label]: widget.bind("<Button-1>", lambda e: self.on_streamer_selected(frame.room_id))
+        return frame
+    def bind_streamer_row(self, frame, room_id):
+        remark = self.streamers[room_id].get("remark", "N/A")
+        if (frame.room_id, frame.remark) != (room_id, remark):
+            frame.room_id, frame.remark = room_id, remark
+            frame.id_label.configure(text=f"ID: {room_id}"); frame.remark_entry.delete(0, tk.END); frame.remark_entry.insert(0, remark)
+        self.update_streamer_row_state(frame)
+        frame.configure(border_color="dodgerblue", border_width=2 if room_id == self.selected_room_id else 0)
+    def update_streamer_row_state(self, frame):
+        # 行上记录着当前显示的事件，相同则跳过 configure
+        event = self.room_states.get(frame.room_id)
+        if event is not None and frame.shown_event is event: return
+        frame.shown_event = event; is_active = bool(event and event.active)
+        frame.start_button.configure(state="disabled" if is_active else "normal")
+        frame.stop_button.configure(state="normal" if is_active else "disabled")
+        frame.status_label.configure(text=event.text if event else "空闲", text_color=event.color if event else "gray")
+    def is_room_active(self, room_id):
+        event = self.room_states.get(room_id)
+        return bool(event and event.active)
+    def filtered_room_ids(self):
+        keyword, status = self.streamer_search_entry.get().strip().lower(), self.streamer_filter_var.get()
+        rooms = []
+        for room_id, data in sorted(self.streamers.items()):
+            if keyword and keyword not in room_id.lower() and keyword not in data.get("remark", "").lower(): continue
+            if status != "全部" and (status == "录制中") != self.is_room_active(room_id): continue
+            rooms.append(room_id)
+        return rooms
+    def redraw_streamer_list(self):
+        # 只有当前页的主播占用行控件；已绑定同一主播的行不会重新配置文字
+        rooms = self.filtered_room_ids(); pages = max(1, -(-len(rooms) // STREAMER_PAGE_SIZE)); self.streamer_page = min(self.streamer_page, pages - 1)
+        page_rooms = rooms[self.streamer_page * STREAMER_PAGE_SIZE:(self.streamer_page + 1) * STREAMER_PAGE_SIZE]
+        while len(self.streamer_rows) < len(page_rooms): self.streamer_rows.append(self.create_streamer_row())
+        self.streamer_frames.clear()
+        for frame, room_id in zip(self.streamer_rows, page_rooms):
+            self.bind_streamer_row(frame, room_id); self.streamer_frames[room_id] = frame
+            if not frame.visible: frame.pack(fill="x", pady=5, padx=5); frame.visible = True
+        for frame in self.streamer_rows[len(page_rooms):]:
+            if frame.visible: frame.pack_forget(); frame.visible = False
+            frame.room_id = frame.remark = None
+        self.streamer_page_label.configure(text=f"第 {self.streamer_page + 1}/{pages} 页 (共 {len(rooms)}/{len(self.streamers)} 个)")
+    def change_streamer_page(self, delta):
+        self.streamer_page = max(0, self.streamer_page + delta); self.redraw_streamer_list()
+    def schedule_streamer_filter(self):
+        # 输入搜索词时防抖 200 毫秒再刷新
+        if self.streamer_search_job: self.after_cancel(self.streamer_search_job)
+        self.streamer_search_job = self.after(200, self.apply_streamer_filter)
+    def apply_streamer_filter(self):
+        self.streamer_search_job = None; self.streamer_page = 0; self.redraw_streamer_list()
+
+    def add_streamer(self):
+        dialog = AddStreamerDialog(self); self.wait_window(dialog)
+        if result := dialog.result:
+            room_id, remark = result["id"], result["remark"]
+            if not self.service.add_streamer(room_id, remark): return messagebox.showwarning("警告", f"主播 {room_id} 已存在！")
+            self.redraw_streamer_list()
+            messagebox.showinfo("成功", f"主播 {remark} ({room_id}) 添加成功！")
+            
+    def remove_streamer(self, room_id):
+        remark = self.streamers[room_id].get("remark", room_id)
+        if messagebox.askyesno("确认删除", f"确定要删除主播 {remark} ({room_id}) 吗？这将删除其设定档。"):
+            # 正在录制时要等录制线程收尾，只有这一步放到后台；删除设定与刷新列表回到 Tk 主线程，不会与列表遍历/保存备注交错
+            self.run_in_background(self.service.stop_recording, room_id, 10, on_done=lambda: self.on_streamer_removed(room_id))
+    def on_streamer_removed(self, room_id):
+        self.service.remove_streamer(room_id); self.room_states.pop(room_id, None); self.redraw_streamer_list()
+        if self.selected_room_id == room_id: self.selected_room_id = None; self.disable_ffmpeg_settings(); self.update_history_treeview(None)
+
+    def save_remark(self, room_id, new_remark):
+        if not new_remark.strip(): return messagebox.showwarning("提示", "备注不能为空。")
+        self.streamers[room_id]["remark"] = new_remark
+        self.service.save_streamer(room_id)
+        messagebox.showinfo("成功", "备注已保存。", parent=self)
+
+    def start_recording(self, room_id): self.service.start_recording(room_id, manual=True)
+    def stop_recording(self, room_id): self.run_in_background(self.service.stop_recording, room_id)
+    def run_in_background(self, func, *args, on_done=None):
+        # 可能阻塞的操作 (停止 FFmpeg、等待巡逻/录制线程) 交给服务的后台线程池；完成后轮询到结果，在 Tk 主线程执行 on_done
+        future = self.service.background.submit(func, *args)
+        self.after(100, self.poll_background, future, on_done); return future
+    def poll_background(self, future, on_done):
+        if not future.done(): return self.after(100, self.poll_background, future, on_done)
+        if error := future.exception(): print(f"后台任务失败: {error}")
+        if on_done: on_done()
+    def on_recording_finished(self, room_id, filepath):
+        # 由录制线程回调，切回 Tk 主线程刷新历史列表
+        if self.selected_room_id == room_id: self.after(100, lambda: self.update_history_treeview(room_id))
+    def on_streamer_selected(self, room_id):
+        if self.selected_room_id and self.selected_room_id in self.streamer_frames: self.streamer_frames[self.selected_room_id].configure(border_width=0)
+        self.selected_room_id = room_id
+        if room_id in self.streamer_frames: self.streamer_frames[room_id].configure(border_color="dodgerblue", border_width=2)
+        self.history_page = 0; self.update_history_treeview(room_id); self.load_ffmpeg_params_to_ui(room_id); self.enable_ffmpeg_settings()
+    def process_status_events(self):
+        # 取出录制线程发布的状态事件，只刷新状态变化且在当前页上的行
+        events = drain(self.status_events)
+        if events:
+            activity_changed = any(self.is_room_active(room_id) != event.active for room_id, event in events.items())
+            self.room_states.update(events)
+            # 按录制状态筛选时，开始/结束录制会改变当前页的成员
+            if activity_changed and self.streamer_filter_var.get() != "全部": self.redraw_streamer_list()
+            else: [self.update_streamer_row_state(self.streamer_frames[room_id]) for room_id in events if room_id in self.streamer_frames]
+        self.after(200, self.process_status_events)
+    def toggle_patrol(self):
+        if self.service.is_patrolling():
+            # 巡逻线程可能正在一轮探测中，在后台等它退出；期间按钮不可点
+            self.patrol_button.configure(text="⏳ 正在停止...", state="disabled")
+            self.run_in_background(self.service.stop_patrol, on_done=lambda: self.patrol_button.configure(text="▶️ 开启巡逻", fg_color="green", state="normal"))
+        else: self.save_settings(); self.service.start_patrol(); self.patrol_button.configure(text="⏹️ 停止巡逻", fg_color="red")
+    def save_settings(self):
+        self.settings["patrol_start"] = self.patrol_start_entry.get()
+        self.settings["patrol_end"] = self.patrol_end_entry.get()
+        proxy_map_rev = {"直连 (绕过系统代理)": "direct", "系统代理": "system", "自订代理": "custom"}
+        self.settings["proxy_mode"] = proxy_map_rev.get(self.proxy_mode_var.get(), "direct")
+        self.settings["proxy_url"] = self.proxy_url_entry.get()
+        self.service.save_settings()
+    def on_closing(self):
+        # 所有录制在后台并行停止，窗口保持响应并显示进度；全部收尾后再销毁窗口
+        if self.closing: return
+        self.closing = True; self.save_settings()
+        dialog = ProgressDialog(self, "正在退出", "正在停止录制") if any(event.active for event in self.room_states.values()) else None
+        self.run_in_background(self.service.shutdown, dialog.update_progress if dialog else None, on_done=self.destroy)
+    def disable_ffmpeg_settings(self): [w.configure(state="disabled") for w in self.ffmpeg_setting_widgets.values()]
+    def enable_ffmpeg_settings(self): [w.configure(state="normal") for w in self.ffmpeg_setting_widgets.values()]
+    def load_ffmpeg_params_to_ui(self, room_id):
+        params = self.service.get_streamer_ffmpeg_params(room_id)
+        for key, widget in self.ffmpeg_setting_widgets.items():
+            value = params.get(key, "")
+            if isinstance(widget, ctk.CTkOptionMenu): widget.set(value if value in widget.cget("values") else widget.cget("values")[0])
+            elif isinstance(widget, ctk.CTkEntry): widget.delete(0, tk.END); widget.insert(0, str(value))
+            elif isinstance(widget, ctk.CTkSlider): widget.set(float(value) if value and str(value).replace('.', '', 1).isdigit() else 23); self.crf_var.set(str(int(widget.get())))
+    def save_streamer_ffmpeg_params(self):
+        if not self.selected_room_id: return messagebox.showwarning("提示", "请先在左侧列表中点击选择一个主播。")
+        params = {}
+        for key, widget in self.ffmpeg_setting_widgets.items():
+            value = (widget.get() if isinstance(widget, (ctk.CTkOptionMenu, ctk.CTkEntry)) else str(int(widget.get())))
+            if value: params[key] = value
+        self.service.set_streamer_ffmpeg_params(self.selected_room_id, params)
+        messagebox.showinfo("成功", f"主播 {self.streamers[self.selected_room_id]['remark']} 的参数已保存。")
+    def update_history_treeview(self, room_id):
+        # 只从索引读取当前一页；首次选中某主播时在后台与磁盘对账，有变化再刷新
+        focused = self.history_tree.focus()
+        for item in self.history_tree.get_children(): self.history_tree.delete(item)
+        if not room_id: self.history_page_label.configure(text="第 0/0 页"); return
+        history = self.service.history
+        pages = max(1, -(-history.count(room_id) // HISTORY_PAGE_SIZE)); self.history_page = min(self.history_page, pages - 1)
+        for row in history.query(room_id, self.history_sort, self.history_descending, HISTORY_PAGE_SIZE, self.history_page * HISTORY_PAGE_SIZE):
+            self.history_tree.insert("", tk.END, iid=row["path"], values=(row["filename"], row["start"] or "", row["end"] or "", format_size(row["size"]), format_duration(row["duration"]), row["codec"] or ""))
+        self.history_page_label.configure(text=f"第 {self.history_page + 1}/{pages} 页")
+        if focused and self.history_tree.exists(focused): self.history_tree.focus(focused); self.history_tree.selection_set(focused)
+        history.sync_room_async(room_id)
+    def on_history_changed(self, room_id):
+        # 由后台对账/ffprobe 线程回调；合并 0.5 秒内的多次变化，只刷新一次
+        if self.selected_room_id != room_id or self.history_refresh_pending: return
+        self.history_refresh_pending = True; self.after(500, self.refresh_history_if_selected, room_id)
+    def refresh_history_if_selected(self, room_id):
+        self.history_refresh_pending = False
+        if self.selected_room_id == room_id: self.update_history_treeview(room_id)
+    def sort_history(self, column):
+        if self.history_sort == column: self.history_descending = not self.history_descending
+        else: self.history_sort, self.history_descending = column, column in ("start", "end", "size", "duration")
+        self.history_page = 0; self.update_history_treeview(self.selected_room_id)
+    def change_history_page(self, delta):
+        if not self.selected_room_id: return
+        self.history_page = max(0, self.history_page + delta); self.update_history_treeview(self.selected_room_id)
+    def play_history_video(self):
+        if not self.selected_room_id: return messagebox.showwarning("提示", "请先选择主播。")
+        if not (selected_item := self.history_tree.focus()): return messagebox.showwarning("提示", "请在历史记录中选择一个视频文件。")
+        filepath = Path(selected_item)
+        if filepath.exists(): os.startfile(filepath)
+        else: messagebox.showerror("错误", "文件不存在！")
+    def open_history_folder(self):
+        if not self.selected_room_id: return messagebox.showwarning("提示", "请先选择主播。")
+        # 录像可能分布在多个存储卷上：优先打开选中录像所在的文件夹
+        if (selected_item := self.history_tree.focus()): return os.startfile(Path(selected_item).parent)
+        folders = self.service.storage.room_folders(self.selected_room_id)
+        folder_path = folders[0] if folders else self.service.storage.volumes()[0] / self.selected_room_id; folder_path.mkdir(parents=True, exist_ok=True); os.startfile(folder_path)
+    def delete_history_video(self):
+        if not self.selected_room_id: return messagebox.showwarning("提示", "请先选择主播。")
+        if not (selected_item := self.history_tree.focus()): return messagebox.showwarning("提示", "请在历史记录中选择一个视频文件。")
+        filepath = Path(selected_item)
+        if messagebox.askyesno("确认删除", f"确定要永久删除文件 {filepath.name} 吗？"):
+            try: os.remove(filepath); self.service.forget_recording(filepath); messagebox.showinfo("成功", "文件已删除。"); self.update_history_treeview(self.selected_room_id)
+            except Exception as e: messagebox.showerror("错误", f"删除文件失败: {e}")
+
+# --- 程序入口 (抖音录制.py / 抖音录制_不能开代理.py) ---
+def main(allow_proxy=None):
+    # allow_proxy: 启动脚本指定本次运行是否允许代理 (False 为旧版“不能开代理”脚本)，只在本次运行有效，不写入 settings.json；None 时使用设定档
+    ctk.set_appearance_mode("System"); ctk.set_default_color_theme("blue"); app = DouyinRecorderApp(allow_proxy); app.mainloop()
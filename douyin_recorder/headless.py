@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import ensure_app_dirs
+from .service import RecorderService
+from .store import StreamerStore
+
+# --- 无界面模式 (服务器/无显示器环境) ---
+# 只依赖核心包，不会导入 tkinter/customtkinter；状态与控制通过本地 HTTP/JSON 接口提供:
+#   GET  /status                       巡逻与所有主播的状态
+#   GET  /metrics                      Prometheus 文本格式的录制指标 (/metrics.json 为 JSON，含最近采样)
+#   POST /patrol/start | /patrol/stop  开启/停止巡逻
+#   POST /recordings/<房间号>/start|stop 手动开始/停止录制
+# --workers N 时本进程作为协调进程 (cluster.py)，录制在 N 个工作进程里进行，接口不变；--worker 则作为工作进程连入协调进程
+class ApiHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code); self.send_header("Content-Type", "application/json; charset=utf-8"); self.send_header("Content-Length", str(len(body))); self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path in ("", "/status"): return self._send_json(200, self.service.snapshot())
+        if path == "/metrics.json": return self._send_json(200, self.service.recording_metrics(with_samples=True))
+        if path == "/metrics":
+            body = self.service.prometheus_metrics().encode("utf-8")
+            self.send_response(200); self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8"); self.send_header("Content-Length", str(len(body))); self.end_headers()
+            return self.wfile.write(body)
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = [p for p in self.path.split("/") if p]
+        if parts == ["patrol", "start"]: self.service.start_patrol(); return self._send_json(200, {"ok": True})
+        if parts == ["patrol", "stop"]: threading.Thread(target=self.service.stop_patrol, daemon=True).start(); return self._send_json(202, {"ok": True})
+        if len(parts) == 3 and parts[0] == "recordings" and parts[2] in ("start", "stop"):
+            room_id = parts[1]
+            if room_id not in self.service.streamers: return self._send_json(404, {"error": f"未知主播 {room_id}"})
+            if parts[2] == "start": self.service.start_recording(room_id, manual=True)
+            else: threading.Thread(target=self.service.stop_recording, args=(room_id,), daemon=True).start()
+            return self._send_json(202, {"ok": True})
+        self._send_json(404, {"error": "not found"})
+
+    def log_message(self, format, *args): pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="douyin_recorder", description="抖音直播录制器 - 无界面模式")
+    parser.add_argument("--workdir", help="包含 recorder_config/ 与 recordings/ 的工作目录 (默认当前目录)")
+    parser.add_argument("--host", help="状态接口监听地址 (默认读取 settings.json 的 api_host)")
+    parser.add_argument("--port", type=int, help="状态接口端口 (默认读取 settings.json 的 api_port，0 表示不开启)")
+    parser.add_argument("--no-patrol", action="store_true", help="启动时不自动开启巡逻")
+    parser.add_argument("--import-streamers", metavar="DIR", help="从文件夹导入 {房间号}.json 主播设定档后退出")
+    parser.add_argument("--export-streamers", metavar="DIR", help="把所有主播导出为 {房间号}.json 设定档后退出")
+    parser.add_argument("--workers", type=int, help="多进程模式：作为协调进程启动，并在本机启动 N 个录制工作进程 (0 表示只接受其他机器连入)")
+    parser.add_argument("--cluster-listen", metavar="HOST:PORT", help="协调进程监听地址 (默认读取 settings.json 的 cluster_host/cluster_port)")
+    parser.add_argument("--worker", metavar="HOST:PORT", help="作为录制工作进程连接到协调进程")
+    parser.add_argument("--worker-id", help="工作进程名称 (默认 主机名-进程号)")
+    parser.add_argument("--exit-on-disconnect", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.workdir: os.chdir(args.workdir)
+    if args.worker:
+        from .cluster import run_worker  # 多进程模式的模块只在用到时加载
+        return run_worker(args.worker, args.worker_id, args.exit_on_disconnect)
+    if args.import_streamers or args.export_streamers:
+        ensure_app_dirs(); store = StreamerStore()
+        if args.import_streamers: store.import_dir(args.import_streamers)
+        if args.export_streamers: print(f"[Headless] 已导出 {store.export_dir(args.export_streamers)} 个主播设定档到 {args.export_streamers}")
+        return
+
+    if args.workers is not None:
+        from .cluster import Coordinator
+        listen_host, listen_port = args.cluster_listen.rpartition(":")[::2] if args.cluster_listen else (None, None)
+        service = Coordinator(args.workers, listen_host or None, int(listen_port) if listen_port else None, on_patrol_status=lambda text: print(f"[Patrol] {text}"))
+    else: service = RecorderService(on_patrol_status=lambda text: print(f"[Patrol] {text}"))
+    host = args.host or service.settings.get("api_host", "127.0.0.1")
+    port = args.port if args.port is not None else int(service.settings.get("api_port", 8848))
+    server = None
+    if port:
+        ApiHandler.service = service
+        server = ThreadingHTTPServer((host, port), ApiHandler); server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[Headless] 状态接口: http://{host}:{server.server_address[1]}/status")
+    print(f"[Headless] 已加载 {len(service.streamers)} 个主播。")
+    if not args.no_patrol: service.start_patrol()
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda *_: stopping.set())
+    while not stopping.wait(1): pass
+    print("[Headless] 正在停止巡逻与所有录制...")
+    service.shutdown()
+    if server: server.shutdown()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .config import CONFIG_DIR, RECORDING_PATH_BASE
+from .ffmpeg import probe_media
+from .scheduler import parse_recording_times
+
+# --- 录制历史索引 ---
+# 录像信息 (起止时间/大小/时长/编码) 存入 SQLite，历史列表按页查询，不再每次点击都 glob + stat 整个文件夹；
+# 录制线程定稿文件时增量写入，时长与编码由后台 ffprobe 补全，已有文件夹在后台与索引对账
+HISTORY_DB = CONFIG_DIR / "history.sqlite3"
+VIDEO_SUFFIXES = ('.mkv', '.mp4', '.flv', '.ts')
+SORT_COLUMNS = {"filename": "filename", "start": "start_time", "end": "end_time", "size": "size", "duration": "duration", "codec": "codec"}
+DISPLAY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def is_recording_file(path):
+    return path.suffix in VIDEO_SUFFIXES and '_to_' in path.stem
+
+def format_size(size):
+    return f"{(size or 0) / (1024*1024):.2f} MB"
+
+def format_duration(seconds):
+    if seconds is None: return "读取中..."
+    if not seconds: return "-"
+    seconds = int(seconds); return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class RecordingIndex:
+    def __init__(self, db_path=HISTORY_DB, roots=lambda: [RECORDING_PATH_BASE], probe_workers=2, on_changed=None):
+        # roots() 返回所有录像根目录 (暂存盘 + 各存储卷)；on_changed(room_id) 在后台对账或 ffprobe 补全后调用，界面据此刷新
+        self.roots, self.on_changed = roots, on_changed; self._lock = threading.Lock()
+        # 集群模式下本机的多个工作进程共用这个索引：WAL 让读写互不阻塞，写入冲突时最多等待 30 秒而不是立即报 database is locked
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # duration 为 NULL 表示尚未 ffprobe；探测失败记为 0，避免反复重试
+            self._conn.execute("CREATE TABLE IF NOT EXISTS recordings (path TEXT PRIMARY KEY, room_id TEXT NOT NULL, filename TEXT NOT NULL, start_time TEXT, end_time TEXT, size INTEGER, mtime REAL, duration REAL, codec TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recordings_room_start ON recordings (room_id, start_time)")
+        self._prober = ThreadPoolExecutor(max_workers=max(1, probe_workers), thread_name_prefix="history-probe")
+        self._syncer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-sync")
+        self._probing, self._synced = set(), set()
+
+    @staticmethod
+    def _row(room_id, path, stat):
+        times = parse_recording_times(path.name)
+        start, end = (t.strftime(DISPLAY_TIME_FORMAT) for t in times) if times else (None, None)
+        return (str(Path(path).resolve()), room_id, path.name, start, end, stat.st_size, stat.st_mtime)
+
+    def add(self, room_id, path, probe=True):
+        path = Path(path)
+        try: row = self._row(room_id, path, path.stat())
+        except OSError: return
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO recordings (path, room_id, filename, start_time, end_time, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                               "ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime, duration=NULL, codec=NULL", row)
+        if probe: self._queue_probe(room_id, row[0])
+
+    def remove(self, path):
+        with self._lock, self._conn: self._conn.execute("DELETE FROM recordings WHERE path = ?", (str(Path(path).resolve()),))
+
+    def move(self, src, dest):
+        # 录像从暂存盘移到存储卷后只改路径，已探测的时长/编码保留；目标路径已被对账登记时以原记录替换它
+        with self._lock, self._conn: self._conn.execute("UPDATE OR REPLACE recordings SET path = ? WHERE path = ?", (str(Path(dest).resolve()), str(Path(src).resolve())))
+
+    def notify(self, room_id):
+        if self.on_changed: self.on_changed(room_id)
+
+    def _queue_probe(self, room_id, path):
+        with self._lock:
+            if path in self._probing: return
+            self._probing.add(path)
+        try: self._prober.submit(self._probe, room_id, path)
+        except RuntimeError: pass  # 已关闭
+
+    def _probe(self, room_id, path):
+        try: info = probe_media(path)
+        finally:
+            with self._lock: self._probing.discard(path)
+        with self._lock, self._conn: self._conn.execute("UPDATE recordings SET duration = ?, codec = ? WHERE path = ?", (info.get("duration", 0.0), info.get("codec", ""), path))
+        self.notify(room_id)
+
+    # --- 与磁盘对账 ---
+    def sync_room(self, room_id):
+        # 扫描文件夹 (scandir 自带 stat 缓存)，只写入新增/变化的文件并删除已不存在的记录；返回是否有变化
+        on_disk = {}
+        for root in self.roots():
+            try:
+                with os.scandir(root / room_id) as entries:
+                    for entry in entries:
+                        path = Path(entry.path)
+                        if entry.is_file() and is_recording_file(path): on_disk[str(path.resolve())] = (path, entry.stat())
+            except OSError: pass
+        with self._lock: known = {p: (size, mtime) for p, size, mtime in self._conn.execute("SELECT path, size, mtime FROM recordings WHERE room_id = ?", (room_id,))}
+        changed = [self._row(room_id, path, stat) for key, (path, stat) in on_disk.items() if known.get(key) != (stat.st_size, stat.st_mtime)]
+        missing = [(p,) for p in known if p not in on_disk]
+        if changed or missing:
+            with self._lock, self._conn:
+                self._conn.executemany("INSERT INTO recordings (path, room_id, filename, start_time, end_time, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                                       "ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime, duration=NULL, codec=NULL", changed)
+                self._conn.executemany("DELETE FROM recordings WHERE path = ?", missing)
+        with self._lock: pending = [p for (p,) in self._conn.execute("SELECT path FROM recordings WHERE room_id = ? AND duration IS NULL", (room_id,))]
+        for path in pending: self._queue_probe(room_id, path)
+        self._synced.add(room_id)
+        if changed or missing: self.notify(room_id)
+        return bool(changed or missing)
+
+    def sync_room_async(self, room_id, force=False):
+        # 每个主播每次启动只对账一次 (force=True 时强制重扫)，之后靠录制线程增量写入
+        if room_id in self._synced and not force: return
+        self._synced.add(room_id)
+        try: self._syncer.submit(self.sync_room, room_id)
+        except RuntimeError: pass
+
+    # --- 查询 ---
+    def count(self, room_id):
+        with self._lock: return self._conn.execute("SELECT COUNT(*) FROM recordings WHERE room_id = ?", (room_id,)).fetchone()[0]
+
+    def query(self, room_id, sort="start", descending=True, limit=200, offset=0):
+        column = SORT_COLUMNS.get(sort, "start_time"); direction = "DESC" if descending else "ASC"
+        sql = f"SELECT path, filename, start_time, end_time, size, duration, codec FROM recordings WHERE room_id = ? ORDER BY {column} {direction}, filename {direction} LIMIT ? OFFSET ?"
+        with self._lock: rows = self._conn.execute(sql, (room_id, limit, offset)).fetchall()
+        return [dict(zip(("path", "filename", "start", "end", "size", "duration", "codec"), row)) for row in rows]
+
+    def usage(self):
+        # {房间号: 已索引录像总字节数}
+        with self._lock: return dict(self._conn.execute("SELECT room_id, COALESCE(SUM(size), 0) FROM recordings GROUP BY room_id"))
+
+    def oldest(self, room_id=None, limit=1000):
+        # 按开始时间从早到晚 (无法解析文件名的按修改时间)，返回 [(路径, 大小, 房间号)]
+        where, params = ("WHERE room_id = ?", (room_id,)) if room_id else ("", ())
+        with self._lock: return self._conn.execute(f"SELECT path, size, room_id FROM recordings {where} ORDER BY COALESCE(start_time, datetime(mtime, 'unixepoch', 'localtime')), filename LIMIT ?", (*params, limit)).fetchall()
+
+    def close(self):
+        # 只停止后台任务；连接保持打开，退出前仍在定稿的录制线程可以继续写入 (每次写入都已提交)
+        self._syncer.shutdown(wait=False, cancel_futures=True); self._prober.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,74 @@
+import collections
+import re
+import threading
+import time
+
+# --- 录制指标 ---
+# 录制时 FFmpeg 带 -progress pipe:1，后台线程逐块解析 (约每 0.5 秒一块)，每个录制只保留最近几分钟的采样；
+# 输出大小与时间戳长时间不增长则判定为“停滞”
+SAMPLE_INTERVAL = 2.0
+SAMPLE_HISTORY = 150  # 150 x 2 秒 = 最近 5 分钟
+NUMBER_RE = re.compile(r"[-+]?\d+(?:\.\d+)?")
+PROMETHEUS_METRICS = (
+    ("bitrate_kbps", "当前输出码率 (kbit/s)"), ("fps", "当前帧率"), ("speed", "处理速度 (1.0 = 实时)"),
+    ("total_size", "本段已写入字节数"), ("out_seconds", "本段已录制时长 (秒)"),
+    ("drop_frames", "丢弃帧数"), ("dup_frames", "重复帧数"), ("stalled", "输出是否停滞 (1 = 停滞)"),
+)
+
+def _number(value):
+    # "2534.2kbits/s"、"1.01x"、"N/A" 之类的值只取数字部分
+    match = NUMBER_RE.search(value or "")
+    return float(match.group()) if match else None
+
+class RecordingMetrics:
+    def __init__(self, room_id, stall_seconds=60):
+        self.room_id, self.stall_seconds = room_id, stall_seconds
+        self.samples, self.latest, self._lock = collections.deque(maxlen=SAMPLE_HISTORY), {}, threading.Lock()
+        self.stalled, self.bytes_before_part = False, 0
+        self.start_part()
+
+    def start_part(self):
+        # 新的一段从头计时；累计字节数跨段保留
+        with self._lock:
+            now = time.monotonic(); self.bytes_before_part += int(self.latest.get("total_size") or 0)
+            self.latest, self.stalled, self._last_growth, self._last_sample, self._progress = {}, False, now, 0.0, (0, 0)
+
+    def update(self, block):
+        values = {"bitrate_kbps": _number(block.get("bitrate")), "fps": _number(block.get("fps")), "speed": _number(block.get("speed")),
+                  "total_size": _number(block.get("total_size")), "drop_frames": _number(block.get("drop_frames")), "dup_frames": _number(block.get("dup_frames"))}
+        out_us = block.get("out_time_us") or block.get("out_time_ms")
+        values["out_seconds"] = (_number(out_us) or 0) / 1_000_000 if out_us else None
+        values = {k: v for k, v in values.items() if v is not None}
+        now = time.monotonic(); progress = (values.get("total_size", 0), values.get("out_seconds", 0))
+        with self._lock:
+            if progress > self._progress: self._last_growth, self._progress, self.stalled = now, progress, False
+            self.latest.update(values)
+            if now - self._last_sample >= SAMPLE_INTERVAL: self._last_sample = now; self.samples.append((time.time(), values))
+
+    def check_stall(self):
+        # 由录制线程定期调用；返回本次是否刚刚进入停滞状态
+        with self._lock:
+            if self.stalled or time.monotonic() - self._last_growth < self.stall_seconds: return False
+            self.stalled = True; return True
+
+    def to_dict(self, with_samples=False):
+        with self._lock:
+            data = {"room_id": self.room_id, **self.latest, "stalled": self.stalled, "bytes_total": self.bytes_before_part + int(self.latest.get("total_size") or 0),
+                    "idle_seconds": round(time.monotonic() - self._last_growth, 1)}
+            if with_samples: data["samples"] = [{"time": t, **v} for t, v in self.samples]
+        return data
+
+def format_rate(kbps):
+    if kbps is None: return "-"
+    return f"{kbps / 1000:.2f} Mbps" if kbps >= 1000 else f"{kbps:.0f} kbps"
+
+def prometheus_text(metrics, extra=None):
+    # Prometheus 文本格式 (0.0.4)；extra 为不带标签的全局指标 {名称: (说明, 值)}
+    lines = []
+    for key, help_text in PROMETHEUS_METRICS:
+        name = f"douyin_recording_{key}"; lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for data in metrics:
+            value = data.get(key)
+            if value is not None: lines.append(f'{name}{{room_id="{data["room_id"]}"}} {float(value):g}')
+    for name, (help_text, value) in (extra or {}).items(): lines += [f"# HELP douyin_{name} {help_text}", f"# TYPE douyin_{name} gauge", f"douyin_{name} {float(value):g}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,43 @@
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import LIVE_URL_TEMPLATE
+
+# --- 并发探测引擎 ---
+ProbeResult = namedtuple("ProbeResult", ["room_id", "is_live", "stream_url", "error", "elapsed", "route", "blocked"])
+
+class ProbeEngine:
+    def __init__(self, settings, proxy_router, governor):
+        self.settings, self.proxy_router, self.governor = settings, proxy_router, governor
+
+    def probe(self, room_id, stop_event):
+        # 返回 None 表示本轮跳过 (等待令牌时被停止，或该路由的代理正在退避)
+        started, route = time.monotonic(), self.proxy_router.route_for(room_id)
+        if self.governor.proxy_blocked(route): return None
+        stream_url, error, blocked = self.governor.resolve(room_id, route, self.settings.get("live_url_template", LIVE_URL_TEMPLATE), stop_event=stop_event)
+        if stream_url is None and error is None and stop_event.is_set(): return None
+        return ProbeResult(room_id, bool(stream_url), stream_url, error, time.monotonic() - started, route, blocked)
+
+    def _jittered_probe(self, room_id, stop_event):
+        jitter_min, jitter_max = self.settings.get("probe_jitter", [0.5, 3.0])
+        if stop_event.wait(random.uniform(jitter_min, jitter_max)): return None
+        return self.probe(room_id, stop_event)
+
+    def sweep(self, room_ids, stop_event, on_result):
+        # 并发检查一批房间，on_result 在调用者线程中按完成顺序依次回调；返回本轮统计
+        # 单个房间探测或回调 (开始录制) 出错只记录并跳过，不能让巡逻线程退出
+        started, probed, live, blocked = time.monotonic(), 0, 0, 0
+        concurrency = max(1, int(self.settings.get("probe_concurrency", 8)))
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="probe") as pool:
+            futures = [pool.submit(self._jittered_probe, room_id, stop_event) for room_id in room_ids]
+            for future in as_completed(futures):
+                try: result = future.result()
+                except Exception as e: print(f"[Patrol] 探测出错: {e}"); continue
+                if result is None: continue
+                probed += 1; live += result.is_live; blocked += result.blocked
+                try: on_result(result)
+                except Exception as e: print(f"[{result.room_id}] 处理探测结果出错: {e}")
+        elapsed = time.monotonic() - started
+        return {"probed": probed, "live": live, "blocked": blocked, "elapsed": elapsed, "rate": probed / elapsed if elapsed > 0 else 0.0}
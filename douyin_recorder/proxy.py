@@ -0,0 +1,52 @@
+import os
+import threading
+from collections import namedtuple
+
+# --- 代理路由 ---
+# 代理选择绑定在每个会话/请求上，不再改写进程级的 http_proxy/https_proxy 环境变数，并发探测无需全局锁
+ProxyRoute = namedtuple("ProxyRoute", ["mode", "url"])
+PROXY_MODE_NAMES = {"direct": "直连", "system": "系统", "custom": "自订"}
+PROXY_ENV_KEYS = ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY", "all_proxy", "ALL_PROXY")
+
+class ProxyRouter:
+    # 主播设定档中的 "proxy" 优先 (字符串视为自订代理地址，或 {"mode": ..., "url": ...})，否则使用全域设定
+    # 全域自订模式下若配置了 proxy_pool，则按轮询方式为每次请求分配代理 (跳过正在退避的代理，全部退避时照常轮询)
+    # allow_proxy: 启动脚本给的本次运行覆盖值 (不写入 settings.json)；None 时使用设定档的 allow_proxy
+    def __init__(self, settings, streamers, is_blocked=lambda route: False, allow_proxy=None):
+        self.settings, self.streamers, self.is_blocked, self.allow_proxy = settings, streamers, is_blocked, allow_proxy
+        self._lock, self._next = threading.Lock(), 0
+
+    def _next_pool_url(self):
+        pool = [u for u in self.settings.get("proxy_pool", []) if u] or [self.settings.get("proxy_url", "")]
+        with self._lock:
+            for _ in range(len(pool)):
+                url = pool[self._next % len(pool)]; self._next += 1
+                if not self.is_blocked(ProxyRoute("custom", url)): break
+        return url
+
+    def proxy_allowed(self):
+        return self.settings.get("allow_proxy", True) if self.allow_proxy is None else self.allow_proxy
+
+    def route_for(self, room_id):
+        if not self.proxy_allowed(): return ProxyRoute("direct", "")  # 旧版“不能开代理”：一律直连
+        override = self.streamers.get(room_id, {}).get("proxy")
+        if isinstance(override, str) and override: return ProxyRoute("custom", override)
+        if isinstance(override, dict) and override.get("mode"): mode, url = override["mode"], override.get("url", "")
+        else: mode, url = self.settings.get("proxy_mode", "direct"), ""
+        if mode == "custom": url = url or self._next_pool_url()
+        if mode == "custom" and not url: mode = "system"  # 自订模式但没有填地址时，与旧版一样退回系统代理
+        return ProxyRoute(mode if mode in ("direct", "system", "custom") else "direct", url if mode == "custom" else "")
+
+def configure_session_proxy(session, route):
+    # requests 在 trust_env=True 时环境变数中的代理会盖过会话上设定的代理，所以直连/自订都要关闭 trust_env
+    if route.mode == "system": return
+    session.http.trust_env = False; session.http.proxies.clear()
+    if route.mode == "custom": session.set_option("http-proxy", route.url)
+
+def ffmpeg_proxy_args(route):
+    return ['-http_proxy', route.url] if route.mode == "custom" else []
+
+def ffmpeg_env(route):
+    # 直连模式下 FFmpeg 也不能读取系统代理环境变数，只给子进程一份去掉代理的环境副本
+    if route.mode != "direct": return None
+    return {k: v for k, v in os.environ.items() if k not in PROXY_ENV_KEYS}
@@ -0,0 +1,330 @@
+import csv
+import datetime
+import os
+import subprocess
+import threading
+import time
+
+from .admission import quality_ladder
+from .config import muxer_for
+from .events import STATE_CHECKING, STATE_ENDED, STATE_ERROR, STATE_LIVE, STATE_RECORDING
+from .ffmpeg import StderrTail, read_progress, startupinfo
+from .metrics import RecordingMetrics
+from .proxy import PROXY_MODE_NAMES, ProxyRoute, ffmpeg_env, ffmpeg_proxy_args
+from .session import STREAM_URL_CACHE, live_url_for
+
+def now_str():
+    return datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+
+# --- 录制 (线程模式与 asyncio 模式共用的部分) ---
+# 抓流、分段命名、错误分类、合并等逻辑都在这里；等待 FFmpeg、读取输出与停止由 RecordingThread (本文件) 或
+# AsyncRecording (supervisor.py) 实现。这里的方法都可能阻塞 (网络/磁盘)，asyncio 模式下放到线程池调用
+class Recording:
+    def __init__(self, service, room_id, ffmpeg_params, stream_url=None, route=None):
+        self.service, self.room_id, self.ffmpeg_params = service, room_id, ffmpeg_params
+        self.live_url, self.process, self._stop_event = live_url_for(room_id, self.option("live_url_template")), None, threading.Event()
+        self._process_lock = threading.Lock()  # 停止与启动 FFmpeg 互斥：停止要么发生在启动前 (不再启动)，要么能看到已启动的进程
+        self.stream_url = stream_url  # 巡逻探测时已拿到的流地址，有则跳过重复抓流
+        self.route = route or ProxyRoute("direct", "")
+        self.output_dir, self.file_format = None, self.ffmpeg_params.get("f", "mkv")  # 每段开始时由存储管理选择目录
+        self.parts, self._rotate_event = [], threading.Event()
+        self.part_error, self.last_error, self._quit_requested = None, None, False  # part_error: 本段 FFmpeg 的错误分类 (错误码, 说明, 处理方式)
+        self._requality_event, self.stop_text = threading.Event(), "手动停止"  # 准入控制/自动画质可能调整画质档位，准入控制也可能让出名额
+        self.ladder, self.level, self.quality_changed = quality_ladder(self.option("quality", "best")), 0, time.monotonic()  # 画质档位 (从高到低) 与当前所在档
+        self.quality = self.ladder[0]
+        self.metrics = RecordingMetrics(room_id, float(self.option("stall_timeout", 60)))
+        self.set_status(STATE_CHECKING, "检查中...", "orange")
+
+    def set_status(self, state, text, color):
+        # 状态切换时才发布事件，界面只刷新这一行
+        self.state, self.status, self.status_color = state, text, color
+        self.service.publish_status(self.room_id, state, text, color)
+
+    def option(self, key, default=None):
+        # 主播设定档中的同名项优先于全域设定
+        return self.service.streamers.get(self.room_id, {}).get(key, self.service.settings.get(key, default))
+
+    def cached_stream_url(self):
+        return STREAM_URL_CACHE.get(self.room_id, self.preferences(), float(self.option("stream_url_ttl", 300)))
+
+    def preferences(self):
+        # 当前档及以下的画质依次尝试；已降档时都没有就取 worst，不会退回 best
+        return self.ladder[self.level:] + (["worst"] if self.level else [])
+
+    def resolve(self):
+        # 缓存中有未过期的地址就直接用，省去一次页面请求与插件解析
+        self._requality_event.clear()
+        if (stream_url := self.cached_stream_url()): print(f"[{self.room_id}] 使用缓存的流地址。"); return stream_url
+        stream_url, error, blocked = self.service.governor.resolve(self.room_id, self.route, self.option("live_url_template"), self.preferences(), self._stop_event)
+        if blocked: print(f"[{self.room_id}] 抓流请求被拦截: {error}")
+        elif error: print(f"[{self.room_id}] Streamlink在获取流时发生异常: {error}")
+        return stream_url
+
+    def begin_session(self):
+        # 返回第一段要录的流地址；未开播返回 None
+        print(f"[{self.room_id}] 录制启动，开始检查..."); 
+        print(f"[{self.room_id}] [代理模式: {PROXY_MODE_NAMES.get(self.route.mode, self.route.mode)}] {self.route.url}")
+        # 巡逻探测拿到的是 best 的地址，同时缓存了各画质：有画质偏好时从缓存里按偏好重选
+        stream_url = self.cached_stream_url() or self.stream_url or self.resolve()
+        if not stream_url:
+            print(f"[{self.room_id}] 未开播或无法获取直播流。"); self.set_status(STATE_ENDED, "未开播", "yellow"); return None
+        self.set_status(STATE_LIVE, "已开播", "green"); return stream_url
+
+    def next_step(self):
+        # 一段结束后的下一步: stop 结束录制 / same 沿用同一个流地址 / resolve 重新抓流 / reconnect 断流重连
+        if self._stop_event.is_set(): return "stop"
+        code, label, action = self.part_error or (None, None, "retry")
+        if action == "fatal": self.set_status(STATE_ERROR, label, "red"); return "stop"  # 重试也只会得到同样的错误
+        # FFmpeg 没能连上 (没有任何输出) 或流地址被拒绝/已失效：作废缓存，下次重新抓流；正常录到了内容则说明地址仍然有效
+        if self.part_connected and action != "refresh": STREAM_URL_CACHE.touch(self.room_id)
+        else: STREAM_URL_CACHE.invalidate(self.room_id)
+        if action == "rotate": return "same"  # 磁盘已满：下一段由存储管理换一个有空间的卷 (都满则以磁盘空间不足结束)
+        if self._requality_event.is_set(): return "resolve"  # 画质档位变了：换成该档的流地址接着录
+        if self._rotate_event.is_set(): self._rotate_event.clear(); return "same"  # 按大小切分：沿用同一个流地址立即开始下一段
+        # 断流 (网络抖动、CDN 切换)：不等下一轮巡逻，重新抓流并接着录下一段
+        return "reconnect"
+
+    def end_session(self):
+        if self.defer_complete():
+            # 合并成功后由 concat_parts 通知；只有一段或合并失败时，各段各自算作完成
+            if not (len(self.parts) > 1 and self.concat_parts()):
+                for part in self.parts: self.service.submit_transcode(self.room_id, part)
+        if self.state == STATE_ERROR: return  # 保留出错状态，已完成的分段仍照常合并/转码
+        status_text = self.stop_text if self._stop_event.is_set() else "自动结束"
+        print(f"[{self.room_id}] 录制{status_text}。"); self.set_status(STATE_ENDED, status_text, "gray")
+
+    # --- 分段设定: 主播设定档 "segment": {"minutes": 30, "size_gb": 2} ---
+    def defer_complete(self):
+        return bool(self.option("concat_parts", False)) and not self.segment_seconds()
+
+    def segment_seconds(self):
+        return float((self.option("segment") or {}).get("minutes", 0) or 0) * 60
+
+    def segment_size_limit(self):
+        return float((self.option("segment") or {}).get("size_gb", 0) or 0) * 1024 ** 3
+
+    def build_command(self, stream_url, output, segment_list=None):
+        command = ['ffmpeg', '-y', '-nostats', '-progress', 'pipe:1'] # -y 覆盖临时档案；进度信息从 stdout 读取作为录制指标
+        command.extend(ffmpeg_proxy_args(self.route))
+        command.extend(['-i', stream_url])
+        for k, v in self.ffmpeg_params.items():
+            if k != "f": command.extend([f'-{k}', str(v)])
+        if segment_list:
+            # 按时间切分交给 FFmpeg 的 segment 封装器，每完成一段就写入 segment_list (CSV)
+            command.extend(['-f', 'segment', '-segment_format', muxer_for(self.file_format), '-segment_time', str(int(self.segment_seconds())), '-reset_timestamps', '1', '-strftime', '1', '-segment_list', str(segment_list), '-segment_list_type', 'csv'])
+        else: command.extend(['-f', muxer_for(self.file_format)])
+        # 分片 MP4：即使程序崩溃来不及写 moov，已录部分也能在启动恢复时重新封装
+        if self.file_format == "mp4" and "movflags" not in self.ffmpeg_params:
+            command.extend(['-segment_format_options', 'movflags=+frag_keyframe+empty_moov'] if segment_list else ['-movflags', '+frag_keyframe+empty_moov'])
+        command.append(str(output))
+        return command
+
+    def prepare_part(self, stream_url):
+        # 选择存储卷并生成本段的文件名与 FFmpeg 命令；返回 (临时文件, 分段列表, 开始时间, 命令)，没有可用空间或已被停止返回 None
+        if self.stopping(): return None  # 抓流/重连期间收到了停止
+        if not (output_dir := self.service.storage.output_dir_for(self.room_id)):
+            print(f"[{self.room_id}] 所有存储卷的剩余空间都低于下限，无法录制。"); self.set_status(STATE_ERROR, "磁盘空间不足", "red"); return None
+        self.output_dir, self.part_connected, self.part_error, self._quit_requested = output_dir, False, None, False
+        print(f"[{self.room_id}] 已获取到直播流地址，准备开始录製。"); self.set_status(STATE_RECORDING, ("录制中" if not self.parts else f"录制中 (第{len(self.parts) + 1}段)") + ("" if not self.level else f" [{self.quality}]"), "green")
+        start_time_str, segmented = now_str(), self.segment_seconds() > 0
+        if segmented:
+            temp_filepath = self.output_dir / f"{self.room_id}_%Y%m%d-%H%M%S_recording.{self.file_format}.tmp"
+            segment_list = self.output_dir / f"{self.room_id}_{start_time_str}_segments.csv"
+        else: temp_filepath, segment_list = self.output_dir / f"{self.room_id}_{start_time_str}_recording.{self.file_format}.tmp", None
+        command = self.build_command(stream_url, temp_filepath, segment_list)
+        print(f"[{self.room_id}] FFmpeg 命令: {' '.join(command)}")
+        self._segment_rows_done = 0
+        return temp_filepath, segment_list, start_time_str, command
+
+    def finish_part(self, temp_filepath, segment_list, start_time_str):
+        # FFmpeg 结束后把本段改名为正式文件
+        if segment_list: return self.finalize_segments(segment_list, start_time_str, final=True)
+        final_filepath = self.output_dir / f"{self.room_id}_{start_time_str}_to_{now_str()}.{self.file_format}"
+        if temp_filepath.exists(): self.finalize_file(temp_filepath, final_filepath)
+        elif not self._stop_event.is_set(): print(f"[{self.room_id}] 临时文件未找到。")
+
+    def watch_tick(self, temp_filepath, segment_list, start_time_str):
+        # 录制期间每 2 秒检查一次：把已完成的时间分段改名、检查停滞、磁盘空间与文件大小上限；返回 True 表示应结束本段 FFmpeg
+        if segment_list: self.finalize_segments(segment_list, start_time_str)
+        if self.metrics.check_stall() and self.on_stall(): return True
+        if not self.service.storage.has_room(self.output_dir):
+            # 磁盘快满时结束本段，下一段写到仍有空间的存储卷 (都不足则停止录制)
+            print(f"[{self.room_id}] 当前磁盘剩余空间不足，切换存储卷。"); self._rotate_event.set(); return True
+        if not (size_limit := self.segment_size_limit()): return False
+        current = temp_filepath if not segment_list else max(self.own_temp_files(start_time_str), key=lambda p: p.stat().st_mtime, default=None)
+        try: size = current.stat().st_size if current else 0
+        except OSError: size = 0
+        if size < size_limit: return False
+        print(f"[{self.room_id}] 当前文件已达 {size / 1024 ** 3:.2f} GB，切换到新文件。"); self._rotate_event.set(); return True
+
+    def end_part(self, stderr_tail, command, start_time_str):
+        latest = self.metrics.to_dict(); self.part_connected = bool(latest.get("total_size") or latest.get("out_seconds"))
+        self.check_part_error(stderr_tail, command, start_time_str)
+
+    def check_part_error(self, stderr_tail, command, start_time_str):
+        # 我们自己结束的 FFmpeg (停止/切分/停滞/降档) 与正常结束 (退出码 0) 不算失败；失败时 stderr 的最后几行存到录像旁边
+        returncode = self.process.returncode
+        if self._quit_requested or returncode == 0: return
+        self.part_error = self.last_error = stderr_tail.classify() or ("exit_code", f"FFmpeg 退出码 {returncode}", "retry")
+        code, label, action = self.part_error
+        log_path = self.output_dir / f"{self.room_id}_{start_time_str}_ffmpeg.log"
+        stderr_tail.save(log_path, [f"时间: {datetime.datetime.now():%Y-%m-%d %H:%M:%S}", f"命令: {' '.join(command)}", f"退出码: {returncode}", f"错误分类: {code} ({label}, {action})"])
+        print(f"[{self.room_id}] FFmpeg 出错: {label} [{code}]，最后 {len(stderr_tail.lines)} 行输出已保存到 {log_path.name}")
+
+    def on_stall(self):
+        # 输出长时间不增长：默认结束本段 FFmpeg (返回 True)，交给断流重连流程重新抓流
+        print(f"[{self.room_id}] 录制输出已停滞 {self.metrics.stall_seconds:.0f} 秒。"); self.set_status(STATE_RECORDING, "录制停滞", "orange")
+        if not self.option("stall_restart", True): return False
+        print(f"[{self.room_id}] 结束停滞的 FFmpeg 并尝试重连..."); return True
+
+    def own_temp_files(self, start_time_str):
+        # 分段模式下本段 FFmpeg 生成的临时文件 (文件名中的时间不早于本段开始时间)
+        prefix = f"{self.room_id}_"; suffix = f"_recording.{self.file_format}.tmp"
+        return [p for p in self.output_dir.glob(f"{prefix}*{suffix}") if p.name[len(prefix):-len(suffix)] >= start_time_str]
+
+    def finalize_segments(self, segment_list, start_time_str, final=False):
+        rows = []
+        if segment_list.exists():
+            with open(segment_list, newline='', encoding='utf-8') as f: rows = [r for r in csv.reader(f) if r]
+        for row in rows[self._segment_rows_done:]:
+            temp_path = self.output_dir / os.path.basename(row[0])
+            if temp_path.exists(): self.finalize_file(temp_path)
+        self._segment_rows_done = len(rows)
+        if not final: return
+        # FFmpeg 被强制结束时最后一段可能没写入列表，按文件修改时间补上结束时间
+        for temp_path in self.own_temp_files(start_time_str): self.finalize_file(temp_path)
+        segment_list.unlink(missing_ok=True)
+
+    def finalize_file(self, temp_path, final_filepath=None):
+        if final_filepath is None:
+            seg_start = temp_path.name[len(self.room_id) + 1:].split('_recording')[0]
+            seg_end = datetime.datetime.fromtimestamp(temp_path.stat().st_mtime).strftime("%Y%m%d-%H%M%S")
+            final_filepath = self.output_dir / f"{self.room_id}_{seg_start}_to_{seg_end}.{self.file_format}"
+        try: os.rename(temp_path, final_filepath); self.parts.append(final_filepath); print(f"[{self.room_id}] 文件已保存为: {final_filepath.name}")
+        except Exception as e: print(f"[{self.room_id}] 重命名文件失败: {e}"); return
+        self.service.notify_recording_finished(self.room_id, final_filepath, complete=not self.defer_complete())
+
+    def concat_parts(self):
+        # 用 concat 分离器无损拼接 (-c copy)，成功后删除各分段；失败则保留分段
+        first_start = self.parts[0].stem.split('_to_')[0].split('_')[-1]; last_end = self.parts[-1].stem.split('_to_')[-1]
+        # 各段可能分布在不同的存储卷：合并结果写到能放下所有分段的卷 (删除分段前两份同时存在)，没有则不合并
+        try: size = sum(p.stat().st_size for p in self.parts)
+        except OSError as e: print(f"[{self.room_id}] 读取分段大小失败: {e}"); return False
+        if not (output_dir := self.service.storage.output_dir_for(self.room_id, size)):
+            print(f"[{self.room_id}] 没有存储卷能放下合并后的文件 ({size / 1024 ** 3:.2f} GB)，保留各分段文件。"); return False
+        merged = output_dir / f"{self.room_id}_{first_start}_to_{last_end}.{self.file_format}"
+        temp_merged = merged.with_name(merged.name + ".tmp"); list_file = output_dir / f"{self.room_id}_{first_start}_concat.txt"
+        list_file.write_text("".join("file '{}'\n".format(str(p.resolve()).replace("'", "'\\''")) for p in self.parts), encoding='utf-8')
+        command = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(list_file), '-map', '0', '-c', 'copy', '-f', muxer_for(self.file_format), str(temp_merged)]
+        self.set_status(STATE_RECORDING, f"拼接中 ({len(self.parts)}段)", "orange"); print(f"[{self.room_id}] 正在无损拼接 {len(self.parts)} 个分段...")
+        try: ok = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, startupinfo=startupinfo()).returncode == 0
+        except Exception as e: print(f"[{self.room_id}] 拼接分段出错: {e}"); ok = False
+        finally: list_file.unlink(missing_ok=True)
+        if not ok: temp_merged.unlink(missing_ok=True); print(f"[{self.room_id}] 拼接失败，保留各分段文件。"); return False
+        os.rename(temp_merged, merged)
+        for part in self.parts: part.unlink(missing_ok=True); self.service.forget_recording(part)
+        self.parts = [merged]; print(f"[{self.room_id}] 分段已合并为: {merged.name}")
+        self.service.notify_recording_finished(self.room_id, merged)
+        return True
+
+    def stopping(self):
+        return self._stop_event.is_set()
+
+    def signal_stop(self):
+        # 设置停止标志并返回当前的 FFmpeg 进程 (可能为 None 或已结束)；与 record_part 启动进程在同一把锁里
+        with self._process_lock: self._stop_event.set(); return self.process
+
+    # --- 画质档位：由服务在持有准入锁时调用，结束 FFmpeg 放到后台 (restart_part)，不阻塞调用方 ---
+    def step_quality(self, delta):
+        level = min(max(self.level + delta, 0), len(self.ladder) - 1)
+        if level == self.level: return False
+        print(f"[{self.room_id}] 画质 {self.quality} → {self.ladder[level]}。"); self.level, self.quality, self.quality_changed = level, self.ladder[level], time.monotonic()
+        self._requality_event.set(); self.restart_part(); return True
+
+    def downgrade(self):
+        if self.level >= len(self.ladder) - 1: return
+        print(f"[{self.room_id}] 为更高优先级的主播让出带宽，切换到最低画质。"); self.step_quality(len(self.ladder))
+
+# --- 录制线程类 (V9) ---
+class RecordingThread(Recording, threading.Thread):
+    def __init__(self, *args, **kwargs):
+        threading.Thread.__init__(self, daemon=True); Recording.__init__(self, *args, **kwargs)
+
+    def run(self):
+        # 意外异常也要发布结束状态，否则界面会一直显示为录制中
+        try: self.record_session()
+        except Exception as e: print(f"[{self.room_id}] 录制线程异常退出: {e}"); self.set_status(STATE_ERROR, "录制出错", "red")
+
+    def record_session(self):
+        if not (stream_url := self.begin_session()): return
+        while stream_url and not self.stopping():
+            if not self.record_part(stream_url) or (step := self.next_step()) == "stop": break
+            if step == "resolve": stream_url = self.resolve() or self.reconnect()
+            elif step == "reconnect": stream_url = self.reconnect()
+        self.end_session()
+
+    def record_part(self, stream_url):
+        # 录制一段，结束后立即改名为正式文件；返回 False 表示出现了不应重试的错误
+        if not (part := self.prepare_part(stream_url)): return False
+        temp_filepath, segment_list, start_time_str, command = part
+        try:
+            with self._process_lock:
+                if self._stop_event.is_set(): return False  # 准备本段期间收到了停止：不再启动 FFmpeg
+                self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo(), env=ffmpeg_env(self.route))
+            self.metrics.start_part(); threading.Thread(target=self.read_metrics, args=(self.process.stdout,), daemon=True).start()
+            stderr_tail = StderrTail(); stderr_reader = stderr_tail.start(self.process.stderr)
+            self.watch_part(temp_filepath, segment_list, start_time_str)
+            stderr_reader.join(timeout=2); self.end_part(stderr_tail, command, start_time_str)
+        except FileNotFoundError: print(f"[{self.room_id}] FFmpeg执行失败！请确保已正确安装并添加到系统环境变量中。"); self.set_status(STATE_ERROR, "FFmpeg错误", "red"); return False
+        except Exception as e: print(f"[{self.room_id}] FFmpeg 录制出错: {e}"); self.set_status(STATE_ERROR, "录制出错", "red"); return False
+        self.finish_part(temp_filepath, segment_list, start_time_str); return True
+
+    def watch_part(self, temp_filepath, segment_list, start_time_str):
+        # 等待 FFmpeg 结束；期间每 2 秒检查一次分段、停滞、磁盘空间与文件大小
+        while True:
+            try: self.process.wait(timeout=2); return
+            except subprocess.TimeoutExpired: pass
+            if self.watch_tick(temp_filepath, segment_list, start_time_str): self.quit_ffmpeg()
+
+    def read_metrics(self, stream):
+        for block in read_progress(stream): self.metrics.update(block)
+
+    def quit_ffmpeg(self, timeout=5):
+        # 先通过 stdin 发送 q 让 FFmpeg 正常收尾 (写完文件索引/moov)，超时再 terminate/kill
+        if not (self.process and self.process.poll() is None): return
+        self._quit_requested = True
+        try: self.process.stdin.write(b"q"); self.process.stdin.flush()
+        except (OSError, ValueError): self.process.terminate()
+        try: self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            try: self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired: print(f"[{self.room_id}] FFmpeg 未在{timeout}秒内响应，强制终止。"); self.process.kill()
+
+    def reconnect(self):
+        # 指数退避：1, 2, 4, 8... 秒 (上限 reconnect_max_delay)，总时长超过 reconnect_timeout 仍未恢复则视为下播
+        timeout, delay = float(self.option("reconnect_timeout", 60)), 1.0
+        max_delay, deadline, attempt = float(self.option("reconnect_max_delay", 15)), time.monotonic() + timeout, 0
+        while time.monotonic() < deadline:
+            attempt += 1; self.set_status(STATE_CHECKING, f"重连中 ({attempt})", "orange")
+            if attempt == 1 and (stream_url := self.cached_stream_url()): print(f"[{self.room_id}] 直播流中断，使用缓存的流地址立即重连..."); return stream_url
+            print(f"[{self.room_id}] 直播流中断，{delay:.0f} 秒后第 {attempt} 次重连...")
+            if self._stop_event.wait(delay): return None
+            if (stream_url := self.resolve()): return stream_url
+            delay = min(delay * 2, max_delay)
+        print(f"[{self.room_id}] {timeout:.0f} 秒内未能重新获取直播流，判定为已下播。")
+        return None
+
+    # --- 准入控制：由服务在持有准入锁时调用，结束 FFmpeg 放到后台线程，不阻塞新主播的启动 ---
+    def restart_part(self):
+        threading.Thread(target=self.quit_ffmpeg, daemon=True).start()
+
+    def preempt(self):
+        print(f"[{self.room_id}] 为更高优先级的主播让出录制名额，停止录制。"); self.stop_text = "让出名额"; self.signal_stop()
+        threading.Thread(target=self.quit_ffmpeg, daemon=True).start()
+
+    def stop(self):
+        # 抓流/重连期间停止时没有进程可结束，立即返回；录制线程在启动下一个 FFmpeg 前会看到停止标志
+        if (process := self.signal_stop()) and process.poll() is None:
+            print(f"[{self.room_id}] 正在发送停止信号给 FFmpeg...")
+            self.quit_ffmpeg()
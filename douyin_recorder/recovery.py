@@ -0,0 +1,59 @@
+import datetime
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import RECORDING_PATH_BASE, muxer_for
+from .ffmpeg import startupinfo
+
+# --- 启动时恢复孤立的 .tmp 录像 ---
+# 程序或机器崩溃后 {房间号}_{开始}_recording.{格式}.tmp 不会被改名，历史列表也看不到；
+# 启动时在后台并行重新封装 (-c copy) 这些文件，结束时间取文件修改时间，再按正常规则命名
+TEMP_NAME_RE = re.compile(r"^(?P<room>.+)_(?P<start>\d{8}-\d{6})_recording\.(?P<fmt>\w+)\.tmp$")
+
+def find_orphaned_recordings(started_before, roots=(RECORDING_PATH_BASE,)):
+    # 只处理开始时间早于本次启动的临时文件，避免误碰刚开始的新录制
+    limit = started_before.strftime("%Y%m%d-%H%M%S"); orphans = []
+    for path in (p for root in roots for p in root.glob("*/*_recording.*.tmp")):
+        match = TEMP_NAME_RE.match(path.name)
+        if match and match["start"] < limit: orphans.append(path)
+    return orphans
+
+def recover_recording(path):
+    match = TEMP_NAME_RE.match(path.name)
+    room_id, start, file_format = match["room"], match["start"], match["fmt"]
+    end = datetime.datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y%m%d-%H%M%S")
+    final_filepath = path.parent / f"{room_id}_{start}_to_{end}.{file_format}"
+    if path.stat().st_size == 0: path.unlink(); print(f"[Recovery] 删除空的临时文件: {path.name}"); return None
+    remuxed = path.with_name(path.name + ".recovering")
+    command = ['ffmpeg', '-y', '-v', 'error', '-i', str(path), '-map', '0', '-c', 'copy', '-f', muxer_for(file_format), str(remuxed)]
+    try: ok = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, startupinfo=startupinfo()).returncode == 0 and remuxed.exists() and remuxed.stat().st_size > 0
+    except FileNotFoundError: ok = False; print("[Recovery] 未找到 FFmpeg，跳过重新封装。")
+    if ok:
+        os.replace(remuxed, final_filepath); path.unlink()
+        print(f"[Recovery] 已修复并保存为: {final_filepath.name}"); return final_filepath
+    remuxed.unlink(missing_ok=True)
+    if file_format == "mp4":
+        # 没有 moov 的 MP4 无法靠重新封装救回，保留原始数据留待手动处理
+        broken = path.with_name(f"{room_id}_{start}_to_{end}.{file_format}.broken"); os.replace(path, broken)
+        print(f"[Recovery] MP4 文件缺少索引无法修复，已另存为: {broken.name}"); return None
+    # mkv/flv/ts 即使截断也基本可以播放，重新封装失败时直接改名
+    os.replace(path, final_filepath); print(f"[Recovery] 重新封装失败，已直接改名为: {final_filepath.name}")
+    return final_filepath
+
+def recover_orphaned_recordings(started_before, workers=2, on_recovered=None, roots=(RECORDING_PATH_BASE,)):
+    orphans = find_orphaned_recordings(started_before, roots)
+    if not orphans: return
+    print(f"[Recovery] 发现 {len(orphans)} 个未完成的临时录像，开始后台修复...")
+    def recover(path):
+        try: final_filepath = recover_recording(path)
+        except Exception as e: print(f"[Recovery] 修复 {path.name} 失败: {e}"); return
+        if final_filepath and on_recovered: on_recovered(final_filepath.parent.name, final_filepath)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="recovery") as pool: list(pool.map(recover, orphans))
+    print("[Recovery] 临时录像修复完成。")
+
+def start_recovery(started_before, workers=2, on_recovered=None, roots=(RECORDING_PATH_BASE,)):
+    thread = threading.Thread(target=recover_orphaned_recordings, args=(started_before, workers, on_recovered, roots), daemon=True)
+    thread.start(); return thread
@@ -0,0 +1,91 @@
+import datetime
+import random
+import re
+import threading
+import time
+
+from .config import RECORDING_PATH_BASE
+
+# --- 自适应巡逻调度 ---
+# 从历史录像文件名 ({房间号}_{开始}_to_{结束}.{格式}) 学习每个主播常见的开播时段：
+# 临近常见开播时间的主播探测得更频繁，很少开播的主播逐步拉长探测间隔；总探测次数受预算限制
+HISTORY_NAME_RE = re.compile(r"_(\d{8}-\d{6})_to_(\d{8}-\d{6})")
+TIME_FORMAT = "%Y%m%d-%H%M%S"
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+LOOKBACK_DAYS = 60
+RECENT_END_SECONDS = 600  # 刚下播 10 分钟内可能是断流重开，按最高优先级探测
+
+def parse_recording_times(file_name):
+    match = HISTORY_NAME_RE.search(file_name)
+    if not match: return None
+    try: return tuple(datetime.datetime.strptime(v, TIME_FORMAT) for v in match.groups())
+    except ValueError: return None
+
+def slot_of(moment):
+    return (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+class RoomProfile:
+    def __init__(self, sessions, now):
+        recent = [(s, e) for s, e in sessions if (now - s).days <= LOOKBACK_DAYS]
+        self.last_end = max((e for _, e in sessions), default=None)
+        self.days_span = max(7, (now - min(s for s, _ in recent)).days + 1) if recent else 0
+        self.active_days = len({s.date() for s, _ in recent})
+        slot_days = [set() for _ in range(SLOTS_PER_DAY)]
+        for start, _ in recent: slot_days[slot_of(start)].add(start.date())
+        counts = [len(days) for days in slot_days]
+        # 相邻时段做平滑，前后 30 分钟开播也算作“常见时段”
+        self.slot_weights = [counts[i] + 0.5 * (counts[i - 1] + counts[(i + 1) % SLOTS_PER_DAY]) for i in range(SLOTS_PER_DAY)]
+
+    def score(self, now):
+        if self.last_end and 0 <= (now - self.last_end).total_seconds() < RECENT_END_SECONDS: return 1.0
+        if not self.days_span: return None
+        slot = slot_of(now)
+        upcoming = max(self.slot_weights[slot], self.slot_weights[(slot + 1) % SLOTS_PER_DAY])
+        p_slot = min(1.0, upcoming / self.days_span)
+        activity = self.active_days / self.days_span
+        return min(1.0, max(p_slot / 0.5, 0.25 * activity))
+
+class AdaptiveScheduler:
+    def __init__(self, settings, roots=lambda: [RECORDING_PATH_BASE]):
+        self.settings, self.roots = settings, roots
+        self.profiles, self.next_due, self._lock = {}, {}, threading.Lock()
+
+    def learn_room(self, room_id, now=None):
+        now = now or datetime.datetime.now(); sessions = []
+        for folder in (root / room_id for root in self.roots()):
+            if not folder.exists(): continue
+            for file in folder.iterdir():
+                if (times := parse_recording_times(file.name)): sessions.append(times)
+        with self._lock: self.profiles[room_id] = RoomProfile(sessions, now)
+
+    def learn(self, room_ids):
+        for room_id in room_ids: self.learn_room(room_id)
+
+    def interval_for(self, room_id, now=None):
+        now = now or datetime.datetime.now()
+        base = float(self.settings.get("patrol_interval", 30))
+        min_interval = float(self.settings.get("probe_interval_min", 15)); max_interval = float(self.settings.get("probe_interval_max", 600))
+        profile = self.profiles.get(room_id)
+        score = profile.score(now) if profile else None
+        if score is None: return base  # 没有历史记录的主播维持原来的固定间隔
+        # 按对数插值：score=1 → 最短间隔，score=0 → 最长间隔
+        return min_interval * (max_interval / min_interval) ** (1.0 - score)
+
+    def record_probe(self, room_id, now_ts=None):
+        interval = self.interval_for(room_id)
+        with self._lock: self.next_due[room_id] = (now_ts or time.time()) + interval * random.uniform(0.9, 1.1)
+
+    def due_rooms(self, candidates, limit, now_ts=None):
+        now_ts, now = now_ts or time.time(), datetime.datetime.now()
+        with self._lock: due = [r for r in candidates if self.next_due.get(r, 0) <= now_ts]
+        def priority(room_id):
+            profile = self.profiles.get(room_id)
+            score = profile.score(now) if profile else None
+            return (-(score if score is not None else 0.5), self.next_due.get(room_id, 0))
+        return sorted(due, key=priority)[:limit]
+
+    def probe_budget(self, room_count, tick):
+        # 与固定间隔巡逻相同的探测预算：每 patrol_interval 秒平均每个主播一次
+        interval = max(1.0, float(self.settings.get("patrol_interval", 30)))
+        return max(1, round(room_count * tick / interval))
@@ -0,0 +1,280 @@
+import datetime
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .admission import AdmissionController
+from .config import DEFAULT_FFMPEG_PARAMS, DEFAULT_SETTINGS, SETTINGS_FILE, ensure_app_dirs, load_settings, save_json
+from .events import STATE_QUEUED, EventBus
+from .governor import RequestGovernor
+from .history import RecordingIndex
+from .metrics import prometheus_text
+from .probe import ProbeEngine
+from .proxy import ProxyRouter
+from .recorder import RecordingThread
+from .recovery import start_recovery
+from .scheduler import AdaptiveScheduler
+from .storage import StorageManager
+from .store import StreamerStore
+from .transcode import TRANSCODE_KEYS, TranscodePool, needs_transcode
+
+# --- 录制服务 (巡逻 + 录制线程管理) ---
+# GUI 与无界面守护进程共用的业务逻辑；界面相关的通知通过 on_patrol_status / on_recording_finished 回调传出
+# 集群模式的工作进程 (cluster.py) 用 load_streamers=False, maintenance=False 创建：主播由协调进程分配，
+# 启动恢复、配额清理与暂存盘的遗留录像只由协调进程处理
+# 停止录制/巡逻可能要等几秒 (FFmpeg 收尾、巡逻线程退出)：界面通过 background 线程池调用，不在 Tk 主线程里等待
+BACKGROUND_WORKERS = 8
+class RecorderService:
+    def __init__(self, on_patrol_status=None, on_recording_finished=None, on_history_changed=None, load_streamers=True, maintenance=True, allow_proxy=None):
+        ensure_app_dirs()
+        self.settings = load_settings()
+        for key, value in DEFAULT_SETTINGS.items(): self.settings.setdefault(key, value)
+        self.store = StreamerStore(); self.streamers = self.store.load_all() if load_streamers else {}; self.recording_threads = {}; self.patrol_thread = None; self.events = EventBus()
+        self.patrol_active = threading.Event(); self.patrol_stop = threading.Event()
+        self.governor = RequestGovernor(self.settings)
+        self.proxy_router = ProxyRouter(self.settings, self.streamers, self.governor.proxy_blocked, allow_proxy); self.probe_engine = ProbeEngine(self.settings, self.proxy_router, self.governor)
+        self.admission = AdmissionController(self.settings, self.streamers)
+        self.storage = StorageManager(self.settings, self.streamers, is_busy=self.is_file_busy)
+        self.scheduler = AdaptiveScheduler(self.settings, self.storage.roots)
+        self.history = RecordingIndex(roots=self.storage.roots, on_changed=on_history_changed); self.storage.start(self.history, maintenance)
+        self.transcoder = TranscodePool(self.settings, on_finished=self.on_transcode_finished)
+        self.on_patrol_status, self.on_recording_finished = on_patrol_status, on_recording_finished
+        self.patrol_status, self.last_sweep = "巡逻已停止", None
+        self.background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="service-bg")
+        # recording_supervisor: threads 每路录制一个线程 / asyncio 所有录制在一个事件循环里以协程运行 (supervisor.py)
+        self.supervisor = None
+        if self.settings.get("recording_supervisor") == "asyncio":
+            from .supervisor import RecordingSupervisor  # 只有选用时才加载 asyncio
+            self.supervisor = RecordingSupervisor(int(self.settings.get("supervisor_workers", 16)))
+        self.closing = threading.Event(); threading.Thread(target=self.quality_loop, daemon=True).start()
+        self.recovery_thread = start_recovery(datetime.datetime.now(), int(self.settings.get("recovery_workers", 2)), self.notify_recording_finished, self.storage.roots()) if maintenance else None
+
+    # --- 主播管理 ---
+    def add_streamer(self, room_id, remark):
+        if room_id in self.streamers: return False
+        new_streamer_data = {"remark": remark}
+        self.store.save(room_id, new_streamer_data)
+        self.streamers[room_id] = new_streamer_data
+        return True
+
+    def remove_streamer(self, room_id):
+        # 只删除设定档，不等待：正在录制的主播先用 stop_recording(room_id, timeout) 在后台等它收尾，
+        # 再在读写 streamers 的线程 (界面为 Tk 主线程) 调用本方法，避免与列表遍历、保存备注交错
+        self.store.delete(room_id); self.streamers.pop(room_id, None)
+
+    def assign_rooms(self, streamers):
+        # 集群模式：协调进程下发本进程负责的主播 (含 ffmpeg_params)；不再负责的主播停止录制。streamers 字典被其他组件共用，原地修改
+        for room_id in [r for r in self.streamers if r not in streamers]:
+            if self.is_recording(room_id): threading.Thread(target=self.stop_recording, args=(room_id,), daemon=True).start()
+            self.streamers.pop(room_id, None)
+        for room_id, data in streamers.items():
+            data = dict(data); self.store.cache_ffmpeg_params(room_id, data.pop("ffmpeg_params", {})); self.streamers[room_id] = data
+
+    def save_streamer(self, room_id):
+        self.store.save(room_id, self.streamers[room_id])
+
+    def get_streamer_ffmpeg_params(self, room_id):
+        # 每个主播的 FFmpeg 参数按需从设定库读取 (读取后缓存)
+        return self.store.ffmpeg_params(room_id)
+
+    def set_streamer_ffmpeg_params(self, room_id, params):
+        self.store.save_ffmpeg_params(room_id, params)
+
+    def save_settings(self):
+        save_json(SETTINGS_FILE, self.settings); self.transcoder.settings_changed()
+        print("全域设定已储存。")
+
+    def get_ffmpeg_params_for_streamer(self, room_id):
+        # 录制阶段一律直接复制音视频流，编码相关参数留给后台转码队列
+        streamer_params = {**DEFAULT_FFMPEG_PARAMS, **self.get_streamer_ffmpeg_params(room_id)}
+        return {"c:v": "copy", "c:a": "copy", "bsf:a": "aac_adtstoasc", "f": streamer_params.get("f", "mkv")}
+
+    def get_transcode_params_for_streamer(self, room_id):
+        streamer_params = {**DEFAULT_FFMPEG_PARAMS, **self.get_streamer_ffmpeg_params(room_id)}
+        if not needs_transcode(streamer_params): return None
+        return {k: streamer_params[k] for k in (*TRANSCODE_KEYS, "f") if streamer_params.get(k)}
+
+    # --- 录制 ---
+    def is_recording(self, room_id):
+        thread = self.recording_threads.get(room_id)
+        return bool(thread and thread.is_alive())
+
+    def running_recordings(self):
+        # 已被要求停止 (包括让出名额) 的录制不再占用名额
+        return [thread for thread in list(self.recording_threads.values()) if thread.is_alive() and not thread.stopping()]
+
+    def start_recording(self, room_id, stream_url=None, route=None, manual=False):
+        # 巡逻发现的开播要经过准入控制；手动开始的录制不受上限限制 (但会计入占用)
+        with self.admission.lock:
+            if self.is_recording(room_id): return False
+            admitted, actions, reason = (True, [], "") if manual else self.admission.plan(room_id, self.running_recordings())
+            if not admitted:
+                print(f"[Admission] 主播 {self.streamers.get(room_id, {}).get('remark', room_id)} {reason}，暂不录制。"); self.publish_status(room_id, STATE_QUEUED, "等待名额", "yellow"); return False
+            for action, victim in actions: victim.downgrade() if action == "downgrade" else victim.preempt()
+            thread = (self.supervisor.recording_class if self.supervisor else RecordingThread)(self, room_id, self.get_ffmpeg_params_for_streamer(room_id), stream_url, route or self.proxy_router.route_for(room_id)); thread.start(); self.recording_threads[room_id] = thread
+        return True
+
+    def stop_recording(self, room_id, timeout=None):
+        # timeout 不为 None 时还要等录制收尾 (改名、合并、登记历史) 最多 timeout 秒；会阻塞，界面应在后台线程调用
+        if not self.is_recording(room_id): return
+        thread = self.recording_threads[room_id]; thread.stop()
+        if timeout is not None: thread.join(timeout)
+
+    def stop_recordings(self, room_ids=None, on_progress=None, timeout=60):
+        # 并行停止多路录制 (默认全部)：每路 FFmpeg 收尾最多要 7 秒，逐个停止时几十路录制要等几分钟。
+        # FFmpeg 结束后录制线程还要改名、合并分段、登记历史，每路最多再等 timeout 秒。on_progress(已停止, 总数) 在停止线程中回调
+        threads = [t for r, t in list(self.recording_threads.items()) if t.is_alive() and (room_ids is None or r in room_ids)]
+        if not threads: return 0
+        def stop(thread):
+            thread.stop(); thread.join(timeout)
+            if thread.is_alive(): print(f"[{thread.room_id}] 录制在 {timeout} 秒内未能收尾，不再等待。")
+        with ThreadPoolExecutor(max_workers=len(threads), thread_name_prefix="stop") as pool:
+            for done, _ in enumerate(as_completed([pool.submit(stop, t) for t in threads]), 1):
+                if on_progress: on_progress(done, len(threads))
+        return len(threads)
+
+    def quality_loop(self):
+        # 自动画质：每 auto_quality_interval 秒按总入站码率为开启 auto_quality 的录制升/降一档 (admission.rebalance)
+        while not self.closing.wait(float(self.settings.get("auto_quality_interval", 15))):
+            with self.admission.lock:
+                if not (step := self.admission.rebalance(self.running_recordings())): continue
+                action, thread = step; thread.step_quality(1 if action == "down" else -1)
+            print(f"[Admission] 总入站码率{'接近上限' if action == 'down' else '有余量'}，主播 {self.streamers.get(thread.room_id, {}).get('remark', thread.room_id)} 切换到 {thread.quality}。")
+
+    def publish_status(self, room_id, state, text, color):
+        self.events.publish(room_id, state, text, color)
+
+    def notify_recording_finished(self, room_id, filepath, complete=True):
+        # complete=False 表示该文件稍后还会被合并，暂不转码
+        self.index_recording(room_id, filepath); self.scheduler.learn_room(room_id)
+        if complete: self.submit_transcode(room_id, filepath)
+        if self.on_recording_finished: self.on_recording_finished(room_id, filepath)
+
+    def forget_recording(self, filepath):
+        # 录像被删除/合并后从历史索引中移除
+        self.index_recording(None, filepath, remove=True)
+
+    def index_recording(self, room_id, filepath, remove=False):
+        # 索引写入失败 (例如多个进程争用时仍然 database is locked) 不能打断录制收尾、转码与归档；漏掉的记录在下次对账时补上
+        try: self.history.remove(filepath) if remove else self.history.add(room_id, filepath)
+        except sqlite3.Error as e: print(f"[{room_id or 'History'}] 更新录制历史索引失败: {e}")
+
+    def submit_transcode(self, room_id, filepath):
+        # 需要转码的录像转码完成后再移出暂存盘，其余立即移走
+        if (params := self.get_transcode_params_for_streamer(room_id)):
+            self.transcoder.submit(room_id, filepath, params, int(self.streamers.get(room_id, {}).get("priority", 0)))
+        else: self.storage.archive(room_id, filepath)
+
+    def is_file_busy(self, path):
+        # 正在转码或等待合并的录像不能被配额清理删除
+        if path in self.transcoder.pending_sources(): return True
+        return any(path == str(part.resolve()) for thread in list(self.recording_threads.values()) if thread.is_alive() for part in thread.parts)
+
+    def on_transcode_finished(self, job):
+        if not job.output: self.storage.archive(job.room_id, job.src); return
+        if job.output != job.src: self.index_recording(job.room_id, job.src, remove=True)
+        self.index_recording(job.room_id, job.output)
+        if self.on_recording_finished: self.on_recording_finished(job.room_id, job.output)
+        self.storage.archive(job.room_id, job.output)
+
+    # --- 巡逻 ---
+    def set_patrol_status(self, text):
+        self.patrol_status = text
+        if self.on_patrol_status: self.on_patrol_status(text)
+
+    def is_patrolling(self):
+        return bool(self.patrol_thread and self.patrol_thread.is_alive())
+
+    def start_patrol(self):
+        if self.is_patrolling(): return
+        self.patrol_stop.clear(); self.patrol_active.set(); self.patrol_thread = threading.Thread(target=self.patrol_loop, daemon=True); self.patrol_thread.start()
+
+    def stop_patrol(self, timeout=None):
+        self.patrol_active.clear(); self.patrol_stop.set()
+        if self.patrol_thread: self.patrol_thread.join(timeout)
+
+    def patrol_loop(self):
+        if self.settings.get("adaptive_patrol", True): self.scheduler.learn(list(self.streamers.keys()))
+        while self.patrol_active.is_set():
+            try: start_str, end_str = self.settings["patrol_start"], self.settings["patrol_end"]; start_time = datetime.datetime.strptime(start_str, "%H:%M").time(); end_time = datetime.datetime.strptime(end_str, "%H:%M").time(); now_time = datetime.datetime.now().time()
+            except (ValueError, KeyError): self.set_patrol_status("巡逻失败: 时间格式错误"); self.patrol_stop.wait(10); continue
+            is_in_time = (start_time <= now_time <= end_time) if start_time <= end_time else (now_time >= start_time or now_time <= end_time)
+            if is_in_time:
+                # 只检查当前没有在录制、也不在封禁退避中的主播，确认开播后才启动录制线程 (直接复用探测到的流地址)
+                idle_rooms = [r for r in list(self.streamers.keys()) if not self.is_recording(r) and not self.governor.room_blocked(r)]
+                if self.settings.get("adaptive_patrol", True): self.adaptive_patrol_tick(idle_rooms, f"{start_str}-{end_str}"); continue
+                self.set_patrol_status(f"巡逻中 ({start_str}-{end_str}) | 正在检查 {len(idle_rooms)} 个主播...")
+                stats = self.last_sweep = self.probe_engine.sweep(idle_rooms, self.patrol_stop, self.on_probe_result)
+                print(f"[Patrol] 本轮检查 {stats['probed']} 个主播，开播 {stats['live']} 个，被拦截 {stats['blocked']} 个，耗时 {stats['elapsed']:.1f} 秒 ({stats['rate']:.2f} 次/秒)")
+                self.set_patrol_status(f"巡逻中 ({start_str}-{end_str}) | 上轮 {stats['probed']} 个/{stats['elapsed']:.1f}秒 ({stats['rate']:.2f} 次/秒)，开播 {stats['live']}")
+                self.patrol_stop.wait(self.settings.get("patrol_interval", 30))
+            else: self.set_patrol_status("巡逻暂停 (非设定时间)"); self.patrol_stop.wait(60)
+        self.set_patrol_status("巡逻已停止")
+
+    def adaptive_patrol_tick(self, idle_rooms, window_text):
+        # 每个节拍只探测“到期”的主播，按开播可能性从高到低取预算内的数量
+        tick = max(1.0, float(self.settings.get("scheduler_tick", 5)))
+        due = self.scheduler.due_rooms(idle_rooms, self.scheduler.probe_budget(len(self.streamers), tick))
+        if due:
+            stats = self.last_sweep = self.probe_engine.sweep(due, self.patrol_stop, self.on_probe_result)
+            self.set_patrol_status(f"自适应巡逻中 ({window_text}) | 本轮 {stats['probed']} 个/{stats['elapsed']:.1f}秒 ({stats['rate']:.2f} 次/秒)，开播 {stats['live']}")
+        self.patrol_stop.wait(tick if not due else max(0.0, tick - self.last_sweep["elapsed"]))
+
+    def on_probe_result(self, result):
+        remark = self.streamers.get(result.room_id, {}).get('remark', result.room_id)
+        if result.blocked: print(f"[Patrol] 检查主播 {remark} 时请求被拦截: {result.error}")
+        elif result.error: print(f"[Patrol] 检查主播 {remark} 时发生异常: {result.error}")
+        self.scheduler.record_probe(result.room_id)
+        if result.is_live and self.patrol_active.is_set():
+            print(f"[Patrol] 主播 {remark} 已开播 (检查耗时 {result.elapsed:.1f} 秒)。")
+            if self.start_recording(result.room_id, result.stream_url, result.route): print(f"[Patrol] 开始录制 {remark}。")
+
+    # --- 界面查询：集群模式的 Coordinator 提供同名方法，界面不直接访问各组件 ---
+    def proxy_allowed(self):
+        return self.proxy_router.proxy_allowed()
+
+    def request_status(self):
+        return self.governor.snapshot()
+
+    def admission_usage(self):
+        return self.admission.usage(self.running_recordings())
+
+    def transcode_jobs(self):
+        return self.transcoder.snapshot()
+
+    def clear_finished_transcodes(self):
+        self.transcoder.clear_finished()
+
+    # --- 状态与关闭 ---
+    def snapshot(self):
+        streamers = []
+        for room_id, data in sorted(self.streamers.items()):
+            thread = self.recording_threads.get(room_id); recording = self.is_recording(room_id)
+            streamers.append({"room_id": room_id, "remark": data.get("remark", ""), "recording": recording, "state": thread.state if thread else "idle", "status": thread.status if thread else "空闲",
+                              "metrics": thread.metrics.to_dict() if recording else None, "last_error": thread.last_error[0] if thread and thread.last_error else None})
+        return {"patrol": {"running": self.is_patrolling(), "status": self.patrol_status, "last_sweep": self.last_sweep}, "streamers": streamers, "transcode": self.transcoder.snapshot(),
+                "storage": self.storage.snapshot(), "admission": self.admission.usage(self.running_recordings()), "requests": self.governor.snapshot()}
+
+    def recording_metrics(self, with_samples=False):
+        return [{**thread.metrics.to_dict(with_samples), "quality": thread.quality, "downgraded": bool(thread.level)} for thread in list(self.recording_threads.values()) if thread.is_alive()]
+
+    def prometheus_metrics(self):
+        metrics = self.recording_metrics(); jobs = self.transcoder.snapshot(); usage = self.admission.usage(self.running_recordings()); requests = self.governor.snapshot()
+        return prometheus_text(metrics, {
+            "recordings_active": ("正在录制的主播数", len(metrics)), "recordings_stalled": ("输出停滞的录制数", sum(1 for m in metrics if m["stalled"])),
+            "streamers_total": ("主播总数", len(self.streamers)), "patrol_running": ("巡逻是否开启", self.is_patrolling()),
+            "transcode_pending": ("排队/进行中的转码任务数", sum(1 for j in jobs if j["status"] in ("排队中", "转码中"))),
+            "ingress_kbps": ("所有录制的入站码率合计 (kbit/s)", usage["ingress_kbps"]), "ingress_limit_kbps": ("入站码率上限 (0 = 不限)", usage["max_ingress_kbps"]),
+            "requests_recent": ("最近 10 分钟的抖音请求数", requests["requests_recent"]), "requests_blocked_recent": ("最近 10 分钟被拦截的请求数", requests["blocked_recent"]),
+            "request_tokens": ("令牌桶中剩余的请求预算", requests["tokens"] or 0), "rooms_backing_off": ("因被拦截而退避中的房间数", requests["rooms_backing_off"]),
+            "recordings_limit": ("同时录制上限 (0 = 不限)", usage["max_recordings"]), "recordings_downgraded": ("低于首选画质的录制数", sum(1 for m in metrics if m["downgraded"])),
+        })
+
+    def shutdown(self, on_progress=None):
+        # 先通知巡逻线程退出，再并行停止所有录制，最后才等巡逻线程 (最多 1 秒)；
+        # stop_recordings 等各录制收尾完才返回，之后才关闭转码队列与历史索引
+        self.patrol_active.clear(); self.patrol_stop.set(); self.closing.set()
+        self.stop_recordings(on_progress=on_progress)
+        if self.patrol_thread: self.patrol_thread.join(1)
+        if self.supervisor: self.supervisor.shutdown()
+        self.background.shutdown(wait=False); self.transcoder.shutdown(); self.storage.shutdown(); self.history.close()
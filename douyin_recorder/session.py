@@ -0,0 +1,83 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import CHROME_USER_AGENT, LIVE_URL_TEMPLATE
+from .proxy import configure_session_proxy
+
+# --- Streamlink 会话池 ---
+class StreamlinkSessionPool:
+    # 按代理路由分组复用 Streamlink 会话：插件只加载一次，HTTP keep-alive 连接在多次抓流之间复用
+    # 同一个会话同一时刻只借给一个线程，避免并发探测时互相改写 Referer 等请求头
+    def __init__(self, max_idle_per_key=16):
+        self.max_idle_per_key, self.created = max_idle_per_key, 0
+        self._idle, self._lock = {}, threading.Lock()
+
+    def _new_session(self, route):
+        import streamlink  # 只有真正抓流时才加载 streamlink，无界面模式启动时不付这个代价
+        session = streamlink.Streamlink()
+        session.set_option("http-headers", {"User-Agent": CHROME_USER_AGENT})
+        configure_session_proxy(session, route)
+        with self._lock: self.created += 1
+        return session
+
+    @contextmanager
+    def session(self, route, referer):
+        with self._lock:
+            idle = self._idle.setdefault(route, [])
+            session = idle.pop() if idle else None
+        if session is None: session = self._new_session(route)
+        session.set_option("http-headers", {"Referer": referer})
+        try: yield session
+        finally:
+            with self._lock:
+                idle = self._idle.setdefault(route, [])
+                if len(idle) < self.max_idle_per_key: idle.append(session)
+
+    def clear(self):
+        with self._lock: self._idle.clear()
+
+SESSION_POOL = StreamlinkSessionPool()
+
+# --- 流地址缓存 ---
+class StreamUrlCache:
+    # 房间号 → (各画质的流地址, 取得时间)。每次抓流都会更新；录制线程开始/重连时先用缓存中未过期的地址，
+    # FFmpeg 用它连不上时作废，正常录完一段则刷新时间 (地址仍然有效)
+    def __init__(self):
+        self._entries, self._lock = {}, threading.Lock()
+
+    def put(self, room_id, urls):
+        with self._lock:
+            if urls: self._entries[room_id] = (dict(urls), time.monotonic())
+            else: self._entries.pop(room_id, None)
+
+    def get(self, room_id, quality, ttl):
+        with self._lock: entry = self._entries.get(room_id)
+        if not entry or time.monotonic() - entry[1] > ttl: return None
+        return pick_quality(entry[0], quality)
+
+    def touch(self, room_id):
+        with self._lock:
+            if room_id in self._entries: self._entries[room_id] = (self._entries[room_id][0], time.monotonic())
+
+    def invalidate(self, room_id):
+        with self._lock: self._entries.pop(room_id, None)
+
+STREAM_URL_CACHE = StreamUrlCache()
+
+# --- 抓流 ---
+def live_url_for(room_id, template=LIVE_URL_TEMPLATE):
+    return (template or LIVE_URL_TEMPLATE).format(room_id=room_id)
+
+def pick_quality(urls, quality):
+    # quality 可以是画质名或按偏好排序的列表；都没有时退到 best
+    for name in [quality] if isinstance(quality, str) else quality:
+        if urls.get(name): return urls[name]
+    return urls.get("best")
+
+def resolve_stream_url(room_id, route, template=LIVE_URL_TEMPLATE, quality="best"):
+    live_url = live_url_for(room_id, template)
+    with SESSION_POOL.session(route, live_url) as session: streams = session.streams(live_url)
+    urls = {name: stream.url for name, stream in streams.items() if getattr(stream, "url", None)}
+    STREAM_URL_CACHE.put(room_id, urls)
+    return pick_quality(urls, quality) if urls else None
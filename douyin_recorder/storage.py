@@ -0,0 +1,145 @@
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+
+from .config import RECORDING_PATH_BASE
+from .history import is_recording_file
+
+# --- 存储管理 ---
+# 录制前检查剩余空间，新录像写到余量最大的存储卷 (storage_volumes)；设置了暂存盘 (staging_dir) 时先写暂存盘，
+# 定稿 (及转码) 后由后台线程移到存储卷。超出全局/单个主播配额时按开始时间从早到晚删除旧录像
+GB = 1024 ** 3
+
+class StorageManager:
+    def __init__(self, settings, streamers, is_busy=lambda path: False, on_moved=None):
+        self.settings, self.streamers, self.is_busy, self.on_moved = settings, streamers, is_busy, on_moved
+        self.history, self._moves, self._stop = None, queue.Queue(), threading.Event()
+        self._threads = []
+
+    # --- 存储卷 ---
+    def volumes(self):
+        return [Path(v) for v in self.settings.get("storage_volumes") or []] or [RECORDING_PATH_BASE]
+
+    def staging(self):
+        return Path(staging) if (staging := self.settings.get("staging_dir")) else None
+
+    def roots(self):
+        staging = self.staging(); volumes = self.volumes()
+        return ([staging] if staging and staging not in volumes else []) + volumes
+
+    def min_free(self):
+        return float(self.settings.get("min_free_gb", 2)) * GB
+
+    @staticmethod
+    def free_bytes(path):
+        try: return shutil.disk_usage(path).free
+        except OSError: return 0
+
+    def headroom(self, root):
+        return self.free_bytes(root) - self.min_free()
+
+    def best_volume(self, size=0):
+        volume = max(self.volumes(), key=self.headroom)
+        return volume if self.headroom(volume) > size else None
+
+    def output_dir_for(self, room_id, size=0):
+        # 暂存盘空间足够时优先写暂存盘，否则直接写余量最大的存储卷；都不足时返回 None。size: 将要写入的字节数 (合并分段时已知)
+        staging = self.staging()
+        root = staging if staging and self.headroom(staging) > size else self.best_volume(size)
+        if root is None: return None
+        folder = root / room_id; folder.mkdir(parents=True, exist_ok=True)
+        return folder
+
+    def has_room(self, folder):
+        # 录制中的阈值是下限的一半，避免在下限附近反复切换存储卷
+        return self.free_bytes(folder) >= self.min_free() / 2
+
+    def room_folders(self, room_id):
+        return [root / room_id for root in self.roots() if (root / room_id).exists()]
+
+    # --- 暂存盘 → 存储卷 ---
+    def archive(self, room_id, path):
+        # 只有位于暂存盘上的完成录像需要搬走
+        staging = self.staging()
+        if staging and Path(path).resolve().is_relative_to(staging.resolve()): self._moves.put((room_id, Path(path)))
+
+    def _move_loop(self):
+        while (item := self._moves.get()) is not None:
+            room_id, src = item
+            try: size = src.stat().st_size
+            except OSError: continue
+            if (volume := self.best_volume(size)) is None: print(f"[Storage] 所有存储卷剩余空间不足，{src.name} 暂留在暂存盘。"); continue
+            dest = volume / room_id / src.name; temp = dest.with_name(dest.name + ".moving")
+            try:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                try: os.replace(src, dest)
+                except OSError: shutil.copy2(src, temp); os.replace(temp, dest); src.unlink()  # 跨磁盘：先复制为临时名再改名，中途失败不会留下半个文件
+            except OSError as e: temp.unlink(missing_ok=True); print(f"[Storage] 移动 {src.name} 失败: {e}"); continue
+            print(f"[Storage] 已移到存储卷: {dest}")
+            try:
+                # 文件已经移好；更新索引或回调出错只记录，搬运线程继续处理后面的录像
+                if self.history: self.history.move(src, dest); self.history.notify(room_id)
+                if self.on_moved: self.on_moved(room_id, dest)
+            except Exception as e: print(f"[Storage] {dest.name} 已移动，但更新录制历史失败: {e}")
+
+    def queue_staged_recordings(self):
+        # 上次退出时还没搬走的完成录像
+        if not (staging := self.staging()) or not staging.exists(): return
+        for path in staging.glob("*/*"):
+            if path.is_file() and is_recording_file(path): self.archive(path.parent.name, path)
+
+    # --- 配额与保留 ---
+    def quota_for(self, room_id):
+        return float(self.streamers.get(room_id, {}).get("quota_gb", self.settings.get("streamer_quota_gb", 0)) or 0) * GB
+
+    def enforce_quotas(self):
+        if not self.history: return 0
+        usage, freed = self.history.usage(), 0
+        for room_id, used in usage.items():
+            if (quota := self.quota_for(room_id)) and used > quota: freed += self._delete_oldest(room_id, used - quota)
+        global_quota = float(self.settings.get("quota_gb", 0) or 0) * GB
+        if global_quota and (total := sum(usage.values()) - freed) > global_quota: freed += self._delete_oldest(None, total - global_quota)
+        return freed
+
+    def _delete_oldest(self, room_id, excess):
+        freed = 0
+        for path, size, owner in self.history.oldest(room_id):
+            if freed >= excess: break
+            if self.is_busy(path): continue  # 正在转码/等待合并的文件不删
+            try: os.remove(path)
+            except FileNotFoundError: pass
+            except OSError as e: print(f"[Storage] 删除 {path} 失败: {e}"); continue
+            self.history.remove(path); self.history.notify(owner); freed += size or 0
+            print(f"[Storage] 超出配额，删除最早的录像: {Path(path).name} ({(size or 0) / GB:.2f} GB)")
+        return freed
+
+    def _retention_loop(self):
+        # 配额按历史索引统计，先把所有主播的文件夹对账一遍
+        if self.settings.get("quota_gb") or self.settings.get("streamer_quota_gb") or any(s.get("quota_gb") for s in list(self.streamers.values())):
+            for room_id in list(self.streamers.keys()): self.history.sync_room(room_id)
+        while True:
+            try:
+                if (freed := self.enforce_quotas()): print(f"[Storage] 按配额清理了 {freed / GB:.2f} GB 旧录像。")
+            except Exception as e: print(f"[Storage] 配额检查出错: {e}")
+            if self._stop.wait(float(self.settings.get("retention_interval", 300))): return
+
+    # --- 启动与关闭 ---
+    def start(self, history, maintenance=True):
+        # maintenance=False (集群工作进程) 时只搬运自己录完的文件，配额清理与遗留文件由协调进程负责
+        self.history = history
+        for root in self.roots(): root.mkdir(parents=True, exist_ok=True)
+        self._threads = [threading.Thread(target=self._move_loop, daemon=True, name="storage-mover")]
+        if maintenance: self._threads.append(threading.Thread(target=self._retention_loop, daemon=True, name="storage-retention"))
+        for thread in self._threads: thread.start()
+        if maintenance: self.queue_staged_recordings()
+
+    def snapshot(self):
+        staging = self.staging()
+        return {"volumes": [{"path": str(root), "staging": root == staging, "free_gb": round(self.free_bytes(root) / GB, 2)} for root in self.roots()],
+                "pending_moves": self._moves.qsize(), "min_free_gb": self.min_free() / GB}
+
+    def shutdown(self):
+        # 正在复制的文件会被中断；暂存盘上未搬走的录像下次启动时继续
+        self._stop.set(); self._moves.put(None)
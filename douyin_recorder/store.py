@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .config import CONFIG_DIR, LEGACY_STREAMERS_FILE, STREAMERS_DIR, load_json, save_json
+
+# --- 主播设定库 ---
+# 所有主播存放在一个 SQLite 文件里，启动时一次查询读出备注与选项；ffmpeg_params 单独成列，选中主播或开始录制时才读取。
+# streamers/*.json 仍可手动编辑：比库中记录更新的文件会在启动时导入，也可以用 import_dir/export_dir 批量导入导出。
+# 旧版的单文件 streamers.json 在首次启动时导入 (库中已有的主播不覆盖)，随后改名为 streamers.json.migrated
+STREAMERS_DB = CONFIG_DIR / "streamers.sqlite3"
+
+class StreamerStore:
+    def __init__(self, db_path=STREAMERS_DB, legacy_dir=STREAMERS_DIR, legacy_file=LEGACY_STREAMERS_FILE):
+        self.legacy_dir, self.legacy_file, self._lock, self._params = legacy_dir, legacy_file, threading.Lock(), {}
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)  # 集群模式下多个进程共用，写入冲突时等待
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS streamers (room_id TEXT PRIMARY KEY, remark TEXT NOT NULL DEFAULT '', options TEXT NOT NULL DEFAULT '{}', ffmpeg_params TEXT NOT NULL DEFAULT '{}', updated REAL NOT NULL)")
+
+    @staticmethod
+    def _split(data):
+        # 备注与 ffmpeg_params 单独存，其余键 (proxy/segment/priority...) 作为选项 JSON
+        options = {k: v for k, v in data.items() if k not in ("remark", "ffmpeg_params")}
+        return data.get("remark", ""), json.dumps(options, ensure_ascii=False)
+
+    @classmethod
+    def _row(cls, room_id, data):
+        return (room_id, *cls._split(data), json.dumps(data.get("ffmpeg_params", {}), ensure_ascii=False), time.time())
+
+    def _upsert(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO streamers (room_id, remark, options, ffmpeg_params, updated) VALUES (?, ?, ?, ?, ?) "
+                                   "ON CONFLICT(room_id) DO UPDATE SET remark=excluded.remark, options=excluded.options, ffmpeg_params=excluded.ffmpeg_params, updated=excluded.updated", rows)
+            for row in rows: self._params.pop(row[0], None)
+
+    def load_all(self):
+        self.import_legacy_file(); self.import_dir(self.legacy_dir, newer_only=True)
+        with self._lock: rows = self._conn.execute("SELECT room_id, remark, options FROM streamers").fetchall()
+        return {room_id: {"remark": remark, **json.loads(options)} for room_id, remark, options in rows}
+
+    def save(self, room_id, data):
+        remark, options = self._split(data)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO streamers (room_id, remark, options, updated) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT(room_id) DO UPDATE SET remark=excluded.remark, options=excluded.options, updated=excluded.updated", (room_id, remark, options, time.time()))
+        if "ffmpeg_params" in data: self.save_ffmpeg_params(room_id, data["ffmpeg_params"])
+
+    def delete(self, room_id):
+        with self._lock, self._conn: self._conn.execute("DELETE FROM streamers WHERE room_id = ?", (room_id,)); self._params.pop(room_id, None)
+        # 同时删除旧的单独设定档，否则下次启动会被重新导入
+        (self.legacy_dir / f"{room_id}.json").unlink(missing_ok=True)
+
+    def ffmpeg_params(self, room_id):
+        with self._lock:
+            if room_id not in self._params:
+                row = self._conn.execute("SELECT ffmpeg_params FROM streamers WHERE room_id = ?", (room_id,)).fetchone()
+                self._params[room_id] = json.loads(row[0]) if row else {}
+            return dict(self._params[room_id])
+
+    def cache_ffmpeg_params(self, room_id, params):
+        # 集群工作进程：参数由协调进程下发，只放进缓存，不写本机的设定库
+        with self._lock: self._params[room_id] = dict(params)
+
+    def save_ffmpeg_params(self, room_id, params):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE streamers SET ffmpeg_params = ?, updated = ? WHERE room_id = ?", (json.dumps(params, ensure_ascii=False), time.time(), room_id))
+            self._params[room_id] = dict(params)
+
+    # --- 导入/导出单独的设定档 ---
+    def import_dir(self, folder, newer_only=False):
+        # newer_only=True 时只解析修改时间晚于库中记录的文件 (启动时只需 scandir，不逐个打开)
+        folder = Path(folder)
+        if not folder.is_dir(): return 0
+        with self._lock: updated = dict(self._conn.execute("SELECT room_id, updated FROM streamers"))
+        rows = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file(): continue
+                room_id = entry.name[:-5]
+                if newer_only and room_id in updated and entry.stat().st_mtime <= updated[room_id]: continue
+                if not (data := load_json(Path(entry.path), None)): continue
+                rows.append(self._row(room_id, data))
+        if rows: self._upsert(rows); print(f"已从 {folder} 导入 {len(rows)} 个主播设定档。")
+        return len(rows)
+
+    def import_legacy_file(self):
+        if not self.legacy_file.is_file(): return 0
+        data = load_json(self.legacy_file, None)
+        with self._lock: existing = {row[0] for row in self._conn.execute("SELECT room_id FROM streamers")}
+        rows = [self._row(str(room_id), entry) for room_id, entry in (data or {}).items() if isinstance(entry, dict) and str(room_id) not in existing]
+        if rows: self._upsert(rows)
+        if self.legacy_file.exists(): os.replace(self.legacy_file, self.legacy_file.with_name(self.legacy_file.name + ".migrated"))
+        print(f"已从旧版 {self.legacy_file.name} 迁移 {len(rows)} 个主播。"); return len(rows)
+
+    def export_dir(self, folder):
+        folder = Path(folder); folder.mkdir(parents=True, exist_ok=True)
+        with self._lock: rows = self._conn.execute("SELECT room_id, remark, options, ffmpeg_params FROM streamers").fetchall()
+        for room_id, remark, options, params in rows: save_json(folder / f"{room_id}.json", {"remark": remark, **json.loads(options), "ffmpeg_params": json.loads(params)})
+        return len(rows)
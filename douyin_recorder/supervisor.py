@@ -0,0 +1,150 @@
+import asyncio
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .events import STATE_CHECKING, STATE_ERROR
+from .ffmpeg import StderrTail, read_progress_async, startupinfo
+from .proxy import ffmpeg_env
+from .recorder import Recording
+
+# --- asyncio 录制监管 ---
+# recording_supervisor = "asyncio" 时，所有录制在同一个事件循环线程里以协程运行：FFmpeg 由 asyncio.create_subprocess_exec 启动，
+# 进度与 stderr 由协程读取，等待、超时、重连退避与停止都不占用线程 (线程模式每路录制要 3 个线程)。
+# 抓流 (Streamlink)、改名/合并/登记历史等阻塞操作交给 supervisor_workers 个线程的线程池，数量与录制路数无关
+class RecordingSupervisor:
+    def __init__(self, workers):
+        self.recording_class = AsyncRecording
+        self.loop, self.executor = asyncio.new_event_loop(), ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="supervisor")
+        self.thread = threading.Thread(target=self.loop.run_forever, name="recording-supervisor", daemon=True); self.thread.start()
+
+    def submit(self, coro):
+        # 可在任意线程调用，返回 concurrent.futures.Future
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, func, *args):
+        # 只在事件循环中调用：把阻塞函数放到线程池执行
+        return self.loop.run_in_executor(self.executor, func, *args)
+
+    def shutdown(self, timeout=5):
+        # 服务已先停止了所有录制；仍未结束的协程直接取消 (取消时会结束其 FFmpeg)
+        async def cancel_all():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        try: self.submit(cancel_all()).result(timeout)
+        except Exception as e: print(f"[Supervisor] 取消录制协程超时: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop); self.thread.join(timeout); self.executor.shutdown(wait=False)
+
+class AsyncRecording(Recording):
+    # 与 RecordingThread 接口相同 (start/is_alive/join/stop/preempt/restart_part)，服务与准入控制不区分两种模式
+    def __init__(self, service, *args, **kwargs):
+        super().__init__(service, *args, **kwargs)
+        self.supervisor, self.future, self._done, self._stopped = service.supervisor, None, threading.Event(), None  # _stopped: 事件循环中的 asyncio.Event
+
+    def start(self):
+        self.future = self.supervisor.submit(self.run())
+
+    def is_alive(self):
+        return self.future is not None and not self._done.is_set()
+
+    def join(self, timeout=None):
+        self._done.wait(timeout)
+
+    def call(self, func, *args):
+        return self.supervisor.call(func, *args)
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        if self._stop_event.is_set(): self._stopped.set()
+        try: await self.record_session()
+        except asyncio.CancelledError:
+            if self.process and self.process.returncode is None: self.process.kill()
+            raise
+        except Exception as e: print(f"[{self.room_id}] 录制协程异常退出: {e}"); self.set_status(STATE_ERROR, "录制出错", "red")
+        finally: self._done.set()
+
+    async def record_session(self):
+        if not (stream_url := await self.call(self.begin_session)): return
+        while stream_url and not self.stopping():
+            if not await self.record_part(stream_url) or (step := self.next_step()) == "stop": break
+            if step == "resolve": stream_url = await self.call(self.resolve) or await self.reconnect()
+            elif step == "reconnect": stream_url = await self.reconnect()
+        await self.call(self.end_session)
+
+    async def record_part(self, stream_url):
+        if not (part := await self.call(self.prepare_part, stream_url)): return False
+        temp_filepath, segment_list, start_time_str, command = part
+        try:
+            # 启动进程要 await，不能一直持有线程锁：先确认未被停止，启动后在锁内登记进程并再检查一次，期间收到的停止由本协程补上
+            with self._process_lock:
+                if self._stop_event.is_set(): return False
+            process = await asyncio.create_subprocess_exec(*command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo(), env=ffmpeg_env(self.route))
+            with self._process_lock: self.process = process; stopped = self._stop_event.is_set()
+            self.metrics.start_part(); stderr_tail = StderrTail()
+            readers = asyncio.gather(self.read_metrics(self.process.stdout), stderr_tail.drain_async(self.process.stderr))
+            readers.add_done_callback(lambda f: f.cancelled() or f.exception())  # 协程被取消 (关闭监管) 时读取协程也随之取消，取走异常免得事件循环报警
+            if stopped: await self.quit_ffmpeg()
+            await self.watch_part(temp_filepath, segment_list, start_time_str)
+            try: await asyncio.wait_for(readers, 2)
+            except asyncio.TimeoutError: pass
+            await self.call(self.end_part, stderr_tail, command, start_time_str)
+        except FileNotFoundError: print(f"[{self.room_id}] FFmpeg执行失败！请确保已正确安装并添加到系统环境变量中。"); self.set_status(STATE_ERROR, "FFmpeg错误", "red"); return False
+        except Exception as e: print(f"[{self.room_id}] FFmpeg 录制出错: {e}"); self.set_status(STATE_ERROR, "录制出错", "red"); return False
+        await self.call(self.finish_part, temp_filepath, segment_list, start_time_str); return True
+
+    async def watch_part(self, temp_filepath, segment_list, start_time_str):
+        while True:
+            try: await asyncio.wait_for(self.process.wait(), 2); return
+            except asyncio.TimeoutError: pass
+            if await self.call(self.watch_tick, temp_filepath, segment_list, start_time_str): await self.quit_ffmpeg()
+
+    async def read_metrics(self, stream):
+        async for block in read_progress_async(stream): self.metrics.update(block)
+
+    async def quit_ffmpeg(self, timeout=5):
+        if not (self.process and self.process.returncode is None): return
+        self._quit_requested = True
+        try: self.process.stdin.write(b"q"); await self.process.stdin.drain()
+        except (OSError, ValueError):
+            try: self.process.terminate()
+            except ProcessLookupError: return
+        try: await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.process.terminate()
+            try: await asyncio.wait_for(self.process.wait(), 2)
+            except asyncio.TimeoutError: print(f"[{self.room_id}] FFmpeg 未在{timeout}秒内响应，强制终止。"); self.process.kill()
+
+    async def reconnect(self):
+        # 与 RecordingThread.reconnect 相同的指数退避，等待期间被停止立即返回
+        timeout, delay = float(self.option("reconnect_timeout", 60)), 1.0
+        max_delay, deadline, attempt = float(self.option("reconnect_max_delay", 15)), time.monotonic() + timeout, 0
+        while time.monotonic() < deadline:
+            attempt += 1; self.set_status(STATE_CHECKING, f"重连中 ({attempt})", "orange")
+            if attempt == 1 and (stream_url := self.cached_stream_url()): print(f"[{self.room_id}] 直播流中断，使用缓存的流地址立即重连..."); return stream_url
+            print(f"[{self.room_id}] 直播流中断，{delay:.0f} 秒后第 {attempt} 次重连...")
+            try: await asyncio.wait_for(self._stopped.wait(), delay); return None
+            except asyncio.TimeoutError: pass
+            if (stream_url := await self.call(self.resolve)): return stream_url
+            delay = min(delay * 2, max_delay)
+        print(f"[{self.room_id}] {timeout:.0f} 秒内未能重新获取直播流，判定为已下播。")
+        return None
+
+    # --- 以下由其他线程调用 ---
+    def signal_stop(self):
+        process = super().signal_stop(); self.supervisor.loop.call_soon_threadsafe(lambda: self._stopped and self._stopped.set()); return process
+
+    def restart_part(self):
+        self.supervisor.submit(self.quit_ffmpeg())
+
+    def preempt(self):
+        print(f"[{self.room_id}] 为更高优先级的主播让出录制名额，停止录制。"); self.stop_text = "让出名额"; self.signal_stop()
+        self.supervisor.submit(self.quit_ffmpeg())
+
+    def stop(self):
+        # 与线程模式一样等到 FFmpeg 收尾后才返回 (服务据此统计停止进度)
+        if (process := self.signal_stop()) and process.returncode is None:
+            print(f"[{self.room_id}] 正在发送停止信号给 FFmpeg...")
+            try: self.supervisor.submit(self.quit_ffmpeg()).result(10)
+            except Exception as e: print(f"[{self.room_id}] 停止 FFmpeg 出错: {e}")
@@ -0,0 +1,122 @@
+import itertools
+import os
+import subprocess
+import threading
+import time
+
+from .config import muxer_for
+from .ffmpeg import StderrTail, probe_media, progress_seconds, read_progress, startupinfo
+
+# --- 后台转码队列 ---
+# 录制时一律 -c copy，需要 libx264/libx265/硬件编码的主播在每个文件完成后排入这里；
+# CPU 软编码受 transcode_workers 限制，nvenc/qsv/amf 各自受 hw_encoder_slots 限制，按优先级调度
+TRANSCODE_KEYS = ("c:v", "preset", "crf", "b:v", "c:a", "b:a")
+HW_ENCODER_FAMILIES = ("nvenc", "qsv", "amf")
+
+def encoder_family(params):
+    codec = params.get("c:v", "copy")
+    return next((family for family in HW_ENCODER_FAMILIES if codec.endswith(f"_{family}")), "cpu")
+
+def needs_transcode(params):
+    return params.get("c:v", "copy") != "copy" or params.get("c:a", "copy") != "copy"
+
+class TranscodeJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, room_id, src, params, priority=0):
+        self.id, self.room_id, self.src, self.params, self.priority = next(self._ids), room_id, src, params, priority
+        self.family, self.status, self.progress, self.error = encoder_family(params), "排队中", 0.0, None
+        self.created, self.process, self.output = time.time(), None, None
+
+    def sort_key(self):
+        return (-self.priority, self.id)
+
+    def to_dict(self):
+        return {"id": self.id, "room_id": self.room_id, "file": self.src.name, "priority": self.priority, "encoder": self.params.get("c:v", "copy"),
+                "family": self.family, "status": self.status, "progress": round(self.progress, 4), "error": self.error}
+
+class TranscodePool:
+    def __init__(self, settings, on_finished=None):
+        self.settings, self.on_finished = settings, on_finished
+        self.jobs, self._pending, self._running = {}, [], {}
+        self._cond, self._dispatcher, self._closed = threading.Condition(), None, False
+
+    def slots_for(self, family):
+        # 至少 1 个名额：设为 0 的编码器上的任务会永远排队，暂存盘上的源文件也就一直不会归档
+        if family == "cpu": return max(1, int(self.settings.get("transcode_workers", 1)))
+        return max(1, int(self.settings.get("hw_encoder_slots", {}).get(family, 1)))
+
+    def settings_changed(self):
+        # 名额调大后立即调度排队中的任务，不必等下一个任务提交或结束
+        with self._cond: self._cond.notify_all()
+
+    def submit(self, room_id, src, params, priority=0):
+        job = TranscodeJob(room_id, src, params, priority)
+        with self._cond:
+            self.jobs[job.id] = job; self._pending.append(job); self._cond.notify_all()
+            if not self._dispatcher: self._dispatcher = threading.Thread(target=self._dispatch_loop, name="transcode-dispatch", daemon=True); self._dispatcher.start()
+        print(f"[Transcode] 已加入转码队列: {src.name} ({job.params.get('c:v')}, 优先级 {priority})")
+        return job
+
+    def _next_runnable(self):
+        for job in sorted(self._pending, key=TranscodeJob.sort_key):
+            if self._running.get(job.family, 0) < self.slots_for(job.family): return job
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and not (job := self._next_runnable()): self._cond.wait()
+                if self._closed: return
+                self._pending.remove(job); self._running[job.family] = self._running.get(job.family, 0) + 1
+            threading.Thread(target=self._run_job, args=(job,), name=f"transcode-{job.id}", daemon=True).start()
+
+    def _run_job(self, job):
+        try: self._transcode(job)
+        except Exception as e: job.status, job.error = "失败", str(e); print(f"[Transcode] {job.src.name} 转码出错: {e}")
+        finally:
+            with self._cond: self._running[job.family] -= 1; self._cond.notify_all()
+        if self.on_finished: self.on_finished(job)
+
+    def _transcode(self, job):
+        file_format = job.params.get("f") or job.src.suffix.lstrip('.')
+        final_filepath = job.src.with_suffix(f".{file_format}")
+        temp_filepath = job.src.with_name(f"{job.src.stem}.transcoding.{file_format}.tmp")
+        duration = probe_media(job.src).get("duration", 0)
+        command = ['ffmpeg', '-y', '-nostats', '-i', str(job.src), '-map', '0']
+        [command.extend([f'-{k}', str(job.params[k])]) for k in TRANSCODE_KEYS if job.params.get(k)]
+        command.extend(['-progress', 'pipe:1', '-f', muxer_for(file_format), str(temp_filepath)])
+        job.status = "转码中"; started = time.monotonic()
+        job.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo())
+        stderr_tail = StderrTail(); stderr_reader = stderr_tail.start(job.process.stderr)
+        for block in read_progress(job.process.stdout):
+            if duration: job.progress = min(1.0, progress_seconds(block) / duration)
+        if job.process.wait() != 0 or not temp_filepath.exists():
+            stderr_reader.join(timeout=2); error = stderr_tail.classify()
+            temp_filepath.unlink(missing_ok=True); job.status, job.error = "失败", error[1] if error else f"FFmpeg 退出码 {job.process.returncode}"
+            stderr_tail.save(job.src.with_name(f"{job.src.stem}_transcode.log"), [f"命令: {' '.join(command)}", f"退出码: {job.process.returncode}", f"错误分类: {error[0] if error else '-'}"])
+            print(f"[Transcode] {job.src.name} 转码失败 ({job.error})，保留原始录像。"); return
+        # keep_original=True 时原始录像改名为 .orig 保留 (不会出现在历史列表里)
+        if self.settings.get("keep_original", False): os.replace(job.src, job.src.with_name(job.src.name + ".orig"))
+        elif final_filepath != job.src: job.src.unlink(missing_ok=True)
+        os.replace(temp_filepath, final_filepath)
+        job.status, job.progress, job.output = "完成", 1.0, final_filepath
+        print(f"[Transcode] {final_filepath.name} 转码完成，耗时 {time.monotonic() - started:.0f} 秒。")
+
+    def pending_sources(self):
+        # 排队中/转码中的源文件 (绝对路径字符串)，存储配额清理时跳过
+        with self._cond: return {str(job.src.resolve()) for job in self.jobs.values() if job.status in ("排队中", "转码中")}
+
+    def snapshot(self):
+        with self._cond: jobs = sorted(self.jobs.values(), key=lambda j: j.id)
+        return [job.to_dict() for job in jobs]
+
+    def clear_finished(self):
+        with self._cond:
+            for job_id in [j.id for j in self.jobs.values() if j.status in ("完成", "失败")]: del self.jobs[job_id]
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True; self._cond.notify_all()
+            running = [j for j in self.jobs.values() if j.process and j.process.poll() is None]
+        for job in running: job.process.terminate()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 测试只覆盖不需要网络、FFmpeg 与界面的纯逻辑；从仓库根目录导入 douyin_recorder 包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+from douyin_recorder.admission import AdmissionController, quality_ladder
+
+def recording(room_id, kbps, ladder=("best", "worst"), level=0):
+    # 与 RecordingThread/AsyncRecording 相同的准入控制接口：room_id/quality/level/ladder/metrics
+    return SimpleNamespace(room_id=room_id, ladder=list(ladder), level=level, quality=ladder[level], quality_changed=0.0,
+                           metrics=SimpleNamespace(to_dict=lambda: {"bitrate_kbps": kbps}))
+
+def controller(settings=None, streamers=None):
+    return AdmissionController({"estimated_bitrate_kbps": 4000, "preempt_policy": "downgrade", **(settings or {})}, streamers or {})
+
+# --- 准入判断 ---
+def test_plan_admits_without_limits():
+    assert controller().plan("new", [recording("a", 8000), recording("b", 8000)]) == (True, [], "")
+
+def test_plan_rejects_when_max_recordings_reached():
+    admitted, actions, reason = controller({"max_recordings": 2}).plan("new", [recording("a", 1000), recording("b", 1000)])
+    assert not admitted and actions == [] and "同时录制上限" in reason
+
+def test_plan_stops_lowest_priority_when_max_recordings_reached():
+    # 录制数已满时降档无济于事，直接停止优先级最低的一路
+    a, b = recording("a", 1000), recording("b", 1000)
+    streamers = {"new": {"priority": 2}, "a": {"priority": 1}, "b": {"priority": 0}}
+    assert controller({"max_recordings": 2}, streamers).plan("new", [a, b]) == (True, [("stop", b)], "")
+
+def test_plan_downgrades_before_stopping_when_over_bandwidth():
+    # 10 Mbps 上限：已有 8 Mbps + 新主播估算 4 Mbps；把低优先级的一路降到 worst (估算为原来一半) 后正好放得下
+    a, b = recording("a", 4000), recording("b", 4000)
+    streamers = {"new": {"priority": 1}}
+    assert controller({"max_ingress_mbps": 10}, streamers).plan("new", [a, b]) == (True, [("downgrade", a)], "")
+
+def test_plan_stops_when_downgrade_is_not_enough():
+    a = recording("a", 9000)
+    streamers = {"new": {"priority": 1}}
+    admitted, actions, _ = controller({"max_ingress_mbps": 10, "estimated_bitrate_kbps": 9000}, streamers).plan("new", [a])
+    assert admitted and actions == [("stop", a)]
+
+def test_plan_never_preempts_equal_priority():
+    admitted, actions, reason = controller({"max_ingress_mbps": 10}).plan("new", [recording("a", 4000), recording("b", 4000)])
+    assert not admitted and actions == [] and "入站带宽上限" in reason
+
+def test_plan_policy_none_keeps_running_recordings():
+    streamers = {"new": {"priority": 1}}
+    admitted, actions, _ = controller({"max_recordings": 1, "preempt_policy": "none"}, streamers).plan("new", [recording("a", 1000)])
+    assert not admitted and actions == []
+
+def test_estimate_uses_last_measured_bitrate():
+    admission = controller()
+    admission.usage([recording("a", 2500)])
+    assert admission.estimate("a") == 2500 and admission.estimate("other") == 4000
+
+# --- 画质档位与自动画质 ---
+def test_quality_ladder_parsing():
+    assert quality_ladder("uhd > hd > sd") == ["uhd", "hd", "sd"]
+    assert quality_ladder(["hd", " sd "]) == ["hd", "sd"]
+    # 只写 best (或没写) 时与旧版一样可以降到 worst；明确写出的档位不自动追加
+    assert quality_ladder("best") == quality_ladder("") == quality_ladder(None) == ["best", "worst"]
+    assert quality_ladder("uhd") == ["uhd"]
+
+def test_plan_single_rung_ladder_falls_through_to_stop():
+    # 只有一个档位的录制无法降档，只超带宽时也直接停止
+    a = recording("a", 4000, ladder=quality_ladder("uhd"))
+    streamers = {"new": {"priority": 1}, "a": {"quality": "uhd"}}
+    assert controller({"max_ingress_mbps": 6}, streamers).plan("new", [a]) == (True, [("stop", a)], "")
+
+def test_plan_skips_recordings_already_at_lowest_rung():
+    # low 码率更高、本应先降，但已在最低档；降 high (3000 → 估算 1500) 后正好放得下
+    low, high = recording("low", 5000, level=1), recording("high", 3000)
+    streamers = {"new": {"priority": 1}}
+    assert controller({"max_ingress_mbps": 10.5}, streamers).plan("new", [low, high]) == (True, [("downgrade", high)], "")
+
+def test_rebalance_needs_a_bandwidth_cap():
+    assert controller({"auto_quality": True}).rebalance([recording("a", 9500, ladder=("uhd", "hd"))]) is None
+
+def test_rebalance_downgrades_lowest_priority_above_high_mark():
+    a, b = recording("a", 5000, ladder=("uhd", "hd")), recording("b", 4500, ladder=("uhd", "hd"))
+    streamers = {"a": {"priority": 1}}
+    assert controller({"max_ingress_mbps": 10, "auto_quality": True}, streamers).rebalance([a, b]) == ("down", b)
+
+def test_rebalance_holds_between_marks_and_during_cooldown():
+    settings = {"max_ingress_mbps": 10, "auto_quality": True, "auto_quality_cooldown": 60}
+    assert controller(settings).rebalance([recording("a", 8000, ladder=("uhd", "hd"))]) is None
+    a = recording("a", 9500, ladder=("uhd", "hd")); a.quality_changed = time.monotonic()
+    assert controller(settings).rebalance([a]) is None
+
+def test_rebalance_upgrades_only_when_the_higher_rung_fits():
+    admission = controller({"max_ingress_mbps": 10, "auto_quality": True})
+    a = recording("a", 3000, ladder=("uhd", "hd"), level=1)
+    admission.last_bitrate[("a", "uhd")] = 6000
+    assert admission.rebalance([a]) == ("up", a)
+    admission.last_bitrate[("a", "uhd")] = 9500
+    assert admission.rebalance([a]) is None
+
+def test_rebalance_ignores_recordings_without_auto_quality():
+    streamers = {"a": {"auto_quality": False}}
+    assert controller({"max_ingress_mbps": 10, "auto_quality": True}, streamers).rebalance([recording("a", 9500, ladder=("uhd", "hd"))]) is None
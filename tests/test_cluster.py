@@ -0,0 +1,81 @@
+import json
+import socket
+import time
+
+from douyin_recorder.cluster import Coordinator, parse_address, rendezvous, valid_hello
+
+ROOMS = [str(700000000000 + i * 7919) for i in range(600)]
+
+def assign(workers):
+    return {room_id: rendezvous(room_id, workers) for room_id in ROOMS}
+
+def test_rendezvous_is_deterministic_and_order_independent():
+    assert assign(["local-0", "local-1", "local-2"]) == assign(["local-2", "local-0", "local-1"])
+
+def test_rendezvous_spreads_rooms_evenly():
+    counts = {}
+    for owner in assign(["local-0", "local-1", "local-2"]).values(): counts[owner] = counts.get(owner, 0) + 1
+    assert set(counts) == {"local-0", "local-1", "local-2"} and min(counts.values()) > len(ROOMS) / 3 * 0.7
+
+def test_removing_a_worker_only_moves_its_rooms():
+    before, after = assign(["local-0", "local-1", "local-2"]), assign(["local-0", "local-2"])
+    moved = [r for r in ROOMS if before[r] != after[r]]
+    assert moved and all(before[r] == "local-1" for r in moved)
+
+def test_adding_a_worker_only_takes_rooms_for_itself():
+    before, after = assign(["local-0", "local-1"]), assign(["local-0", "local-1", "remote-a"])
+    moved = [r for r in ROOMS if before[r] != after[r]]
+    assert moved and all(after[r] == "remote-a" for r in moved)
+
+def test_parse_address():
+    assert parse_address("192.168.1.10:9000", 8849) == ("192.168.1.10", 9000)
+    assert parse_address("recorder.lan", 8849) == ("recorder.lan", 8849)
+
+# --- 连入验证 ---
+def test_valid_hello_checks_token_and_worker():
+    hello = {"type": "hello", "worker": "remote-a", "token": "秘密-token"}
+    assert valid_hello(hello, "秘密-token") and not valid_hello({**hello, "token": "秘密-tokem"}, "秘密-token")
+    assert not valid_hello({**hello, "token": "é"}, "abc") and not valid_hello({"type": "hello", "worker": "a"}, "abc")
+
+def test_valid_hello_rejects_malformed_messages():
+    for hello in (None, [], "hello", {"type": "report"}, {"type": "hello", "token": "abc"}, {"type": "hello", "worker": 7, "token": "abc"}, {"type": "hello", "worker": "", "token": "abc"}):
+        assert not valid_hello(hello, "abc")
+
+# --- 协调进程 (图形界面用到的接口) ---
+class FakeWorker:
+    # 按协议连入协调进程的假工作进程
+    def __init__(self, coordinator, worker_id):
+        self.sock = socket.create_connection(coordinator.address, timeout=5); self.reader = self.sock.makefile("rb")
+        self.send({"type": "hello", "worker": worker_id, "host": "test", "pid": 1, "token": coordinator.token})
+    def send(self, message): self.sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    def receive(self, kind):
+        while (message := json.loads(self.reader.readline()))["type"] != kind: pass
+        return message
+    def close(self): self.sock.close()
+
+def test_coordinator_serves_the_gui_interface(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path); finished = []
+    coordinator = Coordinator(workers=0, port=0, on_recording_finished=lambda room_id, path: finished.append((room_id, path.name)), allow_proxy=False)
+    try:
+        worker = FakeWorker(coordinator, "remote-a")
+        assert worker.receive("assign")["rooms"] == {} and coordinator.proxy_allowed() is False
+        # 新增主播与修改参数都会重新下发；本次运行禁用代理的覆盖值随设定下发
+        assert coordinator.add_streamer("1001", "主播") and not coordinator.add_streamer("1001", "重复")
+        assign = worker.receive("assign")
+        assert assign["rooms"] == {"1001": {"remark": "主播", "ffmpeg_params": {}}} and assign["settings"]["allow_proxy"] is False and "cluster_token" not in assign["settings"]
+        coordinator.set_streamer_ffmpeg_params("1001", {"c:v": "libx264"})
+        assert worker.receive("assign")["rooms"]["1001"]["ffmpeg_params"] == {"c:v": "libx264"}
+        # 汇报汇总成界面的状态栏、转码队列与录制上限
+        worker.send({"type": "report", "snapshot": {"requests": {"rate": 5, "tokens": 3, "burst": 20, "requests_recent": 10, "blocked_recent": 2, "rooms_backing_off": 1, "proxies_backing_off": ["http://p"], "proxy_resume_in": 40},
+                                                    "admission": {"recordings": 1, "max_recordings": 4}, "transcode": [{"id": 1, "room_id": "1001", "status": "排队中"}]}, "metrics": []})
+        worker.send({"type": "recording_finished", "room_id": "1001", "path": str(tmp_path / "1001_a_to_b.mkv")})
+        worker.send({"type": "event", "room_id": "1001", "state": "recording", "text": "录制中", "color": "green", "time": 0})
+        deadline = time.monotonic() + 5  # 同一连接上的消息按顺序处理：最后一条状态事件到了，前面的也都处理完了
+        while not coordinator.is_recording("1001") and time.monotonic() < deadline: time.sleep(0.02)
+        coordinator.clear_finished_transcodes(); assert worker.receive("clear_transcodes")
+        status = coordinator.request_status()
+        assert status["block_rate"] == 0.2 and status["proxies_backing_off"] == ["http://p"] and status["proxy_resume_in"] == 40
+        assert coordinator.admission_usage()["max_recordings"] == 4 and [j["id"] for j in coordinator.transcode_jobs()] == ["remote-a:1"]
+        assert finished == [("1001", "1001_a_to_b.mkv")] and coordinator.is_recording("1001")
+        worker.close()
+    finally: coordinator.shutdown()
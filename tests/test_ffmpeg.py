@@ -0,0 +1,36 @@
+import io
+
+from douyin_recorder.ffmpeg import STDERR_LINE_MAX, StderrTail, classify_ffmpeg_error, progress_seconds, read_progress
+
+# --- stderr 错误分类 ---
+def test_classify_uses_last_matching_line():
+    lines = ["[http] HTTP error 404 Not Found", "frame= 100 fps=25", "av_interleaved_write_frame(): No space left on device"]
+    assert classify_ffmpeg_error(lines) == ("disk_full", "磁盘已满", "rotate")
+    assert classify_ffmpeg_error(lines[:2]) == ("http_404", "流地址已失效 (404)", "refresh")
+
+def test_classify_fatal_and_unknown_errors():
+    assert classify_ffmpeg_error(["Unrecognized option 'crf2'."])[2] == "fatal"
+    assert classify_ffmpeg_error(["Connection reset by peer"])[2] == "retry"
+    assert classify_ffmpeg_error(["frame= 100 fps=25", "Exiting normally, received signal 2."]) is None and classify_ffmpeg_error([]) is None
+
+def test_stderr_tail_is_bounded():
+    tail = StderrTail(max_lines=3)
+    tail.drain(io.BytesIO(b"".join(f"line {i}\n".encode() for i in range(10)) + b"\n\n"))
+    assert list(tail.lines) == ["line 7", "line 8", "line 9"]
+
+def test_stderr_tail_truncates_long_lines():
+    tail = StderrTail()
+    tail.drain(io.BytesIO(b"x" * 10000 + b"\nHTTP error 403 Forbidden\n"))
+    assert all(len(line) <= STDERR_LINE_MAX for line in tail.lines) and tail.classify()[0] == "http_403"
+
+def test_stderr_tail_save(tmp_path):
+    tail = StderrTail(); tail.add("错误".encode("utf-8")); tail.add(b"\xff bad utf-8")
+    assert tail.save(tmp_path / "ffmpeg.log", ["command"])
+    assert (tmp_path / "ffmpeg.log").read_text(encoding="utf-8") == "# command\n错误\n� bad utf-8\n"
+
+# --- -progress 输出 ---
+def test_read_progress_blocks():
+    stream = io.BytesIO(b"frame=10\nout_time_us=2500000\nprogress=continue\nframe=20\nout_time_ms=5000000\nprogress=end\n")
+    blocks = list(read_progress(stream))
+    assert [b["progress"] for b in blocks] == ["continue", "end"] and [progress_seconds(b) for b in blocks] == [2.5, 5.0]
+    assert progress_seconds({"out_time_us": "N/A"}) == 0.0
@@ -0,0 +1,68 @@
+import threading
+
+from douyin_recorder.governor import OUTCOME_BLOCKED, OUTCOME_LIVE, OUTCOME_OFFLINE, RequestGovernor, TokenBucket, is_blocked_error
+from douyin_recorder.proxy import ProxyRoute
+
+ROUTE = ProxyRoute("custom", "http://127.0.0.1:7890")
+
+def stopped():
+    event = threading.Event(); event.set(); return event
+
+# --- 令牌桶 ---
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=0.01, burst=2)
+    assert bucket.acquire(threading.Event()) and bucket.acquire(threading.Event())
+    # 令牌用完：等待期间被停止则返回 False，不会拿到令牌
+    assert not bucket.acquire(stopped()) and bucket.available() < 1
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=1000, burst=1)
+    assert bucket.acquire(threading.Event()) and bucket.acquire(threading.Event())
+
+def test_governor_zero_rate_is_unlimited():
+    governor = RequestGovernor({"request_rate": 0})
+    assert all(governor.acquire(threading.Event()) for _ in range(100)) and not governor.acquire(stopped())
+
+# --- 封禁退避 ---
+def test_blocked_request_backs_off_room_and_proxy():
+    governor = RequestGovernor({"block_backoff": 60})
+    governor.record("1001", ROUTE, OUTCOME_BLOCKED)
+    assert governor.room_blocked("1001") and governor.proxy_blocked(ROUTE) and not governor.room_blocked("1002")
+    snapshot = governor.snapshot()
+    assert snapshot["blocked_recent"] == 1 and snapshot["rooms_backing_off"] == 1 and snapshot["proxies_backing_off"] == [ROUTE.url]
+    assert 48 <= snapshot["proxy_resume_in"] <= 72
+
+def test_direct_and_system_routes_are_never_paused_as_a_whole():
+    # 直连/系统代理是所有房间共用的出口：只退避被拦截的房间，其他房间照常探测
+    governor = RequestGovernor({"block_backoff": 60})
+    for route in (ProxyRoute("direct", ""), ProxyRoute("system", "")):
+        governor.record("1001", route, OUTCOME_BLOCKED)
+        assert governor.room_blocked("1001") and not governor.proxy_blocked(route)
+    assert governor.snapshot()["proxies_backing_off"] == [] and governor.snapshot()["proxy_resume_in"] == 0
+
+def test_success_clears_room_but_proxy_waits_for_expiry():
+    governor = RequestGovernor({"block_backoff": 60})
+    governor.record("1001", ROUTE, OUTCOME_BLOCKED); governor.record("1001", ROUTE, OUTCOME_LIVE)
+    assert not governor.room_blocked("1001") and governor.proxy_blocked(ROUTE)
+
+def test_backoff_grows_and_is_capped():
+    governor = RequestGovernor({"block_backoff": 60, "block_backoff_max": 200})
+    delays = [governor._penalize(governor.room_backoff, "1001") for _ in range(5)]
+    assert 48 <= delays[0] <= 72 and 96 <= delays[1] <= 144 and all(d <= 240 for d in delays[2:])
+    assert governor.room_backoff["1001"][0] == 5
+
+def test_offline_is_not_counted_as_blocked():
+    governor = RequestGovernor({})
+    governor.record("1001", ROUTE, OUTCOME_OFFLINE)
+    assert governor.snapshot()["block_rate"] == 0.0 and not governor.room_blocked("1001")
+
+def test_is_blocked_error_follows_exception_chain():
+    class Response: status_code = 429
+    class HTTPError(Exception): response = Response()
+    try:
+        try: raise HTTPError("rate limited")
+        except HTTPError as e: raise RuntimeError("Unable to open URL") from e
+    except RuntimeError as e: wrapped = e
+    assert is_blocked_error(wrapped)
+    assert is_blocked_error(Exception("请完成验证码")) and is_blocked_error(Exception("403 Client Error: Forbidden"))
+    assert not is_blocked_error(Exception("Connection reset by peer")) and not is_blocked_error(Exception("port 4031"))
@@ -0,0 +1,57 @@
+import os
+
+from douyin_recorder.history import RecordingIndex, format_duration, format_size
+
+MTIME = 1_719_760_000
+
+def make_index(tmp_path, roots):
+    # ffprobe 补全时长不在这里测试：探测队列换成只记录路径
+    index = RecordingIndex(db_path=tmp_path / "history.sqlite3", roots=lambda: roots)
+    index.probed = []; index._queue_probe = lambda room_id, path: index.probed.append(path)
+    return index
+
+def recording(folder, name, size=100):
+    folder.mkdir(parents=True, exist_ok=True); path = folder / name
+    path.write_bytes(b"x" * size); os.utime(path, (MTIME, MTIME)); return path
+
+def test_add_query_and_remove(tmp_path):
+    index = make_index(tmp_path, [tmp_path])
+    early = recording(tmp_path / "1001", "1001_20240630-200000_to_20240630-220000.flv", 300)
+    late = recording(tmp_path / "1001", "1001_20240701-200000_to_20240701-210000.flv", 100)
+    index.add("1001", early); index.add("1001", late); index.add("1001", tmp_path / "missing.flv")
+    assert index.count("1001") == 2 and index.count("1002") == 0 and len(index.probed) == 2
+    assert [r["filename"] for r in index.query("1001")] == [late.name, early.name]
+    assert [r["filename"] for r in index.query("1001", sort="size", descending=False)] == [late.name, early.name]
+    assert index.query("1001", limit=1, offset=1)[0]["start"] == "2024-06-30 20:00:00" and index.usage() == {"1001": 400}
+    index.remove(early); assert index.count("1001") == 1
+
+def test_move_keeps_probed_details_and_replaces_the_target(tmp_path):
+    index = make_index(tmp_path, [tmp_path / "staging", tmp_path / "volume"])
+    src = recording(tmp_path / "staging" / "1001", "1001_20240630-200000_to_20240630-220000.flv")
+    index.add("1001", src)
+    with index._conn: index._conn.execute("UPDATE recordings SET duration = 7200, codec = 'h264'")
+    # 对账先登记了目标路径 (尚未探测)，移动后只剩一条带时长的记录
+    dest = recording(tmp_path / "volume" / "1001", src.name); index.add("1001", dest)
+    index.move(src, dest)
+    assert [(r["path"], r["duration"], r["codec"]) for r in index.query("1001")] == [(str(dest.resolve()), 7200, "h264")]
+
+def test_sync_room_adds_changed_and_drops_missing_files(tmp_path):
+    index = make_index(tmp_path, [tmp_path / "a", tmp_path / "b"])
+    kept = recording(tmp_path / "a" / "1001", "1001_20240630-200000_to_20240630-220000.mkv")
+    gone = recording(tmp_path / "b" / "1001", "1001_20240629-200000_to_20240629-220000.ts")
+    recording(tmp_path / "a" / "1001", "1001_20240630-200000_recording.mkv.tmp"); recording(tmp_path / "a" / "1001", "notes.txt")
+    changed = []; index.on_changed = changed.append
+    assert index.sync_room("1001") and index.count("1001") == 2 and changed == ["1001"]
+    assert not index.sync_room("1001")  # 没有变化：不写入也不通知
+    gone.unlink(); kept.write_bytes(b"y" * 50)
+    assert index.sync_room("1001") and [(r["filename"], r["size"]) for r in index.query("1001")] == [(kept.name, 50)]
+
+def test_oldest_orders_by_start_time(tmp_path):
+    index = make_index(tmp_path, [tmp_path])
+    for name in ("1001_20240701-200000_to_20240701-210000.flv", "1002_20240630-200000_to_20240630-210000.flv", "1001_20240629-200000_to_20240629-210000.flv"):
+        index.add(name[:4], recording(tmp_path / name[:4], name))
+    assert [room for _, _, room in index.oldest()] == ["1001", "1002", "1001"]
+    assert [os.path.basename(p) for p, _, _ in index.oldest("1001", limit=1)] == ["1001_20240629-200000_to_20240629-210000.flv"]
+
+def test_formatting():
+    assert format_size(3 * 1024 * 1024) == "3.00 MB" and format_duration(None) == "读取中..." and format_duration(0) == "-" and format_duration(3725.5) == "1:02:05"
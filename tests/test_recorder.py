@@ -0,0 +1,182 @@
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+from douyin_recorder.recorder import RecordingThread
+from douyin_recorder.session import STREAM_URL_CACHE
+from douyin_recorder.storage import GB, StorageManager
+from douyin_recorder.supervisor import RecordingSupervisor
+
+# 录制状态机：用假的服务 (抓流可控的治理器、固定的存储目录) 与一个 Python 写的假 FFmpeg 测试停止与重连
+
+FAKE_FFMPEG = """#!{python}
+import os, select, sys
+out = sys.argv[-1]; open(os.environ["FAKE_MARKER"], "a").write(out + "\\n")
+with open(out, "wb") as f:
+    for i in range(int(os.environ.get("FAKE_N", "100"))):
+        f.write(b"x" * 1000); f.flush()
+        sys.stdout.write(f"total_size={{(i + 1) * 1000}}\\nout_time_us={{i * 100000}}\\nprogress=continue\\n"); sys.stdout.flush()
+        if select.select([sys.stdin], [], [], 0.1)[0] and sys.stdin.read(1) == "q": break
+"""
+
+class FakeGovernor:
+    def __init__(self, stream_url="http://stream/live.flv", delay=0.0):
+        self.stream_url, self.delay, self.calls, self.entered = stream_url, delay, 0, threading.Event()
+
+    def resolve(self, room_id, route, template, preferences, stop_event):
+        self.calls += 1; self.entered.set(); time.sleep(self.delay)
+        return self.stream_url, None, False
+
+class FakeStorage:
+    def __init__(self, folder): self.folder = folder
+    def output_dir_for(self, room_id, size=0): return self.folder
+    def has_room(self, folder): return True
+
+class FakeService:
+    def __init__(self, folder, governor, **settings):
+        self.settings, self.streamers, self.governor, self.storage = settings, {}, governor, FakeStorage(folder)
+        self.statuses, self.finished, self.supervisor = [], [], None
+    def publish_status(self, room_id, state, text, color): self.statuses.append(text)
+    def notify_recording_finished(self, room_id, path, complete=True): self.finished.append(path)
+    def submit_transcode(self, room_id, path): pass
+    def forget_recording(self, path): pass
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    # 假 FFmpeg 放在 PATH 最前面；每次启动都在 marker 文件里记一行输出路径
+    if os.name == "nt": pytest.skip("假 FFmpeg 是 POSIX 脚本")
+    folder, marker = tmp_path / "bin", tmp_path / "started.txt"; folder.mkdir()
+    script = folder / "ffmpeg"; script.write_text(FAKE_FFMPEG.format(python=sys.executable), encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{folder}{os.pathsep}{os.environ['PATH']}"); monkeypatch.setenv("FAKE_MARKER", str(marker))
+    return marker
+
+@pytest.fixture(params=["threads", "asyncio"])
+def supervisor(request):
+    # 停止相关的测试在两种录制模式下各跑一遍 (recording_supervisor = threads / asyncio)
+    if request.param == "threads": yield None; return
+    supervisor = RecordingSupervisor(4); yield supervisor; supervisor.shutdown()
+
+def recording(tmp_path, governor, room_id, stream_url=None, supervisor=None, **settings):
+    STREAM_URL_CACHE.invalidate(room_id)
+    service = FakeService(tmp_path, governor, **settings); service.supervisor = supervisor
+    return (supervisor.recording_class if supervisor else RecordingThread)(service, room_id, {"f": "flv"}, stream_url=stream_url), service
+
+def starts(marker):
+    return len(marker.read_text(encoding="utf-8").splitlines()) if marker.exists() else 0
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline: time.sleep(0.02)
+    return condition()
+
+# --- 一段结束后的下一步 ---
+def test_next_step_state_machine(tmp_path):
+    thread, service = recording(tmp_path, FakeGovernor(), "2001")
+    thread.part_connected, thread.part_error = True, None
+    assert thread.next_step() == "reconnect"
+    thread.part_error = ("disk_full", "磁盘已满", "rotate"); assert thread.next_step() == "same"
+    thread.part_error = ("bad_option", "参数错误", "fatal"); assert thread.next_step() == "stop" and service.statuses[-1] == "参数错误"
+    thread.part_error = None; thread._rotate_event.set()
+    assert thread.next_step() == "same" and thread.next_step() == "reconnect"  # 按大小切分只沿用一次
+    thread._requality_event.set(); assert thread.next_step() == "resolve"
+    thread._stop_event.set(); assert thread.next_step() == "stop"
+
+# --- 停止 ---
+def test_stop_during_resolve_never_starts_ffmpeg(tmp_path, ffmpeg, supervisor):
+    governor = FakeGovernor(delay=0.5)
+    thread, service = recording(tmp_path, governor, "2002", supervisor=supervisor)
+    thread.start(); assert governor.entered.wait(5)
+    thread.stop()  # 抓流还没返回：此时没有 FFmpeg 可结束，stop 立即返回
+    thread.join(5)
+    assert not thread.is_alive() and starts(ffmpeg) == 0 and thread.process is None and service.statuses[-1] == "手动停止"
+
+def test_stop_during_recording_finalizes_the_part(tmp_path, ffmpeg, supervisor):
+    thread, service = recording(tmp_path, FakeGovernor(), "2003", stream_url="http://stream/live.flv", supervisor=supervisor)
+    thread.start(); assert wait_for(lambda: starts(ffmpeg) == 1)
+    thread.stop(); thread.join(5)
+    assert not thread.is_alive() and thread.process.returncode is not None and starts(ffmpeg) == 1
+    assert len(service.finished) == 1 and service.finished[0].exists() and not list(tmp_path.glob("*.tmp"))
+
+def test_stop_during_reconnect_returns_promptly(tmp_path, ffmpeg, monkeypatch, supervisor):
+    # FFmpeg 自己结束 (断流)：进入重连退避，等待期间停止不再抓流也不再启动 FFmpeg
+    monkeypatch.setenv("FAKE_N", "1")
+    governor = FakeGovernor()
+    thread, service = recording(tmp_path, governor, "2004", stream_url="http://stream/live.flv", supervisor=supervisor)
+    thread.start(); assert wait_for(lambda: any(s.startswith("重连中") for s in service.statuses))
+    thread.stop(); thread.join(2)
+    assert not thread.is_alive() and starts(ffmpeg) == 1 and governor.calls == 0 and service.statuses[-1] == "手动停止"
+
+# --- 合并分段 ---
+def concat_recording(tmp_path, free):
+    # 两段录在卷 a 上；free: 各卷的剩余空间 (字节)
+    volumes = {name: tmp_path / name for name in free}
+    thread, service = recording(tmp_path, FakeGovernor(), "2005", concat_parts=True, storage_volumes=[str(v) for v in volumes.values()], min_free_gb=1)
+    service.storage = storage = StorageManager(service.settings, service.streamers)
+    storage.free_bytes = lambda path: next(free[name] for name, v in volumes.items() if str(path).startswith(str(v)))
+    thread.output_dir = volumes["a"] / "2005"; thread.output_dir.mkdir(parents=True)
+    for start, end in (("20240630-200000", "20240630-203000"), ("20240630-203000", "20240630-210000")):
+        part = thread.output_dir / f"2005_{start}_to_{end}.flv"; part.write_bytes(b"x" * 1000); thread.parts.append(part)
+    return thread, service
+
+def test_concat_writes_to_a_volume_with_room_for_all_parts(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_N", "1")
+    # 卷 a 放不下合并结果 (余量 1500 < 2000)，卷 b 可以
+    thread, service = concat_recording(tmp_path, {"a": 1 * GB + 1500, "b": 2 * GB})
+    assert thread.concat_parts()
+    assert thread.parts == [tmp_path / "b" / "2005" / "2005_20240630-200000_to_20240630-210000.flv"] and thread.parts[0].exists()
+    assert not list((tmp_path / "a" / "2005").iterdir()) and service.finished == thread.parts
+
+def test_concat_is_skipped_when_no_volume_can_hold_the_parts(tmp_path, ffmpeg):
+    thread, service = concat_recording(tmp_path, {"a": 1 * GB + 1500, "b": 1 * GB + 100})
+    parts = list(thread.parts)
+    assert not thread.concat_parts() and thread.parts == parts and all(p.exists() for p in parts) and starts(ffmpeg) == 0
+
+# --- 时间分段: FFmpeg 写入的 CSV 分段列表 ---
+def segment_recording(tmp_path):
+    thread, service = recording(tmp_path, FakeGovernor(), "2006", segment={"minutes": 30})
+    thread.output_dir, thread._segment_rows_done = tmp_path, 0
+    return thread, service
+
+def temp_segment(tmp_path, start, mtime):
+    path = tmp_path / f"2006_{start}_recording.flv.tmp"; path.write_bytes(b"x"); os.utime(path, (mtime, mtime)); return path
+
+def test_segments_are_finalized_as_the_list_grows(tmp_path):
+    thread, service = segment_recording(tmp_path)
+    first, second = temp_segment(tmp_path, "20240630-200000", 1_719_750_600), temp_segment(tmp_path, "20240630-203000", 1_719_752_400)
+    segment_list = tmp_path / "2006_20240630-200000_segments.csv"
+    segment_list.write_text(f"{first},0.0,1800.0\n", encoding="utf-8")
+    thread.finalize_segments(segment_list, "20240630-200000")
+    assert not first.exists() and second.exists() and thread._segment_rows_done == 1 and len(service.finished) == 1
+    ended = time.strftime("%Y%m%d-%H%M%S", time.localtime(1_719_750_600))
+    assert service.finished[0].name == f"2006_20240630-200000_to_{ended}.flv"
+    # 已处理的行不会重复改名 (文件已不存在也不报错)
+    thread.finalize_segments(segment_list, "20240630-200000")
+    assert len(service.finished) == 1 and second.exists()
+
+def test_final_pass_renames_unlisted_segments_and_removes_the_list(tmp_path):
+    # FFmpeg 被强制结束时最后一段没写进列表；更早一次录制遗留的临时文件不属于本段，不会被改名
+    thread, service = segment_recording(tmp_path)
+    older, last = temp_segment(tmp_path, "20240630-180000", 1_719_745_000), temp_segment(tmp_path, "20240630-200000", 1_719_750_600)
+    segment_list = tmp_path / "2006_20240630-200000_segments.csv"; segment_list.write_text("", encoding="utf-8")
+    thread.finish_part(None, segment_list, "20240630-200000")
+    assert not last.exists() and older.exists() and not segment_list.exists() and [p.name[:20] for p in service.finished] == ["2006_20240630-200000"]
+
+# --- 让出名额与 asyncio 监管 ---
+def test_preempt_ends_the_recording_without_blocking(tmp_path, ffmpeg, supervisor):
+    thread, service = recording(tmp_path, FakeGovernor(), "2007", stream_url="http://stream/live.flv", supervisor=supervisor)
+    thread.start(); assert wait_for(lambda: starts(ffmpeg) == 1)
+    started = time.monotonic(); thread.preempt()
+    assert time.monotonic() - started < 0.5 and wait_for(lambda: not thread.is_alive())
+    assert service.statuses[-1] == "让出名额" and len(service.finished) == 1
+
+def test_supervisor_shutdown_kills_unfinished_recordings(tmp_path, ffmpeg):
+    supervisor = RecordingSupervisor(2)
+    thread, service = recording(tmp_path, FakeGovernor(), "2008", stream_url="http://stream/live.flv", supervisor=supervisor)
+    thread.start(); assert wait_for(lambda: starts(ffmpeg) == 1)
+    supervisor.shutdown()
+    assert not thread.is_alive() and wait_for(lambda: thread.process.returncode is not None) and not supervisor.thread.is_alive()
@@ -0,0 +1,66 @@
+import datetime
+import os
+import stat
+import sys
+
+import pytest
+
+from douyin_recorder.recovery import find_orphaned_recordings, recover_orphaned_recordings, recover_recording
+
+# 假 FFmpeg: FAKE_EXIT=0 时把 -i 的输入复制到最后一个参数 (重新封装成功)，否则不输出直接以该退出码结束
+FAKE_FFMPEG = """#!{python}
+import os, shutil, sys
+if os.environ.get("FAKE_EXIT", "0") != "0": sys.exit(int(os.environ["FAKE_EXIT"]))
+shutil.copyfile(sys.argv[sys.argv.index("-i") + 1], sys.argv[-1])
+"""
+STARTED = datetime.datetime(2024, 7, 1, 12, 0)
+MTIME = datetime.datetime(2024, 6, 30, 21, 15, 30).timestamp()
+
+@pytest.fixture
+def ffmpeg(tmp_path, monkeypatch):
+    if os.name == "nt": pytest.skip("假 FFmpeg 是 POSIX 脚本")
+    folder = tmp_path / "bin"; folder.mkdir()
+    script = folder / "ffmpeg"; script.write_text(FAKE_FFMPEG.format(python=sys.executable), encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(folder))
+
+def orphan(root, name, data=b"data"):
+    folder = root / "1001"; folder.mkdir(parents=True, exist_ok=True)
+    path = folder / name; path.write_bytes(data); os.utime(path, (MTIME, MTIME)); return path
+
+def test_only_temp_files_from_before_startup_are_orphans(tmp_path):
+    old = orphan(tmp_path, "1001_20240630-200000_recording.flv.tmp")
+    orphan(tmp_path, "1001_20240701-120500_recording.flv.tmp"); orphan(tmp_path, "1001_20240630-200000_to_20240630-220000.flv")
+    orphan(tmp_path, "1001_notes_recording.flv.tmp")
+    assert find_orphaned_recordings(STARTED, [tmp_path]) == [old]
+
+def test_empty_temp_file_is_deleted(tmp_path):
+    path = orphan(tmp_path, "1001_20240630-200000_recording.flv.tmp", b"")
+    assert recover_recording(path) is None and not path.exists()
+
+def test_remuxed_file_is_named_with_mtime_as_end(tmp_path, ffmpeg):
+    path = orphan(tmp_path, "1001_20240630-200000_recording.mkv.tmp")
+    final = recover_recording(path)
+    assert final == path.parent / "1001_20240630-200000_to_20240630-211530.mkv" and final.read_bytes() == b"data"
+    assert not path.exists() and not list(path.parent.glob("*.recovering"))
+
+def test_failed_remux_renames_flv_as_is(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_EXIT", "1")
+    path = orphan(tmp_path, "1001_20240630-200000_recording.flv.tmp")
+    assert recover_recording(path).name == "1001_20240630-200000_to_20240630-211530.flv" and not path.exists()
+
+def test_failed_remux_keeps_mp4_as_broken(tmp_path, ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_EXIT", "1")
+    path = orphan(tmp_path, "1001_20240630-200000_recording.mp4.tmp")
+    assert recover_recording(path) is None and (path.parent / "1001_20240630-200000_to_20240630-211530.mp4.broken").read_bytes() == b"data"
+
+def test_missing_ffmpeg_falls_back_to_rename(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    path = orphan(tmp_path, "1001_20240630-200000_recording.ts.tmp")
+    assert recover_recording(path).name == "1001_20240630-200000_to_20240630-211530.ts"
+
+def test_recovered_files_are_reported_per_room(tmp_path, ffmpeg):
+    orphan(tmp_path, "1001_20240630-200000_recording.flv.tmp"); orphan(tmp_path, "1001_20240630-100000_recording.flv.tmp", b"")
+    recovered = []
+    recover_orphaned_recordings(STARTED, on_recovered=lambda room_id, path: recovered.append((room_id, path.name)), roots=[tmp_path])
+    assert recovered == [("1001", "1001_20240630-200000_to_20240630-211530.flv")]
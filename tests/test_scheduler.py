@@ -0,0 +1,42 @@
+import datetime
+
+from douyin_recorder.scheduler import AdaptiveScheduler, RoomProfile, parse_recording_times
+
+NOW = datetime.datetime(2024, 6, 30, 19, 50)
+SETTINGS = {"patrol_interval": 30, "probe_interval_min": 15, "probe_interval_max": 600}
+
+def evening_sessions(days=14):
+    # 每天 20:00 开播、22:00 下播
+    return [(NOW.replace(hour=20, minute=0) - datetime.timedelta(days=d), NOW.replace(hour=22, minute=0) - datetime.timedelta(days=d)) for d in range(1, days + 1)]
+
+def scheduler_with(sessions, now=NOW):
+    scheduler = AdaptiveScheduler(SETTINGS, roots=lambda: [])
+    scheduler.profiles["room"] = RoomProfile(sessions, now); return scheduler
+
+def test_parse_recording_times():
+    assert parse_recording_times("123_20240630-200000_to_20240630-220000.mkv") == (datetime.datetime(2024, 6, 30, 20), datetime.datetime(2024, 6, 30, 22))
+    assert parse_recording_times("123_20241332-200000_to_20240630-220000.mkv") is None
+    assert parse_recording_times("notes.txt") is None
+
+def test_rooms_without_history_keep_fixed_interval():
+    assert AdaptiveScheduler(SETTINGS, roots=lambda: []).interval_for("unknown", NOW) == 30
+
+def test_usual_start_time_probes_faster_than_off_hours():
+    scheduler = scheduler_with(evening_sessions())
+    before_start, morning = scheduler.interval_for("room", NOW), scheduler.interval_for("room", NOW.replace(hour=8))
+    assert before_start == 15 and morning > 10 * before_start and morning <= 600
+
+def test_just_ended_room_is_probed_at_minimum_interval():
+    # 刚下播 10 分钟内可能是断流重开
+    ended = NOW - datetime.timedelta(minutes=5)
+    assert scheduler_with([(ended - datetime.timedelta(hours=2), ended)]).interval_for("room", NOW) == 15
+
+def test_probed_rooms_are_not_due_again_until_their_interval():
+    scheduler = scheduler_with(evening_sessions())
+    scheduler.record_probe("room", now_ts=1000)
+    assert scheduler.due_rooms(["room", "other"], 10, now_ts=1001) == ["other"]
+    assert sorted(scheduler.due_rooms(["room", "other"], 10, now_ts=1000 + 600 * 1.1 + 1)) == ["other", "room"]
+
+def test_probe_budget_matches_fixed_patrol():
+    assert AdaptiveScheduler(SETTINGS).probe_budget(300, 5) == 50
+    assert AdaptiveScheduler(SETTINGS).probe_budget(1, 5) == 1
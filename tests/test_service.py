@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+from douyin_recorder.service import RecorderService
+
+class SlowRecording:
+    # 收到停止后还要 delay 秒才收尾 (改名、合并、登记历史)；done 记录收尾顺序
+    def __init__(self, room_id, done, delay=0.3):
+        self.room_id, self.done, self.delay, self._stopped, self._finished = room_id, done, delay, threading.Event(), threading.Event()
+        threading.Thread(target=self.run, daemon=True).start()
+    def run(self):
+        self._stopped.wait(); time.sleep(self.delay); self.done.append(self.room_id); self._finished.set()
+    def stop(self): self._stopped.set()
+    def join(self, timeout=None): self._finished.wait(timeout)
+    def is_alive(self): return not self._finished.is_set()
+    def stopping(self): return self._stopped.is_set()
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = RecorderService(maintenance=False); yield service
+    if not service.closing.is_set(): service.shutdown()
+
+def test_shutdown_waits_for_recordings_before_closing_history(service):
+    done, progress = [], []
+    for room_id in ("1001", "1002"): service.recording_threads[room_id] = SlowRecording(room_id, done)
+    close = service.history.close; service.history.close = lambda: (done.append("history closed"), close())
+    service.shutdown(on_progress=lambda finished, total: progress.append((finished, total)))
+    assert sorted(done[:2]) == ["1001", "1002"] and done[2:] == ["history closed"] and progress == [(1, 2), (2, 2)]
+
+def test_stop_recording_waits_only_with_timeout(service):
+    done = []
+    service.recording_threads["1001"] = SlowRecording("1001", done); service.stop_recording("1001")
+    assert done == [] and service.recording_threads["1001"].stopping()
+    service.recording_threads["1002"] = SlowRecording("1002", done); service.stop_recording("1002", timeout=5)
+    assert "1002" in done
+
+def test_remove_streamer_only_deletes_settings(service):
+    assert service.add_streamer("1001", "主播") and service.store.load_all() == {"1001": {"remark": "主播"}}
+    service.remove_streamer("1001")
+    assert "1001" not in service.streamers and service.store.load_all() == {}
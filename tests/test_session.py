@@ -0,0 +1,32 @@
+from douyin_recorder import session
+from douyin_recorder.session import StreamUrlCache, live_url_for, pick_quality
+
+URLS = {"best": "http://cdn/best.flv", "hd": "http://cdn/hd.flv", "sd": "http://cdn/sd.flv"}
+
+class Clock:
+    def __init__(self): self.now = 1000.0
+    def __call__(self): return self.now
+
+def cache_with_clock(monkeypatch):
+    clock = Clock(); monkeypatch.setattr(session.time, "monotonic", clock)
+    cache = StreamUrlCache(); cache.put("1001", URLS); return cache, clock
+
+def test_pick_quality_follows_preferences():
+    assert pick_quality(URLS, "hd") == URLS["hd"] and pick_quality(URLS, ["uhd", "sd"]) == URLS["sd"] and pick_quality(URLS, ["uhd"]) == URLS["best"]
+    assert live_url_for("1001").endswith("1001") and live_url_for("1001", "https://example.com/{room_id}/") == "https://example.com/1001/"
+
+def test_cached_url_expires_after_ttl(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch)
+    clock.now += 299; assert cache.get("1001", ["hd"], 300) == URLS["hd"]
+    clock.now += 2; assert cache.get("1001", ["hd"], 300) is None
+
+def test_touch_extends_an_entry_that_is_still_valid(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch)
+    clock.now += 200; cache.touch("1001"); clock.now += 200
+    assert cache.get("1001", "best", 300) == URLS["best"]
+    cache.touch("1002"); assert cache.get("1002", "best", 300) is None  # 没有缓存的房间不会凭空生成
+
+def test_invalidate_and_empty_put_drop_the_entry(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch)
+    cache.invalidate("1001"); assert cache.get("1001", "best", 300) is None
+    cache.put("1001", URLS); cache.put("1001", {}); assert cache.get("1001", "best", 300) is None
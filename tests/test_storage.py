@@ -0,0 +1,62 @@
+import time
+
+from douyin_recorder.history import RecordingIndex
+from douyin_recorder.storage import GB, StorageManager
+
+def make_storage(tmp_path, free, streamers=None, is_busy=lambda path: False, **settings):
+    # free: {目录名: 剩余字节}；staging 为暂存盘，其余为存储卷
+    settings = {"storage_volumes": [str(tmp_path / name) for name in free if name != "staging"], "min_free_gb": 1, **settings}
+    if "staging" in free: settings["staging_dir"] = str(tmp_path / "staging")
+    storage = StorageManager(settings, streamers or {}, is_busy=is_busy)
+    storage.free_bytes = lambda path: next(free[name] for name in free if str(path).startswith(str(tmp_path / name)))
+    return storage
+
+def make_index(tmp_path, roots):
+    index = RecordingIndex(db_path=tmp_path / "history.sqlite3", roots=lambda: roots); index._queue_probe = lambda room_id, path: None
+    return index
+
+def recording(folder, room_id, start, size):
+    path = folder / room_id / f"{room_id}_{start}_to_{start[:9]}235959.flv"; path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size); return path
+
+# --- 存储卷选择 ---
+def test_staging_is_preferred_while_it_has_room(tmp_path):
+    storage = make_storage(tmp_path, {"staging": 2 * GB, "a": 5 * GB, "b": 9 * GB})
+    assert storage.output_dir_for("1001") == tmp_path / "staging" / "1001" and (tmp_path / "staging" / "1001").is_dir()
+    # 暂存盘放不下 (例如合并分段) 时改写余量最大的存储卷
+    assert storage.output_dir_for("1001", size=2 * GB) == tmp_path / "b" / "1001"
+
+def test_no_volume_above_the_minimum_returns_none(tmp_path):
+    storage = make_storage(tmp_path, {"staging": GB, "a": GB // 2, "b": GB})
+    assert storage.output_dir_for("1001") is None and storage.best_volume() is None
+    assert storage.has_room(tmp_path / "a") and not make_storage(tmp_path, {"a": GB // 4}).has_room(tmp_path / "a")
+
+def test_staged_recordings_move_to_the_best_volume(tmp_path):
+    storage = make_storage(tmp_path, {"staging": 5 * GB, "a": 2 * GB, "b": 3 * GB})
+    index = make_index(tmp_path, storage.roots()); moved = []; storage.on_moved = lambda room_id, dest: moved.append(dest)
+    src = recording(tmp_path / "staging", "1001", "20240630-200000", 100); index.add("1001", src)
+    storage.start(index, maintenance=False); storage.archive("1001", src)
+    deadline = time.monotonic() + 5
+    while not moved and time.monotonic() < deadline: time.sleep(0.02)
+    storage.shutdown()
+    dest = tmp_path / "b" / "1001" / src.name
+    assert moved == [dest] and dest.exists() and not src.exists() and [r["path"] for r in index.query("1001")] == [str(dest.resolve())]
+
+# --- 配额 ---
+def test_streamer_quota_deletes_oldest_recordings_of_that_room(tmp_path):
+    storage = make_storage(tmp_path, {"a": 10 * GB}, streamers={"1001": {"quota_gb": 250 / GB}})
+    index = make_index(tmp_path, storage.roots()); storage.history = index
+    old, mid, new = (recording(tmp_path / "a", "1001", start, 100) for start in ("20240601-200000", "20240615-200000", "20240630-200000"))
+    other = recording(tmp_path / "a", "1002", "20240501-200000", 500)
+    for path in (old, mid, new, other): index.add(path.parent.name, path)
+    assert storage.enforce_quotas() == 100 and not old.exists() and mid.exists() and new.exists() and other.exists()
+    assert index.usage() == {"1001": 200, "1002": 500}
+
+def test_global_quota_skips_busy_files(tmp_path):
+    busy = set()
+    storage = make_storage(tmp_path, {"a": 10 * GB}, is_busy=lambda path: path in busy, quota_gb=250 / GB)
+    index = make_index(tmp_path, storage.roots()); storage.history = index
+    oldest, older, newest = (recording(tmp_path / "a", room, start, 100) for room, start in (("1002", "20240601-200000"), ("1001", "20240615-200000"), ("1001", "20240630-200000")))
+    for path in (oldest, older, newest): index.add(path.parent.name, path)
+    busy.add(str(oldest.resolve()))
+    assert storage.enforce_quotas() == 100 and oldest.exists() and not older.exists() and newest.exists()
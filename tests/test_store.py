@@ -0,0 +1,60 @@
+import json
+import os
+
+from douyin_recorder.config import load_json, save_json
+from douyin_recorder.store import StreamerStore
+
+def make_store(tmp_path):
+    return StreamerStore(db_path=tmp_path / "streamers.sqlite3", legacy_dir=tmp_path / "streamers", legacy_file=tmp_path / "streamers.json")
+
+def write_profile(folder, room_id, data, mtime=None):
+    folder.mkdir(exist_ok=True); path = folder / f"{room_id}.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    if mtime is not None: os.utime(path, (mtime, mtime))
+    return path
+
+# --- 设定档读写 ---
+def test_save_json_replaces_atomically(tmp_path):
+    path = tmp_path / "settings.json"
+    save_json(path, {"a": 1}); save_json(path, {"a": 2})
+    assert load_json(path) == {"a": 2} and not (tmp_path / "settings.json.tmp").exists()
+
+def test_load_json_keeps_corrupt_file(tmp_path):
+    path = tmp_path / "settings.json"; path.write_text("{\"a\": ", encoding="utf-8")
+    assert load_json(path, {"default": True}) == {"default": True}
+    # 损坏的文件改名保留，不会被下次保存覆盖
+    assert not path.exists() and (tmp_path / "settings.json.corrupt").read_text(encoding="utf-8") == "{\"a\": "
+
+def test_load_json_creates_missing_file(tmp_path):
+    assert load_json(tmp_path / "new.json", {"x": 1}) == {"x": 1} and json.loads((tmp_path / "new.json").read_text(encoding="utf-8")) == {"x": 1}
+
+# --- 主播设定库 ---
+def test_import_dir_splits_options_and_ffmpeg_params(tmp_path):
+    store, folder = make_store(tmp_path), tmp_path / "import"
+    write_profile(folder, "1001", {"remark": "主播", "priority": 2, "ffmpeg_params": {"f": "flv"}})
+    write_profile(folder, "broken", {}); (folder / "broken.json").write_text("not json", encoding="utf-8")
+    (folder / "notes.txt").write_text("ignored", encoding="utf-8")
+    assert store.import_dir(folder) == 1
+    assert store.load_all() == {"1001": {"remark": "主播", "priority": 2}} and store.ffmpeg_params("1001") == {"f": "flv"}
+
+def test_import_dir_newer_only_skips_unchanged_files(tmp_path):
+    store, folder = make_store(tmp_path), tmp_path / "streamers"
+    write_profile(folder, "1001", {"remark": "旧"}, mtime=1_000_000)
+    assert store.import_dir(folder, newer_only=True) == 1
+    write_profile(folder, "1001", {"remark": "手动改过"}, mtime=1_000_000)
+    assert store.import_dir(folder, newer_only=True) == 0
+    write_profile(folder, "1001", {"remark": "手动改过"})
+    assert store.import_dir(folder, newer_only=True) == 1 and store.load_all()["1001"]["remark"] == "手动改过"
+
+def test_legacy_file_is_migrated_once_without_overwriting(tmp_path):
+    store = make_store(tmp_path); store.save("1001", {"remark": "库中"})
+    (tmp_path / "streamers.json").write_text(json.dumps({"1001": {"remark": "旧版"}, "1002": {"remark": "新"}}, ensure_ascii=False), encoding="utf-8")
+    assert store.load_all() == {"1001": {"remark": "库中"}, "1002": {"remark": "新"}}
+    assert not (tmp_path / "streamers.json").exists() and (tmp_path / "streamers.json.migrated").exists()
+
+def test_export_then_import_round_trips(tmp_path):
+    store = make_store(tmp_path); store.save("1001", {"remark": "主播", "segment": {"minutes": 30}, "ffmpeg_params": {"c:v": "copy"}})
+    assert store.export_dir(tmp_path / "export") == 1
+    other = StreamerStore(db_path=tmp_path / "other.sqlite3", legacy_dir=tmp_path / "none", legacy_file=tmp_path / "none.json")
+    assert other.import_dir(tmp_path / "export") == 1
+    assert other.load_all() == store.load_all() and other.ffmpeg_params("1001") == {"c:v": "copy"}
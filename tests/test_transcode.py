@@ -0,0 +1,66 @@
+import threading
+import time
+from pathlib import Path
+
+from douyin_recorder.transcode import TranscodePool, encoder_family, needs_transcode
+
+def pool_with(settings):
+    # _transcode 换成只记录顺序的假转码，gate 打开前第一个任务一直占着名额
+    finished, started, gate = threading.Event(), [], threading.Event()
+    done = []
+    def on_finished(job):
+        done.append(job.src.name)
+        if len(done) == len(pool.jobs): finished.set()
+    pool = TranscodePool(settings, on_finished=on_finished)
+    def fake_transcode(job):
+        started.append(job.src.name); gate.wait(10); job.status = "完成"
+    pool._transcode = fake_transcode
+    return pool, started, gate, finished
+
+def submit(pool, name, priority=0, codec="libx264"):
+    return pool.submit("1001", Path(name), {"c:v": codec}, priority)
+
+def wait_started(started, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(started) < count and time.monotonic() < deadline: time.sleep(0.02)
+    return len(started) >= count
+
+def test_encoder_family_and_needs_transcode():
+    assert encoder_family({"c:v": "h264_nvenc"}) == "nvenc" and encoder_family({"c:v": "libx265"}) == "cpu" and encoder_family({}) == "cpu"
+    assert not needs_transcode({"c:v": "copy"}) and needs_transcode({"c:a": "aac"})
+
+def test_pending_jobs_run_by_priority_then_submission_order():
+    pool, started, gate, finished = pool_with({"transcode_workers": 1})
+    submit(pool, "a.flv"); assert wait_started(started, 1)
+    submit(pool, "b.flv", 0); submit(pool, "c.flv", 5); submit(pool, "d.flv", 1)
+    gate.set(); assert finished.wait(5)
+    assert started == ["a.flv", "c.flv", "d.flv", "b.flv"]
+    pool.shutdown()
+
+def test_families_have_separate_slots():
+    pool, started, gate, finished = pool_with({"transcode_workers": 1, "hw_encoder_slots": {"nvenc": 1}})
+    submit(pool, "cpu1.flv"); submit(pool, "cpu2.flv"); submit(pool, "gpu.flv", codec="h264_nvenc")
+    assert wait_started(started, 2) and sorted(started) == ["cpu1.flv", "gpu.flv"]
+    gate.set(); assert finished.wait(5); pool.shutdown()
+
+def test_zero_slots_still_run_jobs():
+    # hw_encoder_slots 设为 0 时按 1 个名额处理，任务不会永远排队
+    pool, started, gate, finished = pool_with({"hw_encoder_slots": {"nvenc": 0}})
+    assert pool.slots_for("nvenc") == 1
+    submit(pool, "gpu.flv", codec="h264_nvenc"); gate.set()
+    assert finished.wait(5) and started == ["gpu.flv"]; pool.shutdown()
+
+def test_raising_slots_wakes_the_dispatcher():
+    pool, started, gate, finished = pool_with({"transcode_workers": 1})
+    submit(pool, "a.flv"); submit(pool, "b.flv"); assert wait_started(started, 1) and not wait_started(started, 2, 0.3)
+    pool.settings["transcode_workers"] = 2; pool.settings_changed()
+    assert wait_started(started, 2)
+    gate.set(); assert finished.wait(5); pool.shutdown()
+
+def test_clear_finished_keeps_pending_jobs():
+    pool, started, gate, finished = pool_with({"transcode_workers": 1})
+    submit(pool, "a.flv"); gate.set(); assert finished.wait(5)
+    pool._closed = True; pending = submit(pool, "b.flv")
+    pool.clear_finished()
+    assert list(pool.jobs) == [pending.id] and pool.pending_sources() == {str(Path("b.flv").resolve())}
+    pool.shutdown()